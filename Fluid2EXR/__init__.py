@@ -10,6 +10,20 @@
 # 0.14 28/08/2019 : Implement hires for density, fuel/react/heat, RGB
 # 0.20 28/08/2020 : Use Smoke2EXR as a basis for same functionality to extract direct from Fluid modifier grids
 # 0.21 06/09/2020 : Minor tweaks
+# 0.22 18/10/2026 : Build the image with NumPy (tile atlas in a few array operations) and store it with foreach_set
+# 0.23 18/10/2026 : Fetch the domain grids with foreach_get into float32 buffers that are re-used for each frame
+# 0.24 18/10/2026 : Convert a range of frames - images are built and written (exr_writer.py) on a pool of threads
+#                   while the next frame is evaluated
+# 0.25 18/10/2026 : Pack Channels - one image with a chosen grid in each of R, G, B, A (layout in the filename)
+# 0.26 18/10/2026 : Output precision - float or half EXR, or 16/8 bit PNG normalised to each channel's range
+# 0.27 18/10/2026 : Crop - only export the region occupied over the frame range (offset/size in the image name)
+# 0.28 18/10/2026 : Sparse Bricks output - only the occupied 8x8x8 bricks of each volume in a .npz (sparse_bricks.py)
+# 0.29 18/10/2026 : Delta Sequence output - a frame range as one file per volume of keyframes plus per-voxel deltas
+# 0.30 18/10/2026 : LOD Levels - also export 1/2, 1/4, 1/8 resolution versions of each volume (box or max filter)
+# 0.31 18/10/2026 : Pack the encoded EXR/PNG straight into the blend file - no file written to the project directory
+# 0.32 18/10/2026 : Profile - JSON report of wall/CPU time (and optionally peak memory) for each stage of the export
+# 0.33 18/10/2026 : Read Baked Cache - read the grids from the Mantaflow cache files (.uni/.raw) rather than evaluating
+#                   each frame, in a pool of worker processes for a frame range
 ##################################################################################################################
 
 #TODO: Possibly bake Ambient Occlusion into the smoke color (optional setting)
@@ -17,7 +31,7 @@
 bl_info = {  
  "name": "Fluid2EXR",
  "author": "Rich Sedman",  
- "version": (0, 21),  
+ "version": (0, 33),  
  "blender": (2, 80, 0),  
  "location": "(operators)",  
  "description": "Provide a means of converting a fluid simulation into an image that can be used to access the volumetric data independently of the simulation",  
@@ -26,9 +40,15 @@ bl_info = {
  "tracker_url": "",  
  "category": "Operator"}    #TODO: Don't know if this is correct!! 
 
-import bpy
+try:
+    import bpy
+except ImportError:
+    # Not running within Blender (eg, imported by a worker process reading the baked cache files). Only the modules
+    # with no bpy dependency (manta_cache, fluid_frame, etc.) can be used.
+    bpy = None
 
-from .fluid2exr import Fluid2EXR_Operator
+if bpy is not None:
+    from .fluid2exr import Fluid2EXR_Operator
 
 #def menu_draw(self, context):
 #    #Force 'invoke' when calling operator
@@ -42,7 +62,10 @@ from .fluid2exr import Fluid2EXR_Operator
 #bpy.types.NODE_MT_add.append(menu_draw)
 ##TODO : Need to add it to Add/Group rather than Add
 
-classes = ( Fluid2EXR_Operator, )
+if bpy is not None:
+    classes = ( Fluid2EXR_Operator, )
+else:
+    classes = ()
 
 def add_to_panel(self, context):
     layout = self.layout
@@ -0,0 +1,77 @@
+# Author: Rich Sedman
+# Description: Build a 'tile atlas' image (one tile per Z layer) from volume buffers using NumPy
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR) - vectorized replacement for the per-voxel loops in
+#                   build_exr_from_buffers
+# 0.02 18/10/2026 : Add atlas_name (the layout prefix of the image name) - as Smoke2EXR
+##################################################################################################################
+
+# The atlas has one X by Y tile for each Z layer, either in a single row or (multiRow) in a roughly square grid. Tiles
+# are separated by a 1 pixel gap (plus a 1 pixel gap above each row when multiRow). Each pixel is R,G,B,A floats and
+# pixel (x,y) of the image is at index x+y*width (as used by Blender's image.pixels). Note that this has no dependency
+# on bpy.
+
+import math
+import numpy as np
+
+# Return (numColumns, numRows, width, height) of the atlas for a volume of the given dimensions
+def atlas_layout(dimensions, multiRow=False):
+    if multiRow:
+        numColumns = math.ceil(math.sqrt(dimensions[2]))
+        numRows = math.ceil(dimensions[2] / numColumns)
+    else:
+        numColumns = dimensions[2]
+        numRows = 1
+
+    # Size the image to allow space for Z images of size X by Y
+    width = (dimensions[0]+1)*numColumns
+    if numRows >1:
+        height = (dimensions[1]+1)*numRows
+    else:
+        height = dimensions[1]
+
+    return (numColumns, numRows, width, height)
+
+# Name of the atlas image for a volume - prefixed with the number of tiles and the layout (columns x rows) so that the
+# volume can be rebuilt from the image
+def atlas_name(name, dimensions, multiRow=False):
+    (numColumns, numRows, width, height) = atlas_layout(dimensions, multiRow)
+    return str(dimensions[2])+"_"+str(numColumns)+"x"+str(numRows)+"_"+name
+
+# Return the buffer as a flat float32 array. The buffer can be a numpy array, a list of floats or raw bytes (a
+# bytearray/memoryview of 4-byte floats as read from the point cache).
+def as_float_array(buffer):
+    if isinstance(buffer, np.ndarray):
+        return buffer.astype(np.float32, copy=False).reshape(-1)
+    if isinstance(buffer, (bytes, bytearray, memoryview)):
+        return np.frombuffer(buffer, dtype=np.float32)
+    return np.asarray(buffer, dtype=np.float32).reshape(-1)
+
+# Build the atlas from the R, G, B, A buffers (each X*Y*Z values, x varying fastest). If R, G or B are None then 0.0 is
+# assumed. bufferA can be None to indicate not used (in which case 1.0 is assumed). Pixels outside the tiles are 0.0
+# (including alpha). Returns a (height, width, 4) float32 array.
+def build_atlas(dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False):
+    (sizeX, sizeY, sizeZ) = (int(dimensions[0]), int(dimensions[1]), int(dimensions[2]))
+    (numColumns, numRows, width, height) = atlas_layout((sizeX, sizeY, sizeZ), multiRow)
+
+    pixels = np.zeros((numRows, sizeY+1, numColumns, sizeX+1, 4), dtype=np.float32)
+
+    # View of the pixels as (row, column, y, x) tiles - so tile z is at row z // numColumns, column z % numColumns
+    tiles = pixels.transpose(0, 2, 1, 3, 4)[:, :, :sizeY, :sizeX, :]
+    fullRows = sizeZ // numColumns
+    remainder = sizeZ - fullRows*numColumns
+
+    for (channel, buffer) in enumerate((bufferR, bufferG, bufferB, bufferA)):
+        if buffer is None:
+            if channel == 3:
+                tiles[:fullRows, :, :, :, channel] = 1.0
+                tiles[fullRows:fullRows+1, :remainder, :, :, channel] = 1.0
+            continue
+
+        volume = as_float_array(buffer)[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+        tiles[:fullRows, :, :, :, channel] = volume[:fullRows*numColumns].reshape(fullRows, numColumns, sizeY, sizeX)
+        if remainder > 0:
+            tiles[fullRows, :remainder, :, :, channel] = volume[fullRows*numColumns:]
+
+    return pixels.reshape(numRows*(sizeY+1), width, 4)[:height]
@@ -0,0 +1,127 @@
+# Author: Rich Sedman
+# Description: Write an OpenEXR (scanline) image directly from a NumPy array
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR) - float32 or half RGBA, uncompressed, ZIPS or ZIP (zlib) compression
+# 0.02 18/10/2026 : Remove write_exr - the images are only encoded in memory (encode_exr)
+##################################################################################################################
+
+# Only what's needed to write the images we generate - a single part scanline image with no tiles, deep data or
+# multi-view. See "Technical Introduction to OpenEXR" and "OpenEXR File Layout" (openexr.com) for the details :
+#
+# 4         magic (0x76, 0x2f, 0x31, 0x01)
+# 4         version (2) and flags (0 - single part scanline)
+# ...       header - attributes as (name, 0, type name, 0, int size, value) terminated by a 0 byte
+# 8*n       offset table - file offset of each chunk (n = number of chunks)
+# ...       chunks - int y of first line, int size of data, data (each line of the chunk holds each channel in turn,
+#           channels in alphabetical order)
+#
+# ZIP compression pre-processes each chunk (bytes of the even offsets followed by bytes of the odd offsets, then each
+# byte replaced by the difference from the previous one) before compressing it with zlib. If that doesn't make a chunk
+# any smaller then the chunk is stored uncompressed.
+#
+# Note that this has no dependency on bpy so can be used outside Blender.
+
+import struct
+import zlib
+import numpy as np
+
+EXR_MAGIC = 20000630
+EXR_VERSION = 2
+
+# Pixel types
+UINT = 0
+HALF = 1
+FLOAT = 2
+
+PIXEL_DTYPES = { UINT: np.dtype('<u4'), HALF: np.dtype('<f2'), FLOAT: np.dtype('<f4') }
+
+# Compression types (and the number of scanlines in each chunk)
+NO_COMPRESSION = 0
+ZIPS_COMPRESSION = 2
+ZIP_COMPRESSION = 3
+
+LINES_PER_CHUNK = { NO_COMPRESSION: 1, ZIPS_COMPRESSION: 1, ZIP_COMPRESSION: 16 }
+
+INCREASING_Y = 0
+
+def attribute(name, typeName, value):
+    return name.encode('ascii') + b'\0' + typeName.encode('ascii') + b'\0' + struct.pack("<i", len(value)) + value
+
+def chlist(channels, pixelType):
+    value = b''
+    for channel in sorted(channels):
+        # name, pixel type, pLinear, reserved, xSampling, ySampling
+        value += channel.encode('ascii') + b'\0' + struct.pack("<iB3xii", pixelType, 0, 1, 1)
+    return value + b'\0'
+
+# Extra header attributes given as python values (str -> string, float -> float, int -> int)
+def user_attribute(name, value):
+    if isinstance(value, str):
+        return attribute(name, 'string', value.encode('utf-8'))
+    if isinstance(value, float):
+        return attribute(name, 'float', struct.pack("<f", value))
+    if isinstance(value, int):
+        return attribute(name, 'int', struct.pack("<i", value))
+    raise TypeError("Unsupported EXR attribute type for '%s' (%s)" % (name, type(value).__name__))
+
+def encode_header(width, height, channels, pixelType, compression, attributes=None):
+    header = struct.pack("<ii", EXR_MAGIC, EXR_VERSION)
+    header += attribute('channels', 'chlist', chlist(channels, pixelType))
+    header += attribute('compression', 'compression', struct.pack("<B", compression))
+    header += attribute('dataWindow', 'box2i', struct.pack("<iiii", 0, 0, width-1, height-1))
+    header += attribute('displayWindow', 'box2i', struct.pack("<iiii", 0, 0, width-1, height-1))
+    header += attribute('lineOrder', 'lineOrder', struct.pack("<B", INCREASING_Y))
+    header += attribute('pixelAspectRatio', 'float', struct.pack("<f", 1.0))
+    header += attribute('screenWindowCenter', 'v2f', struct.pack("<ff", 0.0, 0.0))
+    header += attribute('screenWindowWidth', 'float', struct.pack("<f", 1.0))
+    if attributes:
+        for name in sorted(attributes):
+            header += user_attribute(name, attributes[name])
+    return header + b'\0'
+
+# ZIP pre-process (split into even/odd bytes then delta encode) and compress the data of one chunk
+def zip_chunk(raw, level):
+    data = np.frombuffer(raw, dtype=np.uint8)
+    reordered = np.concatenate((data[0::2], data[1::2]))
+    predicted = reordered.copy()
+    predicted[1:] = reordered[1:] - reordered[:-1] + 128    # uint8 so wraps as required
+    return zlib.compress(predicted.tobytes(), level)
+
+# Return the EXR file content for the image. 'pixels' is a (height, width, channels) array with the top line of the
+# image first. 'channels' names each channel of the array (eg, "RGBA"). 'attributes' are any extra header attributes.
+def encode_exr(pixels, channels="RGBA", pixelType=FLOAT, compression=ZIP_COMPRESSION, level=6, attributes=None):
+
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    (height, width, numChannels) = pixels.shape
+    if numChannels != len(channels):
+        raise ValueError("%i channel names given for an image with %i channels" % (len(channels), numChannels))
+    if compression not in LINES_PER_CHUNK:
+        raise ValueError("Unsupported EXR compression (%i)" % compression)
+
+    # Re-order to (line, channel, x) with the channels sorted by name - the layout of the data in each chunk
+    order = sorted(range(numChannels), key=lambda c: channels[c])
+    lines = np.ascontiguousarray(pixels[:, :, order].transpose(0, 2, 1), dtype=PIXEL_DTYPES[pixelType])
+
+    header = encode_header(width, height, channels, pixelType, compression, attributes)
+
+    linesPerChunk = LINES_PER_CHUNK[compression]
+    numChunks = (height + linesPerChunk - 1) // linesPerChunk
+
+    chunks = []
+    offset = len(header) + numChunks*8
+    offsets = []
+    for y in range(0, height, linesPerChunk):
+        raw = lines[y:y+linesPerChunk].tobytes()
+        data = raw
+        if compression != NO_COMPRESSION:
+            compressed = zip_chunk(raw, level)
+            if len(compressed) < len(raw):
+                data = compressed
+        chunk = struct.pack("<ii", y, len(data)) + data
+        offsets.append(offset)
+        offset += len(chunk)
+        chunks.append(chunk)
+
+    return b''.join([header, struct.pack("<%iQ" % numChunks, *offsets)] + chunks)
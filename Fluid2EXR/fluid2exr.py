@@ -11,312 +11,335 @@
 #
 # 1.00 30/08/2020 : Use '...._grid' data direct from the modifier rather than read from Pointcache files
 # 1.01 06/09/2020 : Use Numpy to improve efficiency
+# 1.02 18/10/2026 : Build the whole image with NumPy (atlas.py) and store it with a single foreach_set
+# 1.03 18/10/2026 : Fetch the grids with foreach_get into float32 buffers that are reused for each frame
+# 1.04 18/10/2026 : Convert a range of frames - build and write the EXR for each frame on a pool of threads
+#                   (exr_writer.py) while the next frame is evaluated
+# 1.05 18/10/2026 : Optionally pack several grids into the channels of a single image ('channelMap')
+# 1.06 18/10/2026 : Selectable output precision - float, half or normalised 16/8 bit (precision.py)
+# 1.07 18/10/2026 : Optionally crop the images to the region occupied over the frame range (crop.py)
+# 1.08 18/10/2026 : Optionally write the volumes as sparse bricks instead of image atlases (sparse_bricks.py)
+# 1.09 18/10/2026 : Optionally write a frame range as a keyframe + delta sequence file per volume (volume_sequence.py)
+# 1.10 18/10/2026 : Optionally also export reduced resolution LOD levels of each volume (lod.py)
+# 1.11 18/10/2026 : Pack the encoded image straight into the blend file rather than saving and loading a file
+# 1.12 18/10/2026 : Optionally time each stage of the export and write a JSON report (profiling.py)
+# 1.13 18/10/2026 : Optionally read the grids from the baked cache files (manta_cache.py) instead of evaluating each
+#                   frame - a frame range is then read in a pool of worker processes. The grids -> images code moved
+#                   to fluid_frame.py (no dependency on bpy).
+# 1.14 18/10/2026 : The baked cache's color image uses the flows' smoke color when no color grids were baked (as the
+#                   modifier's color_grid)
 
 import bpy
 import os
-import sys
-import math
-import numpy as np
-
-#def convert_volume_to_exr(object, oPattern, oframeno, multiRow=False, hiresMultiplier=1):
-def convert_volume_to_exr(object, oPattern, oframeno, multiRow=False):
+import collections
+import concurrent.futures
+import multiprocessing
+import time
+
+from .atlas import atlas_name, build_atlas
+from .crop import DEFAULT_THRESHOLD, frame_bounds, union_bounds, crop_image
+from .sparse_bricks import write_bricks
+from .lod import LOD_FILTERS, MAX_LOD_LEVELS, lod_images
+from .profiling import span, start_profile, finish_profile
+from .volume_sequence import DEFAULT_TOLERANCE, DEFAULT_KEYFRAME_INTERVAL, COMPRESSORS, VolumeSequenceWriter, channel_fields
+from .precision import PRECISIONS, QUANTIZED_BITS, image_extension, channel_ranges, encode_atlas
+from .fluid_frame import GridBuffers, grid_buffers, domain_images
+from .fluid_frame import PACK_FIELDS, DEFAULT_CHANNEL_MAP, channel_id, channel_map_from_ids
+from .manta_cache import CACHE_FORMATS, MantaCache, load_manta_frame, manta_frame_bounds
+
+# The domain's smoke color when the flows don't add different colors (so no color grids are baked) - as Blender's
+# active_color, the color of the first flow adding smoke to the domain
+def smoke_flow_color(domainSettings):
+    objects = domainSettings.fluid_group.all_objects if domainSettings.fluid_group else bpy.context.scene.objects
+    for object in objects:
+        for modifier in object.modifiers:
+            if modifier.type == 'FLUID' and modifier.fluid_type == 'FLOW':
+                flowSettings = modifier.flow_settings
+                if flowSettings.flow_type in {'SMOKE', 'BOTH'} and flowSettings.density != 0.0:
+                    return tuple(flowSettings.smoke_color)
+    return (0.0, 0.0, 0.0)
+
+# Set the frame and copy the domain grids into 'buffers' - see domain_images (fluid_frame.py)
+def fetch_volume_images(object, oframeno, buffers=grid_buffers, channelMap=None):
 
     #Set the frame
-    bpy.context.scene.frame_set(oframeno)
+    with span('evaluate', frame=oframeno):
+        bpy.context.scene.frame_set(oframeno)
     
-    #Get populated domain settings
+        #Get populated domain settings
+        domain_settings = object.evaluated_get(bpy.context.evaluated_depsgraph_get()).modifiers["Fluid"].domain_settings
+
+    return domain_images(domain_settings, buffers, channelMap)
+
+# Add the reduced resolution versions of each of the images (list of (name, dimensions, buffers)) - see lod.py
+def add_lod_images(images, lodLevels=0, lodFilter='BOX'):
+    with span('lod'):
+        return images + [lod for image in images for lod in lod_images(*image, lodLevels, lodFilter)]
+
+# Resolution of the domain (lowres grids)
+def domain_dimensions(object, mantaCache=None):
+    if mantaCache is not None:
+        return mantaCache.resolution
     domain_settings = object.evaluated_get(bpy.context.evaluated_depsgraph_get()).modifiers["Fluid"].domain_settings
-        
-    #if ...not smoke: 
-    #
-    #    print("Only 'smoke' type is currently processed - found "+str(flavor))
-    #else:
-    #    smokeversion = ....
-    #    print("Smoke version = "+str(smokeversion))
-    #    
-    #    (fluid_fields,active_fields, res_x, res_y, res_z, dx) = ......
-    #    print("Got fields %i\t%i\t%i\t%i\t%i\t%f" % (fluid_fields,active_fields, res_x, res_y, res_z, dx))
-    res_x = domain_settings.domain_resolution[0]
-    res_y = domain_settings.domain_resolution[1]
-    res_z = domain_settings.domain_resolution[2]
-    lowresgridsize = res_x * res_y * res_z
-    
-    if domain_settings.use_noise:
-        hires_x = res_x * (domain_settings.noise_scale)
-        hires_y = res_y * (domain_settings.noise_scale)
-        hires_z = res_z * (domain_settings.noise_scale)
-        hiresgridsize = hires_x * hires_y * hires_z
+    return tuple(domain_settings.domain_resolution)
+
+# Process pool for reading the cache files (or None for 'workers' of 1 - read here)
+def cache_executor(workers):
+    if workers <= 1:
+        return None
+    # Worker processes need a Python interpreter rather than the Blender executable (2.91 and earlier)
+    context = multiprocessing.get_context('spawn')
+    if getattr(bpy.app, 'binary_path_python', None):
+        context.set_executable(bpy.app.binary_path_python)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+# Call function(mantaCache, frameno, *args) for each frame, yielding (frameno, result) in frame order. If 'executor' is
+# a process pool then the calls are made there with up to workers*2 frames in progress, otherwise they're made here.
+# Frames that can't be read are skipped.
+def map_frames(executor, workers, function, mantaCache, frames, *args):
+
+    if executor is None:
+        for frameno in frames:
+            try:
+                result = function(mantaCache, frameno, *args)
+            except OSError as e:
+                print("Skipping frame %i : %s" % (frameno, str(e)))
+                continue
+            yield (frameno, result)
+        return
+
+    pending = collections.deque()
+    frames = iter(frames)
+    while True:
+        while len(pending) < workers*2:
+            frameno = next(frames, None)
+            if frameno is None:
+                break
+            pending.append((frameno, executor.submit(function, mantaCache, frameno, *args)))
+
+        if len(pending) == 0:
+            break
+
+        (frameno, future) = pending.popleft()
+        try:
+            # Time waiting for the worker (the reading there isn't profiled)
+            with span('wait', frame=frameno):
+                result = future.result()
+        except OSError as e:
+            print("Skipping frame %i : %s" % (frameno, str(e)))
+            continue
+        yield (frameno, result)
+
+# The images for each frame, yielding (frameno, images). Each frame is evaluated here with each of 'bufferSets' used in
+# turn or, if 'mantaCache' is given, read from the cache files (see map_frames).
+def frame_images(object, frames, bufferSets, channelMap=None, mantaCache=None, executor=None, workers=1):
+    if mantaCache is None:
+        for (frameIndex, frameno) in enumerate(frames):
+            print("Frame %i : evaluating" % frameno)
+            yield (frameno, fetch_volume_images(object, frameno, bufferSets[frameIndex % len(bufferSets)], channelMap))
     else:
-        hiresgridsize = lowresgridsize
-    
-    SM_ACTIVE_HEAT		= 1
-    SM_ACTIVE_FIRE		= 2
-    SM_ACTIVE_COLORS	= 4
-    SM_ACTIVE_COLOR_SET	= 8
-
-    #shadow = ....
-    density = domain_settings.density_grid
-
-    heat = None
-    heatold = None
-    #if (...doing heat) > 0:
-    #    heat = ....
-    #    heatold = ....
-        
-    flame = None
-    fuel = None
-    react = None
-    #if (....doing burny...) > 0:
-    #    flame = ....
-    #    fuel = ....
-    #    react = ....
-    flame = domain_settings.flame_grid
-    heat = domain_settings.heat_grid
-    #...what about 'temperature_grid'?
-    velocity = domain_settings.velocity_grid
-    
-    #Now use numpy to split the x,y,z array into 3 separate arrays
-    velocityxyz = np.array(velocity)  #The basic numpy array
-    
-    #rgb_r = None
-    #rgb_g = None
-    #rgb_b = None
-    colorrgb = np.array(domain_settings.color_grid)
-    #    rgb_r = ....
-    #    rgb_g = ....
-    #    rgb_b = ....
-        
-    #obstacles = ....
-
-    #extrafields = f.read(45*4)
-    #rec = struct.unpack("fffffffffffiiifffffffffffffffffffiiiiiiiiifff",extrafields)
-    #print("Extra Fields = "+str(rec))
-    
-    #hires_density = ....
-    #hires_flame = ....
-    #hires_fuel = ....
-    #hires_react = ....
-
-    #hires_rgb_r = None
-    #hires_rgb_g = None
-    #hires_rgb_b = None
-    #if (....doing colours(hires)...) > 0:
-    #    hires_rgb_r = ....
-    #    hires_rgb_g = ....
-    #    hires_rgb_b = ....
-
-    #tcu = ....
-    #tcv = ....
-    #tcw = ....
-
-    if len(density) == lowresgridsize:
-        build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), density, density, density, None, multiRow=multiRow)
-    elif len(density) == hiresgridsize:
-        build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (hires_x, hires_y, hires_z), density, density, density, None, multiRow=multiRow)
+        for (frameno, images) in map_frames(executor, workers, load_manta_frame, mantaCache, frames, channelMap):
+            print("Frame %i : read from cache" % frameno)
+            yield (frameno, images)
+
+# Crop the images (list of (name, dimensions, buffers)) to the bounds (see crop.py) - if there are any
+def crop_images(images, bounds, lowresDimensions):
+    if bounds is None:
+        return images
+    with span('crop'):
+        return [crop_image(name, dimensions, buffers, bounds, lowresDimensions) for (name, dimensions, buffers) in images]
+
+# Region occupied by the exported grids over all the frames, in lowres voxels (or None if nothing exceeds the
+# threshold). Each frame has to be evaluated (or read from the cache) for this. Note that this assumes the domain
+# resolution doesn't change.
+def range_bounds(object, frames, channelMap=None, threshold=DEFAULT_THRESHOLD, mantaCache=None, executor=None, workers=1):
+    bounds = None
+    if mantaCache is None:
+        for frameno in frames:
+            print("Frame %i : finding occupied region" % frameno)
+            images = fetch_volume_images(object, frameno, channelMap=channelMap)
+            bounds = union_bounds(bounds, frame_bounds(images, domain_dimensions(object), threshold))
     else:
-        print("density_grid unexpected size (%i)" % len(density))
+        for (frameno, frameBounds) in map_frames(executor, workers, manta_frame_bounds, mantaCache, frames, channelMap, threshold):
+            bounds = union_bounds(bounds, frameBounds)
+    print("Cropping to "+str(bounds))
+    return bounds
 
-    if len(flame) == lowresgridsize:
-        build_exr_from_buffers(gen_filename("flame",oPattern, oframeno), (res_x, res_y, res_z), flame, flame, flame, None, multiRow=multiRow)
-    elif len(flame) == hiresgridsize:
-        build_exr_from_buffers(gen_filename("hires_flame",oPattern, oframeno), (hires_x, hires_y, hires_z), flame, flame, flame, None, multiRow=multiRow)
+#def convert_volume_to_exr(object, oPattern, oframeno, multiRow=False, hiresMultiplier=1):
+# If 'mantaCache' is given then the grids are read from the cache files rather than evaluating the frame
+def convert_volume_to_exr(object, oPattern, oframeno, multiRow=False, channelMap=None, precision='FLOAT', cropThreshold=None, outputFormat='ATLAS', lodLevels=0, lodFilter='BOX',
+        mantaCache=None):
+    if mantaCache is not None:
+        images = load_manta_frame(mantaCache, oframeno, channelMap)
     else:
-        print("flame_grid unexpected size (%i)" % len(flame))
+        images = fetch_volume_images(object, oframeno, channelMap=channelMap)
+    if cropThreshold is not None:
+        lowresDimensions = domain_dimensions(object, mantaCache)
+        images = crop_images(images, frame_bounds(images, lowresDimensions, cropThreshold), lowresDimensions)
+    images = add_lod_images(images, lodLevels, lodFilter)
+    for (name, dimensions, buffers) in images:
+        build_exr_from_buffers(gen_filename(name,oPattern, oframeno), dimensions, buffers[0], buffers[1], buffers[2], buffers[3], multiRow=multiRow, precision=precision, outputFormat=outputFormat)
+
+# Number of frames that can be waiting to be written while the next frame is evaluated
+FRAMES_IN_FLIGHT = 2
+
+# Convert a range of frames. Each frame is evaluated (and the grids copied out) here on the main thread and then the
+# images are built and encoded on a pool of threads while the next frame is evaluated - the NumPy and zlib work
+# releases the GIL. The encoded images are packed back on the main thread. 'threads' is the number of
+# threads (0 = one per CPU). If 'cropThreshold' is given then the images are cropped to the region where any of the
+# exported grids exceeds it in any of the frames (see crop.py) - this needs an extra pass over the frames first.
+# If outputFormat is 'SEQUENCE' then each volume is written to a single sequence file (<name>.vseq) of keyframes and
+# deltas (see volume_sequence.py) instead of a file per frame - 'tolerance', 'keyframeInterval' and
+# 'sequenceCompression' are the settings for that. 'lodLevels' reduced resolution versions of each image are also
+# created (see lod.py). If 'mantaCache' is given then the frames are read from the baked cache files (see
+# manta_cache.py) in a pool of 'workers' worker processes (0 = one per CPU, 1 = read here) instead of being evaluated.
+def convert_volume_range_to_exr(object, oPattern, frames, multiRow=False, threads=0, channelMap=None, precision='FLOAT', cropThreshold=None, outputFormat='ATLAS',
+        tolerance=DEFAULT_TOLERANCE, keyframeInterval=DEFAULT_KEYFRAME_INTERVAL, sequenceCompression='ZLIB', lodLevels=0, lodFilter='BOX', mantaCache=None, workers=0):
+
+    if threads == 0:
+        threads = os.cpu_count() or 1
+    if workers == 0:
+        workers = os.cpu_count() or 1
 
-    if len(heat) == lowresgridsize:
-        build_exr_from_buffers(gen_filename("heat",oPattern, oframeno), (res_x, res_y, res_z), heat, heat, heat, None, multiRow=multiRow)
-    elif len(heat) == hiresgridsize:
-        build_exr_from_buffers(gen_filename("hires_heat",oPattern, oframeno), (hires_x, hires_y, hires_z), heat, heat, heat, None, multiRow=multiRow)
-    else:
-        print("heat_grid unexpected size (%i)" % len(heat))
+    img_path = bpy.path.abspath('//')
 
-    if velocityxyz.any() and len(velocityxyz > 0):
-        velocityx = velocityxyz[0::3].tolist()   #Every 3rd element, starting at 0
-        velocityy = velocityxyz[1::3].tolist()   #Every 3rd element, starting at 1
-        velocityz = velocityxyz[2::3].tolist()   #Every 3rd element, starting at 2
+    # A set of grid buffers for each frame in flight plus the frame being evaluated, used in turn
+    bufferSets = [GridBuffers() for i in range(FRAMES_IN_FLIGHT+1)]
 
-        if len(velocityxyz) == lowresgridsize*3:
-            build_exr_from_buffers(gen_filename("velocity",oPattern, oframeno), (res_x, res_y, res_z), velocityx, velocityy, velocityz, None, multiRow=multiRow)
-        elif len(velocityxyz) == hiresgridsize*3:
-            build_exr_from_buffers(gen_filename("hires_velocity",oPattern, oframeno), (hires_x, hires_y, hires_z), velocityx, velocityy, velocityz, None, multiRow=multiRow)
-        else:
-            print("velocity_grid unexpected size (%i)" % len(velocityxyz))
-
-    if colorrgb.any() and len(colorrgb) > 0:
-        colorr = colorrgb[0::4].tolist()   #Every 4th element, starting at 0
-        colorg = colorrgb[1::4].tolist()   #Every 4th element, starting at 1
-        colorb = colorrgb[2::4].tolist()   #Every 4th element, starting at 2
-        colora = colorrgb[3::4].tolist()   #Every 4th element, starting at 3
-
-        if len(colorrgb) == lowresgridsize*4:
-            build_exr_from_buffers(gen_filename("color",oPattern, oframeno), (res_x, res_y, res_z), colorr, colorg, colorb, colora, multiRow=multiRow)
-        elif len(colorrgb) == hiresgridsize*4:
-            build_exr_from_buffers(gen_filename("hires_color",oPattern, oframeno), (hires_x, hires_y, hires_z), colorr, colorg, colorb, colora, multiRow=multiRow)
-        else:
-            print("color_grid unexpected size (%i)" % len(colorrgb))
-
-    #TODO: Get HIRES working correctly
-    #print("WARNING: HIRES not working for flame, fuel, react")
-    #hires_rgb_b = None
-    #hires_flame = None
-    #hires_density = None
-
-    #if rgb_b != None:
-    #    build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), rgb_r, rgb_g, rgb_b, None, multiRow=multiRow)
-    #else:
-    #    build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), density, density, density, None, multiRow=multiRow)
-
-    #if hires_rgb_b != None:
-    #    build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_rgb_r, hires_rgb_g, hires_rgb_b, None, multiRow=multiRow)          #TODO: This also seems to be 'wrong' if multi-colored!!!!
-    #else:
-    #    if hires_density != None:
-    #        build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_density, hires_density, hires_density, None, multiRow=multiRow)
-
-    #if velocity_grid != None:
-    #    build_exr_from_buffers(gen_filename("velocity",oPattern, oframeno), (res_x, res_y, res_z), vx, vy, vz, None, multiRow=multiRow)
-
-    #if flame != None:
-    #    build_exr_from_buffers(gen_filename("flame_heat_fuel",oPattern, oframeno), (res_x, res_y, res_z), flame, heat, fuel, None, multiRow=multiRow)
-            
-    #if hires_flame != None:
-    #    #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)
-        #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x, res_y, res_z), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
-    #    build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
+    def finish_frame(frameno, futures):
+        print("Frame %i : packing images" % frameno)
+        for future in futures:
+            (filename, data, metadata) = future.result()
+            if filename is not None:
+                pack_exr_image(filename, data, precision, metadata)
+
+    # Sequence writer for each volume. Each frame is the difference from the one before so these are written here on
+    # the main thread, in order, rather than on the pool.
+    sequences = {}
 
+    def add_sequence_frame(name, frameno, dimensions, buffers):
+        (fieldNames, fields) = channel_fields(buffers)
+        if name not in sequences:
+            sequences[name] = VolumeSequenceWriter(img_path+name+'.vseq', fieldNames, tolerance, keyframeInterval, sequenceCompression)
+        with span('sequence', image=name, frame=frameno):
+            size = sequences[name].add_frame(frameno, dimensions, fields)
+        print("Frame %i : %s added to sequence (%i bytes)" % (frameno, name, size))
 
-    #f.close()
+    # Worker processes for reading the cache files (if reading from the cache)
+    cacheExecutor = cache_executor(workers) if mantaCache is not None else None
+
+    try:
+        bounds = None
+        if cropThreshold is not None:
+            bounds = range_bounds(object, frames, channelMap, cropThreshold, mantaCache, cacheExecutor, workers)
+            lowresDimensions = domain_dimensions(object, mantaCache)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            pending = collections.deque()
+            # The next frame only uses the set of buffers of the frame FRAMES_IN_FLIGHT+1 back, which has been written
+            for (frameno, images) in frame_images(object, frames, bufferSets, channelMap, mantaCache, cacheExecutor, workers):
+                while len(pending) >= FRAMES_IN_FLIGHT:
+                    finish_frame(*pending.popleft())
+
+                if bounds is not None:
+                    images = crop_images(images, bounds, lowresDimensions)
+                images = add_lod_images(images, lodLevels, lodFilter)
+                if outputFormat == 'SEQUENCE':
+                    for (name, dimensions, buffers) in images:
+                        add_sequence_frame(name, frameno, dimensions, buffers)
+                    continue
+                futures = [executor.submit(encode_exr_from_buffers, img_path, gen_filename(name,oPattern, frameno), dimensions, buffers[0], buffers[1], buffers[2], buffers[3], multiRow, precision, outputFormat) for (name, dimensions, buffers) in images]
+                pending.append((frameno, futures))
+
+            while len(pending) > 0:
+                finish_frame(*pending.popleft())
+    finally:
+        for sequence in sequences.values():
+            sequence.close()
+        if cacheExecutor is not None:
+            cacheExecutor.shutdown()
 
 # Generate filename by combining name, pattern, frameno
 def gen_filename(name, pattern, frameno):
     return pattern % (name, frameno)
 
 
-def build_exr_from_buffers(filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False):
+# Build the image and encode it as an image file in memory (no dependency on bpy so this can be run on a worker
+# thread). The file is EXR or PNG depending on the precision (see precision.py). Returns the name of the image, the
+# file content and the metadata needed to reconstruct the values (for the normalised precisions). If outputFormat is
+# 'BRICKS' then a sparse brick file is written to 'img_path' instead (see sparse_bricks.py) and the name returned is
+# None (no image).
+def encode_exr_from_buffers(img_path, filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False, precision='FLOAT', outputFormat='ATLAS'):
 
-    #...want to re-write this to use numpy functions.... could work something like this...
-    #1) split the array into 3-dimensional representation of pixels (should be one-liner, I think)
-    #2) add elements such that it will form a complete 'grid' of images (eg, 10x10)
-    #3) convert to a 4-d array with gridx, gridy, x, y*dimensions
-    #4) take each 'gridy' set and split the lines of each sub-array
-    #5) interleave those lines
-    #6) flatten it
-    #7) combine them all
+    if outputFormat == 'BRICKS':
+        print("Writing bricks %s, Dimensions = (%i,%i,%i)" % (filename, dimensions[0], dimensions[1], dimensions[2]))
+        with span('bricks', image=filename):
+            write_bricks(img_path+filename+'.npz', dimensions, (bufferR, bufferG, bufferB, bufferA))
+        return (None, None, None)
 
-    if multiRow:
-        numColumns = math.ceil(math.sqrt(dimensions[2]))
-        numRows = math.ceil(dimensions[2] / numColumns)
-    else:
-        numColumns = dimensions[2]
-        numRows = 1
-
-    filename = str(dimensions[2])+"_"+str(numColumns)+"x"+str(numRows)+"_"+filename
+    filename = atlas_name(filename, dimensions, multiRow)
 
     print("Building image %s" % filename)
 
-    # Size the image to allow space for Z images of size X by Y
-    width = (dimensions[0]+1)*numColumns
-    if numRows >1:
-        height = (dimensions[1]+1)*numRows
-    else:
-        height = dimensions[1]
-
-    # Create the image
-    image = bpy.data.images.new(filename, width=width, height=height,float_buffer=True)
-
-    # Create an empty array of pixel data (each will hold R, G, B, A values as floats)
-    print("Clearing image...")
-    pixels = [None] * width * height
-    for x in range(0,width):
-        for y in range(0,height):
-            pixels[y*width+x] = [0.0,0.0,0.0,0.0]
-            
     print("File '"+filename+"', Dimensions = ("+str(dimensions[0])+","+str(dimensions[1])+","+str(dimensions[2])+")")
- 
-    yrange = range(0,dimensions[1])
-    xrange = range(0,dimensions[0])
- 
-    for z in range(0,dimensions[2]):
-        print("Processing layer "+str(z))
-        
-        #Calculate the location of this 'tile'
-        tileNoX = z % numColumns
-        tileNoY = int((z - tileNoX) / numColumns)
-        tileOffset = tileNoX*(dimensions[0]+1)+tileNoY*width*(dimensions[1]+1)
 
-        #for y in range(0,dimensions[1]):
-        for y in yrange:
-        
-            poffset = y*dimensions[0]+z*dimensions[0]*dimensions[1]
-        
-            #for x in range(0,dimensions[0]):
-            for x in xrange:
-            
-                #p = x+y*dimensions[0]+z*dimensions[0]*dimensions[1]
-                p = poffset + x
-
-                # If R, G, or B are 'none' then 0.0 is assumed
-                valR = 0
-                valG = 0
-                valB = 0
-                if bufferR != None:
-                    #valR = struct.unpack('f',bufferR[p*4:p*4+4])[0]
-                    valR = bufferR[p]
-                    
-                if bufferG != None:
-                    #valG = struct.unpack('f',bufferG[p*4:p*4+4])[0]
-                    valG = bufferG[p]
-
-                if bufferB != None:
-                    #valB = struct.unpack('f',bufferB[p*4:p*4+4])[0]
-                    valB = bufferB[p]
-
-                # bufferA can be None to indicate not used (in which case 1.0 is assumed)
-                if bufferA != None:
-                    #valA = struct.unpack('f',bufferA[p*4:p*4+4])[0]
-                    valA = bufferA[p]
-                else:
-                    valA = 1.0
-                
-                #pixels[(y*width)+x+z*(dimensions[0]+1)] = [valR,valG,valB,valA]
-                pixels[tileOffset + x + y*width] = [valR,valG,valB,valA]
-
-    # 'flatten' the array - so [R1,G1,B1,A1], [R2,G2,B2,A2], [R3,G3,B3,A3],.... becomes R1,B1,G1,A1,R2,G2,B2,A2,R3,G3,B3,A3,....    
-    # Store the pixels in the image
-    print("Image build complete, storing pixels...")
-    image.pixels = [chan for px in pixels for chan in px]
-    print("Updating image...")
-    image.update()
-
-    print("Saving image...")
-    # Save image to temporary file and pack it (from answer by @sambler)
-    scn = bpy.data.scenes.new('img_settings')
-    scn.render.image_settings.file_format = 'OPEN_EXR'
-    scn.render.image_settings.exr_codec = 'ZIP'
-    scn.render.image_settings.color_mode = 'RGBA'
-    scn.render.image_settings.color_depth = '32'
-    img_path = bpy.path.abspath('//')
-    img_file = image.name+'.exr'
-    image.save_render(img_path+img_file, scene=scn)
-    try:
-        # Remove the scene (pre-2.78)
-        bpy.data.scenes.remove(scn)
-    except:
-        # Remove the scene, (Blender 2.78+)
-        bpy.data.scenes.remove(scn, do_unlink=True)
-        
-    #Pack the images (needs to be saved and re-opened)
-    if bpy.app.version_string.startswith('2.79'):
-        bpy.data.images.remove(image)
-        bpy.ops.image.open(filepath=img_path+img_file)
-        image = bpy.data.images[img_file]
-        
-    image.pack()
-    if bpy.app.version_string.startswith('2.79'):
-        os.remove(img_path+img_file)
-    
-    image.use_fake_user = True
+    with span('tile', image=filename):
+        # Range of each channel (for the normalised precisions)
+        ranges = None
+        if precision in QUANTIZED_BITS:
+            ranges = channel_ranges((bufferR, bufferG, bufferB, bufferA))
+            print("Channel ranges = "+str(ranges))
+
+        # Build the whole image (R, G, B, A float per pixel) as a numpy array - see atlas.py
+        pixels = build_atlas(dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=multiRow)
+
+    # Encode the image file in memory (see precision.py)
+    print("Image build complete, encoding image...")
+    with span('encode', image=filename):
+        (data, metadata) = encode_atlas(pixels, precision, ranges)
+    print("Encoded %s (%i bytes)" % (filename+image_extension(precision), len(data)))
+
+    return (filename, data, metadata)
+
+# Create an image from the content of an image file ('data') and pack it into the blend file - nothing is written to
+# disk. The image is created 1x1 (so no pixel buffer is allocated for it) and takes its size from the packed file when
+# its source is set to 'FILE'. 'filepath' is the name the image would be unpacked to.
+def pack_image_data(name, filepath, data):
+    image = bpy.data.images.new(name, 1, 1, alpha=True)
+    image.pack(data=data, data_len=len(data))
+    image.filepath_raw = filepath
+    image.source = 'FILE'
+    image.name = name
+    return image
+
+# Pack the image encoded by encode_exr_from_buffers into the blend file
+def pack_exr_image(filename, data, precision='FLOAT', metadata=None):
+    with span('pack', image=filename, size=len(data)):
+        image = pack_image_data(filename, '//'+filename+image_extension(precision), data)
+        if precision in QUANTIZED_BITS:
+            # Values are data (not color) and the scale/offset to reconstruct them are kept with the image
+            image.colorspace_settings.name = 'Non-Color'
+            # Each channel is packed data - never premultiply RGB by alpha
+            image.alpha_mode = 'CHANNEL_PACKED'
+            for (key, value) in metadata.items():
+                image[key] = value
+
+        image.use_fake_user = True
     print("Complete.")
 
+def build_exr_from_buffers(filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False, precision='FLOAT', outputFormat='ATLAS'):
+    img_path = bpy.path.abspath('//')
+    (filename, data, metadata) = encode_exr_from_buffers(img_path, filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow, precision, outputFormat)
+    if filename is not None:
+        pack_exr_image(filename, data, precision, metadata)
+
+# Output formats (identifier, name, description)
+OUTPUT_FORMATS = [
+    ('ATLAS', 'Image Atlas', 'Image with a tile for each Z layer'),
+    ('BRICKS', 'Sparse Bricks', 'NumPy .npz with only the occupied 8x8x8 bricks of the volume (see sparse_bricks.py)'),
+    ('SEQUENCE', 'Delta Sequence', 'Frame Range only - one file for each volume with keyframes and the per-voxel changes between frames (see volume_sequence.py)'),
+    ]
+
 class Fluid2EXR_Operator(bpy.types.Operator):
     """Convert a fluid domain into an EXR image file"""
     
@@ -329,6 +352,29 @@ class Fluid2EXR_Operator(bpy.types.Operator):
     frameNo: bpy.props.IntProperty(description='Enter the frame to convert', name='Frame')
     #smokeCacheName: bpy.props.StringProperty(description="The selection object's smoke cache name", name="Cache Name")
     multiRow: bpy.props.BoolProperty(description='Create multi-row image instead of a single row of tiles', name="Multi-Row")
+    useFrameRange: bpy.props.BoolProperty(description='Convert a range of frames (Start to End) instead of just Frame', name="Frame Range")
+    startFrame: bpy.props.IntProperty(description='First frame to convert', name='Start')
+    endFrame: bpy.props.IntProperty(description='Last frame to convert', name='End')
+    frameStep: bpy.props.IntProperty(description='Convert every nth frame', name='Step', default=1, min=1)
+    threads: bpy.props.IntProperty(description='Number of threads used to build and save the images for a frame range (0 = one per CPU)', name='Threads', default=0, min=0)
+    readCache: bpy.props.BoolProperty(description='Read the grids from the baked cache files (UNI or RAW format) instead of evaluating the scene for each frame', name='Read Baked Cache')
+    workers: bpy.props.IntProperty(description='Read Baked Cache - number of worker processes reading the cache files for a frame range (0 = one per CPU, 1 = none)', name='Workers', default=0, min=0)
+    crop: bpy.props.BoolProperty(description='Crop the images to the region where any exported grid exceeds the threshold (over all the frames converted)', name='Crop')
+    cropThreshold: bpy.props.FloatProperty(description='Values above this are treated as occupied when cropping', name='Crop Threshold', default=DEFAULT_THRESHOLD, min=0.0)
+    outputFormat: bpy.props.EnumProperty(items=OUTPUT_FORMATS, default='ATLAS', description='What to write for each volume', name='Output')
+    tolerance: bpy.props.FloatProperty(description='Delta Sequence - maximum error of the stored values (0 = lossless)', name='Tolerance', default=DEFAULT_TOLERANCE, min=0.0, precision=5)
+    keyframeInterval: bpy.props.IntProperty(description='Delta Sequence - store a whole frame every nth frame', name='Keyframe Interval', default=DEFAULT_KEYFRAME_INTERVAL, min=1)
+    sequenceCompression: bpy.props.EnumProperty(items=[(name, name, name+' compression') for name in COMPRESSORS], default='ZLIB', description='Delta Sequence - compression of each frame', name='Compression')
+    lodLevels: bpy.props.IntProperty(description='Also export 1/2, 1/4, 1/8 resolution versions (up to 3 levels) of each volume, named <name>_lod1, _lod2, _lod3', name='LOD Levels', default=0, min=0, max=MAX_LOD_LEVELS)
+    lodFilter: bpy.props.EnumProperty(items=LOD_FILTERS, default='BOX', description='How each 2x2x2 block of voxels is reduced for the LOD levels', name='LOD Filter')
+    profile: bpy.props.BoolProperty(description='Write a JSON report of the time taken by each stage of the export (next to the blend file)', name='Profile')
+    profileMemory: bpy.props.BoolProperty(description='Profile - also record the peak memory of each stage with tracemalloc (slows the export down)', name='Profile Memory')
+    precision: bpy.props.EnumProperty(items=PRECISIONS, default='FLOAT', description='Precision of the saved images', name='Precision')
+    packChannels: bpy.props.BoolProperty(description='Create one image with a grid in each channel (see R, G, B, A) instead of an image for each grid', name='Pack Channels')
+    channelR: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[0]), description='Grid packed into the red channel', name='R')
+    channelG: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[1]), description='Grid packed into the green channel', name='G')
+    channelB: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[2]), description='Grid packed into the blue channel', name='B')
+    channelA: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[3]), description='Grid packed into the alpha channel', name='A')
        
 
     def __init__(self):
@@ -346,6 +392,8 @@ class Fluid2EXR_Operator(bpy.types.Operator):
         wm = context.window_manager
         
         self.frameNo = context.scene.frame_current
+        self.startFrame = context.scene.frame_start
+        self.endFrame = context.scene.frame_end
         
         #viewWidth = bpy.context.area.width * 0.8
         #
@@ -395,8 +443,65 @@ class Fluid2EXR_Operator(bpy.types.Operator):
         #hiresMultiplier = 1
         
         #convert_volume_to_exr(self.domainObject, "%s_%06i", self.frameNo, self.multiRow, hiresMultiplier=hiresMultiplier)
-        convert_volume_to_exr(self.domainObject, "%s_%06i", self.frameNo, self.multiRow)
+        # One image with the chosen grid in each channel instead of an image for each grid
+        channelMap = None
+        if self.packChannels:
+            channelMap = channel_map_from_ids((self.channelR, self.channelG, self.channelB, self.channelA))
+
+        cropThreshold = self.cropThreshold if self.crop else None
+
+        if self.outputFormat == 'SEQUENCE' and not self.useFrameRange:
+            self.report({'ERROR'}, 'Delta Sequence output needs a Frame Range')
+            return {"CANCELLED"}
+
+        mantaCache = None
+        if self.readCache:
+            mantaCache = self.manta_cache()
+            if mantaCache is None:
+                return {"CANCELLED"}
+
+        if self.profile:
+            start_profile("Fluid2EXR %s %s" % (self.domainObject.name, ("frames %i-%i" % (self.startFrame, self.endFrame)) if self.useFrameRange else ("frame %i" % self.frameNo)), self.profileMemory)
+        try:
+            self.convert(context, channelMap, cropThreshold, mantaCache)
+        finally:
+            if self.profile:
+                finish_profile(bpy.path.abspath('//')+"fluid2exr_profile_%s.json" % time.strftime("%Y%m%d_%H%M%S"))
         return {'FINISHED'}
+
+    # The baked cache of the domain (see manta_cache.py) or None (with the error reported) if it can't be read
+    def manta_cache(self):
+        domainSettings = self.domainSettings
+        for cacheFormat in (domainSettings.cache_data_format, domainSettings.cache_noise_format if domainSettings.use_noise else 'UNI'):
+            if cacheFormat not in CACHE_FORMATS:
+                self.report({'ERROR'}, "Can't read the %s cache format - only %s" % (cacheFormat, "/".join(CACHE_FORMATS)))
+                return None
+        mantaCache = MantaCache(bpy.path.abspath(domainSettings.cache_directory), domain_dimensions(self.domainObject),
+            domainSettings.noise_scale if domainSettings.use_noise else None, domainSettings.cache_data_format,
+            domainSettings.cache_noise_format if domainSettings.use_noise else 'UNI', smoke_flow_color(domainSettings))
+        if len(mantaCache.frames()) == 0:
+            self.report({'ERROR'}, "No baked frames found in %s" % mantaCache.directory)
+            return None
+        print(str(mantaCache))
+        return mantaCache
+
+    # The conversion itself - separate from execute so that all of it is in the profile
+    def convert(self, context, channelMap, cropThreshold, mantaCache=None):
+        if self.useFrameRange:
+            frames = range(self.startFrame, self.endFrame+1, self.frameStep)
+            if mantaCache is not None:
+                # Only the frames that have been baked
+                bakedFrames = set(mantaCache.frames())
+                frames = [frameno for frameno in frames if frameno in bakedFrames]
+            currentFrame = context.scene.frame_current
+            try:
+                convert_volume_range_to_exr(self.domainObject, "%s_%06i", frames, self.multiRow, threads=self.threads, channelMap=channelMap, precision=self.precision, cropThreshold=cropThreshold, outputFormat=self.outputFormat,
+                    tolerance=self.tolerance, keyframeInterval=self.keyframeInterval, sequenceCompression=self.sequenceCompression, lodLevels=self.lodLevels, lodFilter=self.lodFilter,
+                    mantaCache=mantaCache, workers=self.workers)
+            finally:
+                context.scene.frame_set(currentFrame)
+        else:
+            convert_volume_to_exr(self.domainObject, "%s_%06i", self.frameNo, self.multiRow, channelMap=channelMap, precision=self.precision, cropThreshold=cropThreshold, outputFormat=self.outputFormat, lodLevels=self.lodLevels, lodFilter=self.lodFilter, mantaCache=mantaCache)
     
 
 #Run it....
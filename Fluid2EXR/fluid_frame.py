@@ -0,0 +1,285 @@
+# Author: Rich Sedman
+# Description: Work out which images to create from the grids of a fluid domain and copy the grids out
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - split out of fetch_volume_images so that the images for a frame can be made from
+#                   grids read from the baked cache files (manta_cache.py) in a worker process (no dependency on bpy)
+##################################################################################################################
+
+# 'domain_settings' is either the evaluated Fluid modifier's domain settings or anything with the same attributes
+# (domain_resolution, use_noise, noise_scale and the '..._grid' arrays) - see MantaCacheFrame.
+
+import numpy as np
+
+from .profiling import span
+
+# Float32 buffers for the domain grids - allocated the first time each grid is fetched and then re-used (so long as the
+# size doesn't change) rather than creating new arrays for every frame
+class GridBuffers():
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name, size):
+        buffer = self.buffers.get(name)
+        if buffer is None or len(buffer) != size:
+            buffer = np.empty(size, dtype=np.float32)
+            self.buffers[name] = buffer
+        return buffer
+
+grid_buffers = GridBuffers()
+
+# Copy one of the domain grids (eg, 'density_grid') into its buffer and return the buffer. The grid's length is taken
+# from RNA (no voxels are read) so the buffer can be sized before copying.
+def fetch_grid(domain_settings, name, buffers):
+    grid = getattr(domain_settings, name)
+    size = len(grid)
+    if isinstance(grid, np.ndarray):
+        # Already a float32 array (eg, read from the cache files) - nothing to copy
+        return grid
+    buffer = buffers.get(name, size)
+    with span('fetch', grid=name, size=size):
+        try:
+            grid.foreach_get(buffer)
+        except AttributeError:
+            # No foreach_get for property arrays before 2.83
+            buffer[:] = grid[:]
+    return buffer
+
+# Grids that can be packed into the channels of a single image (identifier, name, description). 'NONE' leaves the
+# channel empty (0.0, or 1.0 for alpha).
+PACK_FIELDS = [
+    ('NONE', 'None', 'Channel not used'),
+    ('density', 'Density', 'Smoke density'),
+    ('flame', 'Flame', 'Flame'),
+    ('heat', 'Heat', 'Heat'),
+    ('temperature', 'Temperature', 'Temperature'),
+    ('velocity_x', 'Velocity X', 'Velocity (X)'),
+    ('velocity_y', 'Velocity Y', 'Velocity (Y)'),
+    ('velocity_z', 'Velocity Z', 'Velocity (Z)'),
+    ('color_r', 'Color R', 'Smoke color (red)'),
+    ('color_g', 'Color G', 'Smoke color (green)'),
+    ('color_b', 'Color B', 'Smoke color (blue)'),
+    ('color_a', 'Color A', 'Smoke color (alpha)'),
+    ]
+DEFAULT_CHANNEL_MAP = ('density', 'flame', 'heat', 'temperature')
+
+# Identifier (in PACK_FIELDS) for the grid name (or None)
+def channel_id(fieldName):
+    return 'NONE' if fieldName is None else fieldName
+
+# Channel map as (R, G, B, A) grid names (None for unused) from the 'NONE'/grid identifiers of PACK_FIELDS
+def channel_map_from_ids(channelIds):
+    return tuple(None if channelId == 'NONE' else channelId for channelId in channelIds)
+
+# Name of the packed image - includes the grid in each channel (R, G, B, A) so the layout is known from the filename
+def packed_image_name(channelMap):
+    return "pack-" + "-".join("none" if fieldName is None else fieldName for fieldName in channelMap)
+
+# The single image for the channel map from the fetched 'grids' (name -> buffer). Empty grids leave the channel empty.
+# The grids must all be lowres or all hires since they share the image.
+def pack_volume_image(channelMap, grids, lowresDimensions, hiresDimensions, lowresgridsize, hiresgridsize):
+    fieldNames = []
+    for fieldName in channelMap:
+        if fieldName is not None and len(grids[fieldName]) == 0:
+            print("Grid '%s' is empty - channel left empty" % fieldName)
+            fieldName = None
+        fieldNames.append(fieldName)
+
+    sizes = {len(grids[fieldName]) for fieldName in fieldNames if fieldName is not None}
+    if sizes == {lowresgridsize} or len(sizes) == 0:
+        dimensions = lowresDimensions
+    elif sizes == {hiresgridsize}:
+        dimensions = hiresDimensions
+    else:
+        print("Can't pack grids of different sizes (%s) into the same image : %s" % (str(sizes), str(channelMap)))
+        return []
+
+    buffers = tuple(None if fieldName is None else grids[fieldName] for fieldName in fieldNames)
+    return [(packed_image_name(fieldNames), dimensions, buffers)]
+
+# Copy the grids of the domain settings into 'buffers'. Returns the images to build as a list of
+# (name, dimensions, (R, G, B, A buffers)) - the buffers are only valid until 'buffers' is next used. If channelMap
+# (R, G, B, A grid names - see PACK_FIELDS) is given then a single image with those grids packed into its channels is
+# returned instead.
+def domain_images(domain_settings, buffers=grid_buffers, channelMap=None):
+
+    #if ...not smoke: 
+    #
+    #    print("Only 'smoke' type is currently processed - found "+str(flavor))
+    #else:
+    #    smokeversion = ....
+    #    print("Smoke version = "+str(smokeversion))
+    #    
+    #    (fluid_fields,active_fields, res_x, res_y, res_z, dx) = ......
+    #    print("Got fields %i\t%i\t%i\t%i\t%i\t%f" % (fluid_fields,active_fields, res_x, res_y, res_z, dx))
+    res_x = domain_settings.domain_resolution[0]
+    res_y = domain_settings.domain_resolution[1]
+    res_z = domain_settings.domain_resolution[2]
+    lowresgridsize = res_x * res_y * res_z
+    
+    if domain_settings.use_noise:
+        hires_x = res_x * (domain_settings.noise_scale)
+        hires_y = res_y * (domain_settings.noise_scale)
+        hires_z = res_z * (domain_settings.noise_scale)
+        hiresgridsize = hires_x * hires_y * hires_z
+    else:
+        hiresgridsize = lowresgridsize
+    
+    SM_ACTIVE_HEAT		= 1
+    SM_ACTIVE_FIRE		= 2
+    SM_ACTIVE_COLORS	= 4
+    SM_ACTIVE_COLOR_SET	= 8
+
+    #shadow = ....
+    density = fetch_grid(domain_settings, 'density_grid', buffers)
+
+    heat = None
+    heatold = None
+    #if (...doing heat) > 0:
+    #    heat = ....
+    #    heatold = ....
+        
+    flame = None
+    fuel = None
+    react = None
+    #if (....doing burny...) > 0:
+    #    flame = ....
+    #    fuel = ....
+    #    react = ....
+    flame = fetch_grid(domain_settings, 'flame_grid', buffers)
+    heat = fetch_grid(domain_settings, 'heat_grid', buffers)
+    #...what about 'temperature_grid'?
+    
+    #x,y,z for each voxel - split into 3 separate arrays below
+    velocityxyz = fetch_grid(domain_settings, 'velocity_grid', buffers)
+    
+    #rgb_r = None
+    #rgb_g = None
+    #rgb_b = None
+    colorrgb = fetch_grid(domain_settings, 'color_grid', buffers)
+    #    rgb_r = ....
+    #    rgb_g = ....
+    #    rgb_b = ....
+        
+    #obstacles = ....
+
+    #extrafields = f.read(45*4)
+    #rec = struct.unpack("fffffffffffiiifffffffffffffffffffiiiiiiiiifff",extrafields)
+    #print("Extra Fields = "+str(rec))
+    
+    #hires_density = ....
+    #hires_flame = ....
+    #hires_fuel = ....
+    #hires_react = ....
+
+    #hires_rgb_r = None
+    #hires_rgb_g = None
+    #hires_rgb_b = None
+    #if (....doing colours(hires)...) > 0:
+    #    hires_rgb_r = ....
+    #    hires_rgb_g = ....
+    #    hires_rgb_b = ....
+
+    #tcu = ....
+    #tcv = ....
+    #tcw = ....
+
+    if channelMap is not None:
+        grids = {
+            'density': density,
+            'flame': flame,
+            'heat': heat,
+            'velocity_x': velocityxyz[0::3],
+            'velocity_y': velocityxyz[1::3],
+            'velocity_z': velocityxyz[2::3],
+            'color_r': colorrgb[0::4],
+            'color_g': colorrgb[1::4],
+            'color_b': colorrgb[2::4],
+            'color_a': colorrgb[3::4],
+            }
+        if 'temperature' in channelMap:
+            grids['temperature'] = fetch_grid(domain_settings, 'temperature_grid', buffers)
+        hiresDimensions = (hires_x, hires_y, hires_z) if domain_settings.use_noise else (res_x, res_y, res_z)
+        return pack_volume_image(channelMap, grids, (res_x, res_y, res_z), hiresDimensions, lowresgridsize, hiresgridsize)
+
+    images = []
+
+    if len(density) == lowresgridsize:
+        images.append(("smoke", (res_x, res_y, res_z), (density, density, density, None)))
+    elif len(density) == hiresgridsize:
+        images.append(("hires_smoke", (hires_x, hires_y, hires_z), (density, density, density, None)))
+    else:
+        print("density_grid unexpected size (%i)" % len(density))
+
+    if len(flame) == lowresgridsize:
+        images.append(("flame", (res_x, res_y, res_z), (flame, flame, flame, None)))
+    elif len(flame) == hiresgridsize:
+        images.append(("hires_flame", (hires_x, hires_y, hires_z), (flame, flame, flame, None)))
+    else:
+        print("flame_grid unexpected size (%i)" % len(flame))
+
+    if len(heat) == lowresgridsize:
+        images.append(("heat", (res_x, res_y, res_z), (heat, heat, heat, None)))
+    elif len(heat) == hiresgridsize:
+        images.append(("hires_heat", (hires_x, hires_y, hires_z), (heat, heat, heat, None)))
+    else:
+        print("heat_grid unexpected size (%i)" % len(heat))
+
+    if velocityxyz.any() and len(velocityxyz > 0):
+        velocityx = velocityxyz[0::3]   #Every 3rd element, starting at 0
+        velocityy = velocityxyz[1::3]   #Every 3rd element, starting at 1
+        velocityz = velocityxyz[2::3]   #Every 3rd element, starting at 2
+
+        if len(velocityxyz) == lowresgridsize*3:
+            images.append(("velocity", (res_x, res_y, res_z), (velocityx, velocityy, velocityz, None)))
+        elif len(velocityxyz) == hiresgridsize*3:
+            images.append(("hires_velocity", (hires_x, hires_y, hires_z), (velocityx, velocityy, velocityz, None)))
+        else:
+            print("velocity_grid unexpected size (%i)" % len(velocityxyz))
+
+    if colorrgb.any() and len(colorrgb) > 0:
+        colorr = colorrgb[0::4]   #Every 4th element, starting at 0
+        colorg = colorrgb[1::4]   #Every 4th element, starting at 1
+        colorb = colorrgb[2::4]   #Every 4th element, starting at 2
+        colora = colorrgb[3::4]   #Every 4th element, starting at 3
+
+        if len(colorrgb) == lowresgridsize*4:
+            images.append(("color", (res_x, res_y, res_z), (colorr, colorg, colorb, colora)))
+        elif len(colorrgb) == hiresgridsize*4:
+            images.append(("hires_color", (hires_x, hires_y, hires_z), (colorr, colorg, colorb, colora)))
+        else:
+            print("color_grid unexpected size (%i)" % len(colorrgb))
+
+    #TODO: Get HIRES working correctly
+    #print("WARNING: HIRES not working for flame, fuel, react")
+    #hires_rgb_b = None
+    #hires_flame = None
+    #hires_density = None
+
+    #if rgb_b != None:
+    #    build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), rgb_r, rgb_g, rgb_b, None, multiRow=multiRow)
+    #else:
+    #    build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), density, density, density, None, multiRow=multiRow)
+
+    #if hires_rgb_b != None:
+    #    build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_rgb_r, hires_rgb_g, hires_rgb_b, None, multiRow=multiRow)          #TODO: This also seems to be 'wrong' if multi-colored!!!!
+    #else:
+    #    if hires_density != None:
+    #        build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_density, hires_density, hires_density, None, multiRow=multiRow)
+
+    #if velocity_grid != None:
+    #    build_exr_from_buffers(gen_filename("velocity",oPattern, oframeno), (res_x, res_y, res_z), vx, vy, vz, None, multiRow=multiRow)
+
+    #if flame != None:
+    #    build_exr_from_buffers(gen_filename("flame_heat_fuel",oPattern, oframeno), (res_x, res_y, res_z), flame, heat, fuel, None, multiRow=multiRow)
+            
+    #if hires_flame != None:
+    #    #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)
+        #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x, res_y, res_z), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
+    #    build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
+
+
+    #f.close()
+
+    return images
@@ -0,0 +1,64 @@
+# Author: Rich Sedman
+# Description: Reduced resolution (LOD) versions of the exported volumes - 1/2, 1/4, 1/8 by 2x2x2 box or max filter
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR)
+##################################################################################################################
+
+# Each level halves the resolution of the one before in x, y and z. Each voxel of the new level is the average ('BOX')
+# or the maximum ('MAX' - thin wisps don't fade away) of the 2x2x2 block of voxels it covers. Odd sizes are rounded up
+# by repeating the last layer. The images for a level are named as the full resolution image plus '_lod<level>', so
+# eg, smoke_lod2 is a quarter of the resolution of smoke. Note that this has no dependency on bpy.
+
+import numpy as np
+
+from .atlas import as_float_array
+
+# Filters (identifier, name, description)
+LOD_FILTERS = [
+    ('BOX', 'Box', 'Average of each 2x2x2 block of voxels'),
+    ('MAX', 'Max', 'Maximum of each 2x2x2 block of voxels (thin features are kept)'),
+    ]
+
+MAX_LOD_LEVELS = 3
+
+# Halve the resolution of the volume - returns (dimensions, buffer) of the result
+def downsample(dimensions, buffer, filter='BOX'):
+    (sizeX, sizeY, sizeZ) = (int(dimensions[0]), int(dimensions[1]), int(dimensions[2]))
+    volume = as_float_array(buffer)[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+
+    # Repeat the last layer in any odd dimension
+    if sizeX % 2 or sizeY % 2 or sizeZ % 2:
+        volume = np.pad(volume, ((0, sizeZ % 2), (0, sizeY % 2), (0, sizeX % 2)), mode='edge')
+
+    (newX, newY, newZ) = (-(-sizeX // 2), -(-sizeY // 2), -(-sizeZ // 2))
+    blocks = volume.reshape(newZ, 2, newY, 2, newX, 2)
+    if filter == 'MAX':
+        result = blocks.max(axis=(1, 3, 5))
+    else:
+        result = blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+    return ((newX, newY, newZ), np.ascontiguousarray(result, dtype=np.float32).reshape(-1))
+
+def lod_name(name, level):
+    return "%s_lod%i" % (name, level)
+
+# The reduced resolution versions (levels 1 to 'levels') of an image (name, dimensions, (R, G, B, A) buffers) - returns
+# a list of (name, dimensions, buffers). A buffer used for several channels is only downsampled once.
+def lod_images(name, dimensions, buffers, levels, filter='BOX'):
+    images = []
+    for level in range(1, min(levels, MAX_LOD_LEVELS)+1):
+        newDimensions = None
+        done = {}
+        lodBuffers = []
+        for buffer in buffers:
+            if buffer is None:
+                lodBuffers.append(None)
+                continue
+            if id(buffer) not in done:
+                (newDimensions, done[id(buffer)]) = downsample(dimensions, buffer, filter)
+            lodBuffers.append(done[id(buffer)])
+        if newDimensions is None:
+            newDimensions = tuple(-(-int(size) // 2) for size in dimensions)
+        (dimensions, buffers) = (newDimensions, tuple(lodBuffers))
+        images.append((lod_name(name, level), dimensions, buffers))
+    return images
@@ -0,0 +1,218 @@
+# Author: Rich Sedman
+# Description: Read the grids of a baked Mantaflow (Fluid modifier) cache directly from the cache files
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+# 0.02 18/10/2026 : Without baked color grids color_grid is the fixed smoke color (as the modifier's) - 'activeColor'
+##################################################################################################################
+
+# The baked grids of a smoke domain are in the domain's cache directory as :
+#
+#   data/<grid>_<frame, 4 digits>.<uni|raw>        eg, data/density_0012.uni
+#   noise/<grid>_noise_<frame>.<uni|raw>           (noise - hires - grids, eg, noise/density_noise_0012.uni)
+#
+# '.uni' files (Mantaflow's format) are gzip compressed :
+#
+#   4       'MNT3' (or 'MNT2' for older versions)
+#   ...     UniHeader - int dimX, dimY, dimZ, gridType, elementType (0 = int, 1 = real, 2 = vec3), bytesPerElement,
+#           char info[256], int dimT (MNT3 only), uint64 timestamp - native (little endian, 8 byte aligned) layout
+#   ...     dimX * dimY * dimZ elements (x varying fastest) - float (or double if built with double precision)
+#
+# '.raw' files are just the (gzip compressed) elements with no header, so the dimensions have to come from the domain.
+#
+# The grids are decompressed straight into NumPy arrays as they're read. MantaCacheFrame then looks like the Fluid
+# modifier's domain settings (density_grid, heat_grid, etc.) so the images are made from it as they are from the
+# evaluated domain (see domain_images in fluid_frame.py) - but without changing frame or evaluating the scene. There is
+# no dependency on bpy so frames can be read in worker processes. Note that OpenVDB caches aren't supported.
+
+import gzip
+import os
+import re
+import struct
+import numpy as np
+
+from .fluid_frame import GridBuffers, domain_images
+from .crop import frame_bounds
+from .profiling import span
+
+UNI_HEADERS = {
+    b'MNT3': struct.Struct("<6i256si4xQ"),
+    b'MNT2': struct.Struct("<6i256sQ"),
+    }
+
+UNI_ELEMENT_COMPONENTS = { 0: 1, 1: 1, 2: 3 }     # elementType -> values per element (int, real, vec3)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Cache file formats that can be read (cache_data_format / cache_noise_format -> file extension)
+CACHE_FORMATS = { 'UNI': '.uni', 'RAW': '.raw' }
+
+# Domain grid -> (directory, file name, values per voxel) for the lowres grid and then the noise grid (or None)
+MANTA_GRIDS = {
+    'density_grid': (('data', 'density', 1), ('noise', 'density_noise', 1)),
+    'flame_grid': (('data', 'flame', 1), ('noise', 'flame_noise', 1)),
+    'heat_grid': (('data', 'heat', 1), None),
+    'velocity_grid': (('data', 'vel', 3), None),
+    }
+
+# Color grids (r, g, b) - color_grid is these plus density as alpha
+MANTA_COLOR_GRIDS = (('data', ('color_r', 'color_g', 'color_b')), ('noise', ('color_r_noise', 'color_g_noise', 'color_b_noise')))
+
+def open_grid_file(filename):
+    with open(filename, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    return gzip.open(filename, "rb") if compressed else open(filename, "rb")
+
+# Read exactly len(buffer) bytes into the buffer (decompressing as it goes)
+def read_into(f, buffer, filename):
+    view = memoryview(buffer).cast('B')
+    offset = 0
+    while offset < len(view):
+        count = f.readinto(view[offset:])
+        if not count:
+            raise OSError("%s is truncated (%i of %i bytes)" % (filename, offset, len(view)))
+        offset += count
+
+# Read a '.uni' grid. Returns (dimensions, values per voxel, float32 array with x varying fastest).
+def read_uni(filename):
+    with open_grid_file(filename) as f:
+        magic = f.read(4)
+        if magic not in UNI_HEADERS:
+            raise OSError("%s is not a Mantaflow grid file (%s)" % (filename, str(magic)))
+        header = UNI_HEADERS[magic]
+        (dimX, dimY, dimZ, gridType, elementType, bytesPerElement) = header.unpack(f.read(header.size))[:6]
+
+        components = UNI_ELEMENT_COMPONENTS.get(elementType)
+        if components is None:
+            raise OSError("%s has an unknown element type (%i)" % (filename, elementType))
+        valueSize = bytesPerElement // components
+        if elementType == 0:
+            dtype = np.int32
+        else:
+            dtype = np.float64 if valueSize == 8 else np.float32
+
+        values = np.empty(dimX*dimY*dimZ*components, dtype=dtype)
+        read_into(f, values, filename)
+
+    if values.dtype != np.float32:
+        values = values.astype(np.float32)
+    return ((dimX, dimY, dimZ), components, values)
+
+# Read a '.raw' grid of the given number of float values
+def read_raw(filename, count):
+    values = np.empty(count, dtype=np.float32)
+    with open_grid_file(filename) as f:
+        read_into(f, values, filename)
+    return values
+
+# The baked cache of a domain. 'resolution' is the domain resolution (needed for '.raw' files), 'noiseScale' is the
+# noise upres factor (or None if noise isn't used). 'activeColor' is the (r, g, b) smoke color used for color_grid when
+# no color grids were baked - Blender's active_color, which isn't in the cache (None to leave color_grid empty).
+class MantaCache():
+
+    def __init__(self, directory, resolution, noiseScale=None, dataFormat='UNI', noiseFormat='UNI', activeColor=None):
+        for cacheFormat in (dataFormat, noiseFormat):
+            if cacheFormat not in CACHE_FORMATS:
+                raise ValueError("Cache format %s is not supported (only %s)" % (cacheFormat, "/".join(CACHE_FORMATS)))
+        self.directory = directory
+        self.resolution = tuple(int(size) for size in resolution)
+        self.noiseScale = noiseScale
+        self.extensions = { 'data': CACHE_FORMATS[dataFormat], 'noise': CACHE_FORMATS[noiseFormat] }
+        self.activeColor = activeColor
+
+    def __repr__(self):
+        return "MantaCache(%s, %s, noise %s)" % (self.directory, "x".join(str(size) for size in self.resolution), str(self.noiseScale))
+
+    def grid_filename(self, subdir, name, frameno):
+        return os.path.join(self.directory, subdir, "%s_%04i%s" % (name, frameno, self.extensions[subdir]))
+
+    # Frames with a baked density grid
+    def frames(self):
+        pattern = re.compile(r"density_(\d+)" + re.escape(self.extensions['data']) + "$")
+        try:
+            names = os.listdir(os.path.join(self.directory, 'data'))
+        except OSError:
+            return []
+        return sorted(int(match.group(1)) for match in map(pattern.match, names) if match)
+
+    # Read a grid - returns the values (float32, 'components' per voxel) or None if it wasn't baked
+    def read_grid(self, subdir, name, frameno, components=1):
+        filename = self.grid_filename(subdir, name, frameno)
+        if not os.path.exists(filename):
+            return None
+        with span('read', grid=name, frame=frameno):
+            if self.extensions[subdir] == '.uni':
+                return read_uni(filename)[2]
+            resolution = self.resolution
+            if subdir == 'noise':
+                resolution = [size * self.noiseScale for size in resolution]
+            return read_raw(filename, resolution[0]*resolution[1]*resolution[2]*components)
+
+    def frame(self, frameno):
+        return MantaCacheFrame(self, frameno)
+
+# The grids of one frame of the cache, with the same names as the Fluid modifier's domain settings. Each grid is read
+# when it's first used. Like the modifier, density_grid (etc.) is the noise grid if there is one.
+class MantaCacheFrame():
+
+    def __init__(self, cache, frameno):
+        self.cache = cache
+        self.frameno = frameno
+        self.domain_resolution = cache.resolution
+        self.use_noise = cache.noiseScale is not None
+        self.noise_scale = cache.noiseScale if self.use_noise else 1
+        self.grids = {}
+
+    def grid(self, name):
+        if name in self.grids:
+            return self.grids[name]
+
+        values = None
+        if name in MANTA_GRIDS:
+            (lowres, noise) = MANTA_GRIDS[name]
+            if self.use_noise and noise is not None:
+                values = self.cache.read_grid(noise[0], noise[1], self.frameno, noise[2])
+            if values is None:
+                values = self.cache.read_grid(lowres[0], lowres[1], self.frameno, lowres[2])
+        elif name == 'color_grid':
+            values = self.color_grid_values()
+
+        # Grids that weren't baked (or can't be read from the cache, eg, temperature) are empty, as with the modifier
+        if values is None:
+            values = np.zeros(0, dtype=np.float32)
+        self.grids[name] = values
+        return values
+
+    # RGBA - color r, g, b with density as alpha. Mantaflow only bakes color grids when the flows have different colors -
+    # otherwise, like the modifier, every voxel is the fixed smoke color with alpha 1.
+    def color_grid_values(self):
+        for (subdir, names) in (MANTA_COLOR_GRIDS if self.use_noise else MANTA_COLOR_GRIDS[:1]):
+            colors = [self.cache.read_grid(subdir, name, self.frameno) for name in names]
+            if all(color is not None for color in colors):
+                density = self.grid('density_grid')
+                if len(density) != len(colors[0]):
+                    continue
+                values = np.empty(len(density)*4, dtype=np.float32)
+                for (channel, color) in enumerate(colors + [density]):
+                    values[channel::4] = color
+                return values
+
+        if self.cache.activeColor is None:
+            return None
+        values = np.empty((len(self.grid('density_grid')), 4), dtype=np.float32)
+        values[:] = tuple(self.cache.activeColor) + (1.0,)
+        return values.reshape(-1)
+
+    def __getattr__(self, name):
+        if name.endswith('_grid'):
+            return self.grid(name)
+        raise AttributeError(name)
+
+# The images for a frame of the cache (see domain_images) - this can be run in a worker process. New buffers are used
+# for each frame (the grids are read into new arrays anyway).
+def load_manta_frame(cache, frameno, channelMap=None):
+    return domain_images(cache.frame(frameno), GridBuffers(), channelMap)
+
+# Region of the frame where any of the exported grids exceeds the threshold, in lowres voxels (see crop.py)
+def manta_frame_bounds(cache, frameno, channelMap=None, threshold=0.0):
+    return frame_bounds(load_manta_frame(cache, frameno, channelMap), cache.resolution, threshold)
@@ -0,0 +1,64 @@
+# Author: Rich Sedman
+# Description: Write an 8 or 16 bit RGBA PNG image directly from a NumPy array
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR) - for the normalised (uint8/uint16) output precisions
+# 0.02 18/10/2026 : Remove write_png - the images are only encoded in memory (encode_png)
+##################################################################################################################
+
+# PNG (see the PNG specification, w3.org/TR/png) is used for the normalised images since EXR has no 8 or 16 bit integer
+# pixel type. The file is :
+# 8         signature
+# ...       chunks - int length (big endian), 4 byte type, data, CRC32 of type and data
+#           IHDR (width, height, bit depth, color type 6 = RGBA, compression, filter, interlace)
+#           tEXt (keyword, 0, text) for each of the 'text' items (eg, the scale/offset to reconstruct the values)
+#           IDAT (zlib compressed lines, each prefixed by its filter type)
+#           IEND
+#
+# Every line uses the 'Up' filter (difference from the line above) which suits the smoothly varying volume data and is
+# a single array operation. Note that this has no dependency on bpy.
+
+import struct
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+COLOR_TYPES = { 1: 0, 2: 4, 3: 2, 4: 6 }    # Number of channels -> PNG color type (grey, grey+alpha, RGB, RGBA)
+
+FILTER_UP = 2
+
+def chunk(chunkType, data):
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data) & 0xffffffff)
+
+# Return the PNG file content for the image. 'pixels' is a (height, width, channels) uint8 or uint16 array with the
+# top line first. 'text' is a dictionary of any extra (keyword, text) items.
+def encode_png(pixels, text=None, level=6):
+
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    (height, width, numChannels) = pixels.shape
+    if pixels.dtype == np.uint8:
+        bitDepth = 8
+    elif pixels.dtype == np.uint16:
+        bitDepth = 16
+    else:
+        raise ValueError("PNG pixels must be uint8 or uint16 (not %s)" % str(pixels.dtype))
+
+    # Lines of bytes (16 bit values are big endian)
+    lines = np.ascontiguousarray(pixels, dtype=pixels.dtype.newbyteorder('>')).view(np.uint8).reshape(height, -1)
+
+    # 'Up' filter - each byte minus the byte above (the line above the first is taken as zero)
+    filtered = np.empty((height, lines.shape[1]+1), dtype=np.uint8)
+    filtered[:, 0] = FILTER_UP
+    filtered[0, 1:] = lines[0]
+    filtered[1:, 1:] = lines[1:] - lines[:-1]      # uint8 so wraps as required
+
+    data = PNG_SIGNATURE
+    data += chunk(b'IHDR', struct.pack(">IIBBBBB", width, height, bitDepth, COLOR_TYPES[numChannels], 0, 0, 0))
+    if text:
+        for keyword in sorted(text):
+            data += chunk(b'tEXt', keyword.encode('latin-1') + b'\0' + str(text[keyword]).encode('latin-1'))
+    data += chunk(b'IDAT', zlib.compress(filtered.tobytes(), level))
+    data += chunk(b'IEND', b'')
+    return data
@@ -0,0 +1,144 @@
+# Author: Rich Sedman
+# Description: Per-stage timing and memory of an export - wall time, CPU time and peak traced memory as a JSON report
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR)
+##################################################################################################################
+
+# Each stage of the export is wrapped in a span :
+#
+#   with span('encode', image=filename):
+#       ...
+#
+# which does nothing unless a profile has been started (start_profile) - so the conversion code doesn't need to pass
+# anything around, as with the block cache. Each span records :
+#
+#   wall            elapsed time (time.perf_counter)
+#   cpu             CPU time of the thread running the stage (time.thread_time) - stages may run on a pool of threads
+#   memoryPeak      peak memory traced by tracemalloc while the span was open (includes NumPy arrays), if the profile
+#                   was started with traceMemory (this slows down allocation so is optional). Spans running at the
+#                   same time on other threads share the same peak.
+#
+# finish_profile writes the spans and a total for each stage as JSON. Note that this has no dependency on bpy.
+
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+
+class ExportProfile():
+
+    def __init__(self, name, traceMemory=False):
+        self.name = name
+        self.traceMemory = traceMemory
+        self.spans = []
+        self.lock = threading.Lock()
+        self.openSpans = []         # [peak seen so far] for each open span - see fold_peak
+        self.started = time.time()
+        self.startWall = time.perf_counter()
+        self.startCpu = time.process_time()
+        self.tracing = False
+        if traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+
+    # tracemalloc only has a single peak, so before it's reset (when a span starts) the peak so far is folded into
+    # every span that's still open. Python before 3.9 can't reset it - the peak is then since tracing started.
+    def fold_peak(self, reset):
+        peak = tracemalloc.get_traced_memory()[1]
+        for openSpan in self.openSpans:
+            openSpan[0] = max(openSpan[0], peak)
+        if reset and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def span(self, stage, **details):
+        peak = None
+        if self.traceMemory:
+            with self.lock:
+                self.fold_peak(True)
+                peak = [tracemalloc.get_traced_memory()[0]]
+                self.openSpans.append(peak)
+
+        start = time.perf_counter()
+        startCpu = time.thread_time()
+        try:
+            yield
+        finally:
+            record = dict(details)
+            record.update({ 'stage': stage, 'start': start - self.startWall, 'wall': time.perf_counter() - start,
+                'cpu': time.thread_time() - startCpu, 'thread': threading.current_thread().name })
+            with self.lock:
+                if peak is not None:
+                    self.fold_peak(False)
+                    self.openSpans = [openSpan for openSpan in self.openSpans if openSpan is not peak]
+                    record['memoryPeak'] = peak[0]
+                self.spans.append(record)
+
+    # Total of each stage - { stage: { count, wall, cpu, memoryPeak } } in the order the stages were first seen
+    def stages(self):
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(record['stage'], { 'count': 0, 'wall': 0.0, 'cpu': 0.0 })
+            total['count'] += 1
+            total['wall'] += record['wall']
+            total['cpu'] += record['cpu']
+            if 'memoryPeak' in record:
+                total['memoryPeak'] = max(total.get('memoryPeak', 0), record['memoryPeak'])
+        return totals
+
+    def report(self):
+        report = { 'name': self.name, 'started': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            'wall': time.perf_counter() - self.startWall, 'cpu': time.process_time() - self.startCpu,
+            'stages': self.stages(), 'spans': sorted(self.spans, key=lambda record: record['start']) }
+        if self.traceMemory:
+            report['memoryPeak'] = max([record.get('memoryPeak', 0) for record in self.spans] + [tracemalloc.get_traced_memory()[1]])
+        return report
+
+    def close(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+# The profile being recorded (if any)
+active_profile = None
+
+def start_profile(name, traceMemory=False):
+    global active_profile
+    active_profile = ExportProfile(name, traceMemory)
+    return active_profile
+
+# Stop recording and write the report to 'filename' (if given). Returns the report.
+def finish_profile(filename=None):
+    global active_profile
+    profile = active_profile
+    if profile is None:
+        return None
+    active_profile = None
+
+    report = profile.report()
+    profile.close()
+    print(format_stages(report))
+    if filename is not None:
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=1)
+        print("Profile written to %s" % filename)
+    return report
+
+# Time the stage if a profile is being recorded (see ExportProfile.span)
+def span(stage, **details):
+    profile = active_profile
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.span(stage, **details)
+
+# Table of the stage totals for the console
+def format_stages(report):
+    lines = ["Profile %s : %.3fs wall, %.3fs CPU" % (report['name'], report['wall'], report['cpu'])]
+    for (stage, total) in report['stages'].items():
+        line = "  %-12s %5i  %9.3fs wall  %9.3fs CPU" % (stage, total['count'], total['wall'], total['cpu'])
+        if 'memoryPeak' in total:
+            line += "  %9.1f MB peak" % (total['memoryPeak'] / (1024.0*1024.0))
+        lines.append(line)
+    return "\n".join(lines)
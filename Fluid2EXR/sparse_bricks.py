@@ -0,0 +1,129 @@
+# Author: Rich Sedman
+# Description: Sparse brick volume format - write a volume as 8x8x8 bricks (only the occupied ones) and read it back
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version (as Smoke2EXR)
+##################################################################################################################
+
+# The volume is split into BRICK_SIZE^3 bricks and only bricks with a value above the threshold (in any field) are kept.
+# Saved as a compressed NumPy .npz with :
+#
+#   format          BRICK_FORMAT
+#   version         BRICK_VERSION
+#   dimensions      (x, y, z) of the volume in voxels
+#   brickSize       BRICK_SIZE
+#   threshold       Bricks with no value above this (in any field) are not stored - read back as 0.0
+#   fieldNames      Name of each field - the channels (R, G, B, A) it was exported to (eg, 'RGB' for density)
+#   brickIndex      int32 (bricksZ, bricksY, bricksX) - index of each brick in 'bricks' or -1 if empty
+#   bricks          float32 (number of bricks, fields, BRICK_SIZE (z), BRICK_SIZE (y), BRICK_SIZE (x))
+#
+# Bricks at the edge of the volume are padded with 0.0. This has no dependency on bpy (or anything but NumPy) so can
+# be used by analysis tools - see BrickVolume.
+
+import numpy as np
+
+from .atlas import as_float_array
+
+BRICK_FORMAT = "smoke2exr-bricks"
+BRICK_VERSION = 1
+BRICK_SIZE = 8
+
+CHANNELS = "RGBA"
+
+# Split the buffer (x varying fastest) into bricks - returns a (bricksZ, bricksY, bricksX, B, B, B) array
+def volume_bricks(dimensions, buffer, brickSize=BRICK_SIZE):
+    (sizeX, sizeY, sizeZ) = (int(dimensions[0]), int(dimensions[1]), int(dimensions[2]))
+    (bricksX, bricksY, bricksZ) = [-(-size // brickSize) for size in (sizeX, sizeY, sizeZ)]
+
+    padded = np.zeros((bricksZ*brickSize, bricksY*brickSize, bricksX*brickSize), dtype=np.float32)
+    padded[:sizeZ, :sizeY, :sizeX] = as_float_array(buffer)[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+    return padded.reshape(bricksZ, brickSize, bricksY, brickSize, bricksX, brickSize).transpose(0, 2, 4, 1, 3, 5)
+
+# Write the R, G, B, A buffers (any can be None) as a sparse brick file. A buffer used for several channels is only
+# stored once. Returns the number of bricks stored.
+def write_bricks(filename, dimensions, buffers, threshold=0.0, brickSize=BRICK_SIZE):
+
+    # One field per distinct buffer, named by the channels it's used for
+    fields = []
+    fieldNames = []
+    for (channel, buffer) in zip(CHANNELS, buffers):
+        if buffer is None:
+            continue
+        for (index, field) in enumerate(fields):
+            if field is buffer:
+                fieldNames[index] += channel
+                break
+        else:
+            fields.append(buffer)
+            fieldNames.append(channel)
+
+    allBricks = np.stack([volume_bricks(dimensions, field, brickSize) for field in fields], axis=3) if len(fields) > 0 else None
+    if allBricks is None:
+        brickIndex = np.full([-(-int(size) // brickSize) for size in reversed(dimensions)], -1, dtype=np.int32)
+        bricks = np.zeros((0, 0, brickSize, brickSize, brickSize), dtype=np.float32)
+    else:
+        occupied = (np.abs(allBricks) > threshold).any(axis=(3, 4, 5, 6))
+        brickIndex = np.full(occupied.shape, -1, dtype=np.int32)
+        brickIndex[occupied] = np.arange(np.count_nonzero(occupied), dtype=np.int32)
+        bricks = allBricks[occupied]
+
+    with open(filename, "wb") as f:
+        np.savez_compressed(f, format=BRICK_FORMAT, version=BRICK_VERSION, dimensions=np.array(dimensions, dtype=np.int32),
+            brickSize=brickSize, threshold=threshold, fieldNames=np.array(fieldNames), brickIndex=brickIndex, bricks=bricks)
+
+    print("Bricks : %i of %i stored" % (len(bricks), brickIndex.size))
+    return len(bricks)
+
+# Read a sparse brick file. Dense (z, y, x) arrays of the whole volume or any part of it are built on demand from just
+# the bricks that cover the requested region.
+class BrickVolume():
+
+    def __init__(self, filename):
+        with np.load(filename) as data:
+            if str(data['format']) != BRICK_FORMAT or int(data['version']) > BRICK_VERSION:
+                raise ValueError("%s is not a supported brick file" % filename)
+            self.dimensions = tuple(int(size) for size in data['dimensions'])
+            self.brickSize = int(data['brickSize'])
+            self.threshold = float(data['threshold'])
+            self.fieldNames = [str(name) for name in data['fieldNames']]
+            self.brickIndex = data['brickIndex']
+            self.bricks = data['bricks']
+
+    def __repr__(self):
+        return "BrickVolume(%s, fields %s, %i of %i bricks)" % ("x".join(str(size) for size in self.dimensions), str(self.fieldNames), len(self.bricks), self.brickIndex.size)
+
+    # Index of the field for a channel ('R', 'G', 'B', 'A') or field name, or None if not stored
+    def field_index(self, field):
+        if field in self.fieldNames:
+            return self.fieldNames.index(field)
+        for (index, name) in enumerate(self.fieldNames):
+            if field in name:
+                return index
+        return None
+
+    # Dense (z, y, x) float32 array of the field over the region ((x0, y0, z0), (x1, y1, z1)) - x1/y1/z1 exclusive, the
+    # whole volume if region is None. Voxels in bricks that weren't stored are 0.0.
+    def dense(self, field='R', region=None):
+        if region is None:
+            region = ((0, 0, 0), self.dimensions)
+        ((x0, y0, z0), (x1, y1, z1)) = region
+        result = np.zeros((z1-z0, y1-y0, x1-x0), dtype=np.float32)
+
+        fieldIndex = self.field_index(field)
+        if fieldIndex is None:
+            return result
+
+        size = self.brickSize
+        (bz0, by0, bx0) = (z0 // size, y0 // size, x0 // size)
+        (bz1, by1, bx1) = (-(-z1 // size), -(-y1 // size), -(-x1 // size))
+        index = self.brickIndex[bz0:bz1, by0:by1, bx0:bx1]
+
+        # Copy each stored brick that overlaps the region
+        for (bz, by, bx) in zip(*np.nonzero(index >= 0)):
+            brick = self.bricks[index[bz, by, bx], fieldIndex]
+            (oz, oy, ox) = ((bz0+bz)*size, (by0+by)*size, (bx0+bx)*size)
+            (sz0, sy0, sx0) = (max(z0, oz), max(y0, oy), max(x0, ox))
+            (sz1, sy1, sx1) = (min(z1, oz+size), min(y1, oy+size), min(x1, ox+size))
+            result[sz0-z0:sz1-z0, sy0-y0:sy1-y0, sx0-x0:sx1-x0] = brick[sz0-oz:sz1-oz, sy0-oy:sy1-oy, sx0-ox:sx1-ox]
+
+        return result
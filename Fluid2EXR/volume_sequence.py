@@ -0,0 +1,238 @@
+# Author: Rich Sedman
+# Description: Volume sequence - a frame range of volumes as periodic keyframes plus per-voxel deltas in a single file
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+##################################################################################################################
+
+# Consecutive frames of a simulation are very similar so rather than storing each frame independently, every
+# 'keyframeInterval' frames is stored whole (a keyframe) and the frames in between as the difference from the previous
+# frame. Values are first quantized to integers - value = round(value / step) with step = 2 * tolerance, so the
+# reconstructed values are within 'tolerance' of the originals. The deltas are taken between the quantized frames, so
+# the error doesn't accumulate along the sequence. A tolerance of 0.0 is lossless - the float32 bit patterns are used
+# as the integers instead. The deltas are mostly zero or small and are stored in the narrowest of int8/int16/int32
+# that holds them, then compressed (zlib or LZMA).
+#
+# The file is :
+#
+#   8           VSEQ_MAGIC, uint32 version (little endian)
+#   ...         a record for each frame - the compressed fields one after another
+#   ...         index - UTF-8 JSON :
+#                   fields, tolerance, keyframeInterval, compression
+#                   frames - list of { frame, offset, size, keyframe, dimensions, dtypes (one per field) }
+#   12          uint64 offset of the index, VSEQ_MAGIC
+#
+# A frame is decoded from the nearest keyframe at or before it (see VolumeSequence.frame). A change of dimensions
+# (eg, adaptive domain) always starts a new keyframe. Note that this has no dependency on bpy.
+
+import json
+import lzma
+import struct
+import zlib
+import numpy as np
+
+from .atlas import as_float_array
+
+VSEQ_MAGIC = b'VSEQ'
+VSEQ_VERSION = 1
+
+DEFAULT_TOLERANCE = 0.0001
+DEFAULT_KEYFRAME_INTERVAL = 24
+
+COMPRESSORS = {
+    'ZLIB': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'LZMA': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    }
+
+DELTA_TYPES = (np.int8, np.int16, np.int32)
+
+# Distinct buffers of the R, G, B, A buffers (any can be None), each named by the channels it's used for (eg, 'RGB')
+# - returns (fieldNames, buffers)
+def channel_fields(buffers, channels="RGBA"):
+    fieldNames = []
+    fields = []
+    for (channel, buffer) in zip(channels, buffers):
+        if buffer is None:
+            continue
+        for (index, field) in enumerate(fields):
+            if field is buffer:
+                fieldNames[index] += channel
+                break
+        else:
+            fields.append(buffer)
+            fieldNames.append(channel)
+    return (fieldNames, fields)
+
+# Quantize the values to int32 (see above)
+def quantize(values, tolerance):
+    if tolerance == 0.0:
+        return values.astype(np.float32).view(np.int32)
+    quantized = np.rint(values / np.float32(2.0 * tolerance))
+    if len(quantized) > 0 and max(-quantized.min(), quantized.max()) > np.iinfo(np.int32).max:
+        raise ValueError("Values too large to quantize with tolerance %g" % tolerance)
+    return quantized.astype(np.int32)
+
+def dequantize(quantized, tolerance):
+    if tolerance == 0.0:
+        return quantized.view(np.float32).copy()
+    return quantized.astype(np.float32) * np.float32(2.0 * tolerance)
+
+# Narrowest integer type that holds all the values
+def narrowest(values):
+    if len(values) == 0:
+        return np.int8
+    (low, high) = (values.min(), values.max())
+    for dtype in DELTA_TYPES:
+        if low >= np.iinfo(dtype).min and high <= np.iinfo(dtype).max:
+            return dtype
+    return np.int32
+
+# Write a sequence of frames. Frames must be added in order (see add_frame) and the file is only complete once closed.
+class VolumeSequenceWriter():
+
+    def __init__(self, filename, fieldNames, tolerance=DEFAULT_TOLERANCE, keyframeInterval=DEFAULT_KEYFRAME_INTERVAL, compression='ZLIB'):
+        self.filename = filename
+        self.fieldNames = list(fieldNames)
+        self.tolerance = float(tolerance)
+        self.keyframeInterval = max(1, int(keyframeInterval))
+        self.compression = compression
+        self.compress = COMPRESSORS[compression][0]
+
+        self.frames = []
+        self.previous = None            # Quantized fields of the last frame added
+        self.previousDimensions = None
+        self.sinceKeyframe = 0
+        self.rawSize = 0
+
+        self.file = open(filename, "wb")
+        self.file.write(VSEQ_MAGIC + struct.pack("<I", VSEQ_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    # Add the next frame - 'buffers' is a value for each of the fields (any float buffer with x varying fastest)
+    def add_frame(self, frameno, dimensions, buffers):
+        dimensions = [int(size) for size in dimensions]
+        numVoxels = dimensions[0]*dimensions[1]*dimensions[2]
+        current = [quantize(as_float_array(buffer)[:numVoxels], self.tolerance) for buffer in buffers]
+
+        keyframe = self.previous is None or dimensions != self.previousDimensions or self.sinceKeyframe >= self.keyframeInterval
+        if keyframe:
+            values = current
+            self.sinceKeyframe = 0
+        else:
+            # int32 difference wraps, as does the sum when decoding, so this is exact even for the float bit patterns
+            values = [field - previous for (field, previous) in zip(current, self.previous)]
+        self.sinceKeyframe += 1
+
+        dtypes = [narrowest(field) for field in values]
+        data = self.compress(b''.join(field.astype(dtype).tobytes() for (field, dtype) in zip(values, dtypes)))
+
+        self.frames.append({ 'frame': int(frameno), 'offset': self.file.tell(), 'size': len(data), 'keyframe': keyframe,
+            'dimensions': dimensions, 'dtypes': [np.dtype(dtype).str for dtype in dtypes] })
+        self.file.write(data)
+
+        self.previous = current
+        self.previousDimensions = dimensions
+        self.rawSize += numVoxels * 4 * len(current)
+        return len(data)
+
+    # Write the index and close the file. Returns the file size.
+    def close(self):
+        if self.file is None:
+            return None
+        index = { 'fields': self.fieldNames, 'tolerance': self.tolerance, 'keyframeInterval': self.keyframeInterval,
+            'compression': self.compression, 'frames': self.frames }
+        indexOffset = self.file.tell()
+        self.file.write(json.dumps(index).encode('utf-8'))
+        self.file.write(struct.pack("<Q", indexOffset) + VSEQ_MAGIC)
+        size = self.file.tell()
+        self.file.close()
+        self.file = None
+        print("Sequence %s : %i frames, %i bytes (%i bytes as float32, %.1f%%)" % (self.filename, len(self.frames), size, self.rawSize, 100.0 * size / max(1, self.rawSize)))
+        return size
+
+# Read a sequence written by VolumeSequenceWriter. Any frame can be read - it's decoded from the nearest keyframe, or
+# from the last frame read if that's nearer (so reading the frames in order only decodes each one once).
+class VolumeSequence():
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            header = f.read(8)
+            if header[:4] != VSEQ_MAGIC or struct.unpack("<I", header[4:])[0] > VSEQ_VERSION:
+                raise ValueError("%s is not a supported volume sequence" % filename)
+            f.seek(-12, 2)
+            footer = f.read(12)
+            if footer[8:] != VSEQ_MAGIC:
+                raise ValueError("%s is incomplete (no index)" % filename)
+            indexOffset = struct.unpack("<Q", footer[:8])[0]
+            f.seek(indexOffset)
+            index = json.loads(f.read()[:-12].decode('utf-8'))
+
+        self.fieldNames = index['fields']
+        self.tolerance = index['tolerance']
+        self.keyframeInterval = index['keyframeInterval']
+        self.decompress = COMPRESSORS[index['compression']][1]
+        self.records = index['frames']
+        self.positions = { record['frame']: position for (position, record) in enumerate(self.records) }
+
+        self.lastPosition = None        # Position and quantized fields of the last frame decoded
+        self.last = None
+
+    def __repr__(self):
+        return "VolumeSequence(%s, fields %s, %i frames, %i keyframes)" % (self.filename, str(self.fieldNames), len(self.records), sum(1 for record in self.records if record['keyframe']))
+
+    @property
+    def frames(self):
+        return [record['frame'] for record in self.records]
+
+    def read_record(self, f, record):
+        f.seek(record['offset'])
+        data = self.decompress(f.read(record['size']))
+        dimensions = record['dimensions']
+        numVoxels = dimensions[0]*dimensions[1]*dimensions[2]
+        fields = []
+        offset = 0
+        for dtype in record['dtypes']:
+            dtype = np.dtype(dtype)
+            fields.append(np.frombuffer(data, dtype=dtype, count=numVoxels, offset=offset).astype(np.int32))
+            offset += numVoxels * dtype.itemsize
+        return fields
+
+    # Returns (dimensions, [values of each field]) for the frame - each a float32 array with x varying fastest
+    def frame(self, frameno):
+        if frameno not in self.positions:
+            raise KeyError("Frame %i is not in %s" % (frameno, self.filename))
+        position = self.positions[frameno]
+
+        start = position
+        while not self.records[start]['keyframe']:
+            start -= 1
+        if self.lastPosition is not None and start <= self.lastPosition <= position:
+            # Carry on from the last frame decoded
+            start = self.lastPosition + 1
+            current = self.last
+        else:
+            current = None
+
+        with open(self.filename, "rb") as f:
+            for record in self.records[start:position+1]:
+                values = self.read_record(f, record)
+                if record['keyframe']:
+                    current = values
+                else:
+                    current = [previous + delta for (previous, delta) in zip(current, values)]
+
+        self.lastPosition = position
+        self.last = current
+        return (tuple(self.records[position]['dimensions']), [dequantize(field, self.tolerance) for field in current])
+
+    # Values of one field for the frame - a (z, y, x) float32 array
+    def dense(self, frameno, field=None):
+        (dimensions, fields) = self.frame(frameno)
+        index = 0 if field is None else self.fieldNames.index(field)
+        return fields[index].reshape(dimensions[2], dimensions[1], dimensions[0])
@@ -8,6 +8,28 @@
 # 0.12 26/08/2019 : Improve efficiency of 'pack', add better diagnostics as to progress, implement 'multiRow' mode
 # 0.13 26/08/2019 : Fix bug in running on 2.79 (failed to pack image)
 # 0.14 28/08/2019 : Implement hires for density, fuel/react/heat, RGB
+# 0.15 18/10/2026 : Faster LZO decompression - copy literal runs and matches as slices, use native 'lzo' if available
+# 0.16 18/10/2026 : Support 'heavy' (LZMA) compressed point cache blocks
+# 0.17 18/10/2026 : Memory-map the point cache file (BPhysReader) - uncompressed blocks are no longer copied
+# 0.18 18/10/2026 : Index the point cache blocks and only decompress the fields needed for the selected exports
+# 0.19 18/10/2026 : Build the image with NumPy (tile atlas in a few array operations) and store it with foreach_set
+# 0.20 18/10/2026 : Convert a range of frames (Start/End/Step), reading the cache files in parallel worker processes
+# 0.21 18/10/2026 : Header-only scan of the point cache (frames, resolution, fields, compression), cached in a sidecar
+# 0.22 18/10/2026 : Write the EXR directly from the pixel array (exr_writer.py) - no temporary scene, optional half float
+# 0.23 18/10/2026 : Keep decompressed point cache blocks in an LRU cache so re-running on the same frame is faster
+# 0.24 18/10/2026 : Pack Channels - one image with a chosen field in each of R, G, B, A (layout in the filename)
+# 0.25 18/10/2026 : Output precision - float or half EXR, or 16/8 bit PNG normalised to each channel's range
+# 0.26 18/10/2026 : Crop - only export the region occupied over the frame range (offset/size in the image name)
+# 0.27 18/10/2026 : Sparse Bricks output - only the occupied 8x8x8 bricks of each volume in a .npz (sparse_bricks.py)
+# 0.28 18/10/2026 : LOD Levels - also export 1/2, 1/4, 1/8 resolution versions of each volume (box or max filter)
+# 0.29 18/10/2026 : Pack the encoded EXR/PNG straight into the blend file - no file written to the project directory
+# 0.30 18/10/2026 : Profile - JSON report of wall/CPU time (and optionally peak memory) for each stage of the export
+# 0.31 18/10/2026 : Command line batch converter (python -m Smoke2EXR28 - see batch_convert.py) - no Blender needed,
+#                   worker pool, JSON lines progress
+# 0.32 18/10/2026 : Block Workers - decompress the blocks of a single frame at once in a pool of processes
+# 0.33 18/10/2026 : Uncompressed caches - block layout worked out from the header, fields read with one np.fromfile
+# 0.34 18/10/2026 : Preview caches - rewrite a point cache at 1/2 or 1/4 resolution (python -m Smoke2EXR28.preview_cache,
+#                   see preview_cache.py and bphys_writer.py)
 ##################################################################################################################
 
 #TODO: Possibly bake Ambient Occlusion into the smoke color (optional setting)
@@ -15,7 +37,7 @@
 bl_info = {  
  "name": "Smoke2EXR",
  "author": "Rich Sedman",  
- "version": (0, 14),  
+ "version": (0, 34),  
  "blender": (2, 80, 0),  
  "location": "(operators)",  
  "description": "Provide a means of converting a smoke simulation into an image that can be used to access the smoke data independently of the simulation",  
@@ -24,9 +46,15 @@ bl_info = {
  "tracker_url": "",  
  "category": "Operator"}    #TODO: Don't know if this is correct!! 
 
-import bpy
+try:
+    import bpy
+except ImportError:
+    # Not running within Blender (eg, imported by a worker process when converting a frame range, or by the command line
+    # batch converter). Only the modules with no bpy dependency (bphys_reader, pointcache_frame, etc.) can be used.
+    bpy = None
 
-from .smoke2exr import Smoke2EXR_Operator
+if bpy is not None:
+    from .smoke2exr import Smoke2EXR_Operator
 
 #def menu_draw(self, context):
 #    #Force 'invoke' when calling operator
@@ -40,13 +68,16 @@ from .smoke2exr import Smoke2EXR_Operator
 #bpy.types.NODE_MT_add.append(menu_draw)
 ##TODO : Need to add it to Add/Group rather than Add
 
-classes = ( Smoke2EXR_Operator, )
-
 def add_to_panel(self, context):
     layout = self.layout
     layout.operator("operator.smoke2exr", text='Convert Smoke to EXR')
 
-bpy.types.PHYSICS_PT_smoke_cache.append(add_to_panel)
+if bpy is not None:
+    classes = ( Smoke2EXR_Operator, )
+
+    bpy.types.PHYSICS_PT_smoke_cache.append(add_to_panel)
+else:
+    classes = ()
 
 def register():
     from bpy.utils import register_class
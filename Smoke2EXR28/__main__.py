@@ -0,0 +1,7 @@
+# Command line batch converter - python -m Smoke2EXR28 <cache directory> ... (see batch_convert.py)
+
+import sys
+
+from .batch_convert import main
+
+sys.exit(main())
@@ -0,0 +1,290 @@
+# Author: Rich Sedman
+# Description: Convert a smoke point cache to EXR atlases from the command line - no Blender needed
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+# 0.02 18/10/2026 : Reject a --pack that mixes lowres and hires fields (exit status 2) rather than writing nothing
+##################################################################################################################
+
+# Run with the Python that has NumPy installed, from the directory containing the add-on (the package has to be
+# importable since the modules use relative imports) :
+#
+#   python -m Smoke2EXR28 <cache directory> [--cache-name smoke] [--start 1 --end 250 --step 1]
+#       [--fields SMOKE,VELOCITY | --pack density,flame,heat,none] [--layout multirow|row] [--precision FLOAT]
+#       [--format ATLAS|BRICKS] [--crop 0.001] [--lod-levels 2] [--workers 8] [--output <directory>]
+#
+# Each frame is read, built and written entirely in a worker process (the same code as the add-on - see
+# pointcache_frame.py, atlas.py, precision.py) so the only work done here is handing out frames. The files are named
+# as the add-on names the images (eg, 64_8x8_smoke_000012.exr) and written to the output directory.
+#
+# Progress is written to stdout (or --progress <file>) as JSON lines - one object per event :
+#
+#   {"event": "start", "frames": 250, "workers": 8, ...}
+#   {"event": "frame", "frame": 12, "files": [...], "bytes": 123456, "wall": 1.2, "cpu": 1.1, "done": 3, ...}
+#   {"event": "error", "frame": 13, "message": "..."}
+#   {"event": "finish", "done": 249, "failed": 1, "wall": 40.1, "framesPerSecond": 6.2, ...}
+#
+# Every event has the host name ('node') and time so a scheduler can track throughput per node. All other output (the
+# diagnostics printed while converting) goes to stderr. The exit status is 1 if any frame failed.
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+from .atlas import atlas_name, build_atlas
+from .bphys_reader import BPhysReader
+from .pointcache_frame import EXPORT_FIELDS, EXPORT_FIELDS_ALL, PACK_FIELDS, load_pointcache_frame, pointcache_frame_bounds
+from .precision import PRECISIONS, QUANTIZED_BITS, image_extension, channel_ranges, save_atlas
+from .crop import union_bounds, crop_image
+from .sparse_bricks import write_bricks
+from .lod import LOD_FILTERS, MAX_LOD_LEVELS, lod_images
+from .block_cache import block_cache
+from .pointcache_inventory import scan_pointcache
+
+OUTPUT_FORMATS = ('ATLAS', 'BRICKS')
+LAYOUTS = { 'multirow': True, 'row': False }
+
+# Settings for converting each frame (passed to the worker processes)
+BatchSettings = collections.namedtuple('BatchSettings', ['outputDir', 'pattern', 'multiRow', 'hiresMultiplier',
+    'exportFields', 'channelMap', 'precision', 'outputFormat', 'lodLevels', 'lodFilter', 'bounds'])
+
+# Write one volume (name, dimensions, (R, G, B, A buffers)) as an image atlas or brick file. Returns (filename, size).
+def write_volume(settings, name, frameno, dimensions, buffers):
+    filename = settings.pattern % (name, frameno)
+
+    if settings.outputFormat == 'BRICKS':
+        filepath = os.path.join(settings.outputDir, filename+'.npz')
+        write_bricks(filepath, dimensions, buffers)
+        return (filepath, os.path.getsize(filepath))
+
+    ranges = channel_ranges(buffers) if settings.precision in QUANTIZED_BITS else None
+    pixels = build_atlas(dimensions, buffers[0], buffers[1], buffers[2], buffers[3], multiRow=settings.multiRow)
+    basename = os.path.join(settings.outputDir, atlas_name(filename, dimensions, settings.multiRow))
+    (size, metadata) = save_atlas(basename, pixels, settings.precision, ranges)
+    return (basename+image_extension(settings.precision), size)
+
+# Convert one frame - read the cache file, crop, add the LOD levels and write each volume. Run in a worker process.
+# Returns the details for the progress event.
+def convert_frame(fname, frameno, settings):
+    start = time.perf_counter()
+    startCpu = time.process_time()
+
+    images = load_pointcache_frame(fname, settings.hiresMultiplier, settings.exportFields, settings.channelMap)
+    if settings.bounds is not None:
+        (bounds, lowresDimensions) = settings.bounds
+        images = [crop_image(name, dimensions, buffers, bounds, lowresDimensions) for (name, dimensions, buffers) in images]
+    images = images + [lod for image in images for lod in lod_images(*image, settings.lodLevels, settings.lodFilter)]
+
+    files = [write_volume(settings, name, frameno, dimensions, buffers) for (name, dimensions, buffers) in images]
+
+    return {
+        'frame': frameno,
+        'files': [filepath for (filepath, size) in files],
+        'bytes': sum(size for (filepath, size) in files),
+        'wall': time.perf_counter() - start,
+        'cpu': time.process_time() - startCpu,
+        'worker': os.getpid(),
+        }
+
+# Worker process set up - diagnostics go to stderr (stdout is for progress) and nothing is kept in the block cache
+# (each frame is only read once)
+def init_worker():
+    sys.stdout = sys.stderr
+    block_cache.set_budget(0)
+
+# Call function(fname, frameno, *args) for each (frameno, fname), yielding (frameno, result, error) as each one
+# completes (not necessarily in frame order). Up to workers*2 frames are in progress at once. If 'executor' is None
+# then the calls are made here.
+def map_frames(executor, workers, function, cachefiles, *args):
+
+    if executor is None:
+        for (frameno, fname) in cachefiles:
+            try:
+                yield (frameno, function(fname, frameno, *args), None)
+            except Exception as e:
+                yield (frameno, None, e)
+        return
+
+    pending = {}
+    frames = iter(cachefiles)
+    while True:
+        while len(pending) < workers*2:
+            nextFrame = next(frames, None)
+            if nextFrame is None:
+                break
+            (frameno, fname) = nextFrame
+            pending[executor.submit(function, fname, frameno, *args)] = frameno
+
+        if len(pending) == 0:
+            break
+
+        (done, notDone) = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            frameno = pending.pop(future)
+            error = future.exception()
+            yield (frameno, None if error is not None else future.result(), error)
+
+# Bounds wrapper for map_frames (pointcache_frame_bounds doesn't take the frame number)
+def frame_bounds_for(fname, frameno, hiresMultiplier, exportFields, channelMap, threshold):
+    return pointcache_frame_bounds(fname, hiresMultiplier, exportFields, channelMap, threshold)
+
+# Writes the progress events as JSON lines
+class ProgressReporter():
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.node = socket.gethostname()
+
+    def event(self, event, **details):
+        record = { 'event': event, 'node': self.node, 'time': time.time() }
+        record.update(details)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+# The cache files to convert - [(frameno, filename)] for the frames in the range. If no cache name is given then the
+# directory must only hold one cache.
+def find_cachefiles(cachedir, cacheName, startFrame, endFrame, step, hiresMultiplier):
+    inventory = [record for record in scan_pointcache(cachedir, cacheName, hiresMultiplier) if record['index'] == 0]
+    cacheNames = sorted({record['cacheName'] for record in inventory})
+    if len(cacheNames) > 1:
+        raise ValueError("%s holds several caches (%s) - use --cache-name" % (cachedir, ", ".join(cacheNames)))
+
+    frames = {record['frame']: os.path.join(cachedir, record['filename']) for record in inventory}
+    if startFrame is None:
+        startFrame = min(frames, default=0)
+    if endFrame is None:
+        endFrame = max(frames, default=-1)
+    return [(frameno, frames[frameno]) for frameno in range(startFrame, endFrame+1, step) if frameno in frames]
+
+def parse_list(value, allowed, name):
+    items = [item.strip() for item in value.split(",") if item.strip() != ""]
+    for item in items:
+        if item not in allowed:
+            raise argparse.ArgumentTypeError("unknown %s '%s' (one of %s)" % (name, item, ", ".join(allowed)))
+    return items
+
+def parse_args(argv):
+    exportIds = [field[0] for field in EXPORT_FIELDS]
+    packIds = [field[0].lower() if field[0] == 'NONE' else field[0] for field in PACK_FIELDS]
+
+    parser = argparse.ArgumentParser(prog="python -m Smoke2EXR28", description="Convert a smoke point cache (.bphys) to EXR image atlases without Blender")
+    parser.add_argument("cachedir", help="Point cache directory (eg, blendcache_<blend file name>)")
+    parser.add_argument("--cache-name", help="Name of the cache (the files are <name>_<frame>_00.bphys) - needed if the directory holds several caches")
+    parser.add_argument("--start", type=int, help="First frame (default - first frame in the cache)")
+    parser.add_argument("--end", type=int, help="Last frame (default - last frame in the cache)")
+    parser.add_argument("--step", type=int, default=1, help="Convert every nth frame")
+    parser.add_argument("--fields", type=lambda value: parse_list(value, exportIds, "field"), default=sorted(EXPORT_FIELDS_ALL), help="Images to create, comma separated (%s - default all)" % ",".join(exportIds))
+    parser.add_argument("--pack", type=lambda value: parse_list(value, packIds, "channel field"), help="Create one image with these 4 fields in R,G,B,A instead of --fields (eg, density,flame,heat,none)")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default='multirow', help="Tiles in a roughly square grid (multirow) or a single row")
+    parser.add_argument("--precision", choices=[precision[0] for precision in PRECISIONS], default='FLOAT', help="Precision of the images")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='ATLAS', help="Image atlas or sparse brick (.npz) files")
+    parser.add_argument("--hires-multiplier", type=int, default=1, help="Domain's noise 'amplify' + 1 (for the hires fields)")
+    parser.add_argument("--crop", type=float, metavar="THRESHOLD", help="Crop to the region where any exported field exceeds THRESHOLD over all the frames")
+    parser.add_argument("--lod-levels", type=int, default=0, choices=range(0, MAX_LOD_LEVELS+1), help="Also export 1/2, 1/4, 1/8 resolution versions")
+    parser.add_argument("--lod-filter", choices=[lodFilter[0] for lodFilter in LOD_FILTERS], default='BOX', help="How the LOD levels are reduced")
+    parser.add_argument("--workers", type=int, default=0, help="Number of worker processes (0 = one per CPU, 1 = no worker processes)")
+    parser.add_argument("--output", default=".", help="Directory for the images")
+    parser.add_argument("--pattern", default="%s_%06i", help="Image name pattern (name, frame)")
+    parser.add_argument("--progress", default="-", help="File for the JSON lines progress (default stdout)")
+
+    args = parser.parse_args(argv)
+    if args.pack is not None and len(args.pack) != 4:
+        parser.error("--pack needs 4 fields (R,G,B,A - 'none' for an unused channel)")
+    if args.pack is not None:
+        # The packed fields share the one image so must all be the same resolution (see plan_packed_image)
+        hiresFields = {name for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT if hires}
+        if len({fieldName in hiresFields for fieldName in args.pack if fieldName != 'none'}) > 1:
+            parser.error("--pack can't mix lowres and hires fields in the same image")
+    if args.step < 1:
+        parser.error("--step must be at least 1")
+    return args
+
+# Convert the frames, reporting progress. Returns the number of frames that failed.
+def run(args, progress):
+    workers = args.workers or os.cpu_count() or 1
+    channelMap = None
+    if args.pack is not None:
+        channelMap = tuple(None if fieldName == 'none' else fieldName for fieldName in args.pack)
+
+    cachefiles = find_cachefiles(args.cachedir, args.cache_name, args.start, args.end, args.step, args.hires_multiplier)
+    progress.event('start', cachedir=os.path.abspath(args.cachedir), frames=len(cachefiles), workers=workers,
+        firstFrame=cachefiles[0][0] if cachefiles else None, lastFrame=cachefiles[-1][0] if cachefiles else None)
+
+    os.makedirs(args.output, exist_ok=True)
+    settings = BatchSettings(args.output, args.pattern, LAYOUTS[args.layout], args.hires_multiplier, set(args.fields),
+        channelMap, args.precision, args.format, args.lod_levels, args.lod_filter, None)
+
+    executor = None
+    if workers > 1 and len(cachefiles) > 1:
+        context = multiprocessing.get_context('spawn')
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker)
+    else:
+        block_cache.set_budget(0)
+
+    start = time.perf_counter()
+    (done, failed, totalBytes) = (0, 0, 0)
+    try:
+        if args.crop is not None:
+            # Region occupied over the whole range (as the add-on - assumes the domain resolution doesn't change)
+            bounds = None
+            for (frameno, result, error) in map_frames(executor, workers, frame_bounds_for, cachefiles, args.hires_multiplier, settings.exportFields, channelMap, args.crop):
+                if error is not None:
+                    progress.event('error', frame=frameno, stage='bounds', message=str(error))
+                    continue
+                (frameBounds, lowresDimensions) = result
+                bounds = union_bounds(bounds, frameBounds)
+            if bounds is not None:
+                settings = settings._replace(bounds=(bounds, lowresDimensions))
+            progress.event('bounds', bounds=bounds, wall=time.perf_counter() - start)
+
+        for (frameno, result, error) in map_frames(executor, workers, convert_frame, cachefiles, settings):
+            elapsed = time.perf_counter() - start
+            if error is not None:
+                failed += 1
+                progress.event('error', frame=frameno, stage='convert', message="%s: %s" % (type(error).__name__, str(error)))
+                continue
+            done += 1
+            totalBytes += result['bytes']
+            progress.event('frame', done=done, failed=failed, total=len(cachefiles), elapsed=elapsed,
+                framesPerSecond=done / elapsed if elapsed > 0 else None, **result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    progress.event('finish', done=done, failed=failed, total=len(cachefiles), bytes=totalBytes, wall=elapsed,
+        framesPerSecond=done / elapsed if elapsed > 0 else None, bytesPerSecond=totalBytes / elapsed if elapsed > 0 else None)
+    return failed
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    progressFile = None
+    if args.progress == "-":
+        stream = sys.stdout
+    else:
+        stream = progressFile = open(args.progress, "a")
+    progress = ProgressReporter(stream)
+
+    try:
+        # Keep stdout for the progress - the diagnostics printed while converting go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            failed = run(args, progress)
+    except (OSError, ValueError) as e:
+        progress.event('error', message=str(e))
+        return 2
+    finally:
+        if progressFile is not None:
+            progressFile.close()
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
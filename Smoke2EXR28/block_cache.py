@@ -0,0 +1,81 @@
+# Author: Rich Sedman
+# Description: Process-wide LRU cache of decompressed point cache blocks
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - keep decompressed blocks (keyed by file, mtime and block offset) so that
+#                   re-running the conversion on the same frame doesn't have to decompress the file again
+# 0.02 18/10/2026 : Note that only blocks read in the Blender process are kept between runs (not in worker processes)
+##################################################################################################################
+
+# Blocks are kept until the total size exceeds the budget and then the least recently used blocks are discarded. As the
+# key includes the file's mtime a re-baked frame is never served from the cache (the old blocks just age out). Only
+# compressed blocks are cached - uncompressed blocks are read directly from the memory-mapped file anyway.
+#
+# Cached blocks are returned as read-only memoryviews since the same buffer is given to every caller. Note that this
+# has no dependency on bpy.
+#
+# Each process has its own cache, so blocks are only kept between runs of the operator when they're read in Blender
+# itself (a single frame, or a frame range with 'workers' 1). Frames read in the worker processes of a frame range go
+# into the worker's cache, which is discarded with the pool at the end of the run - set_budget in the operator
+# doesn't reach them.
+
+import collections
+import threading
+
+DEFAULT_BUDGET = 512*1024*1024
+
+class BlockCache():
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.blocks = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # Set the memory budget (in bytes) - 0 disables the cache
+    def set_budget(self, budget):
+        with self.lock:
+            self.budget = budget
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+            self.size = 0
+
+    # Return the cached block for the key (path, mtime, offset) or None if it's not cached
+    def get(self, key):
+        with self.lock:
+            buffer = self.blocks.get(key)
+            if buffer is None:
+                self.misses += 1
+                return None
+            self.blocks.move_to_end(key)
+            self.hits += 1
+            return memoryview(buffer).toreadonly()
+
+    # Add the block to the cache and return it as a read-only view. A block larger than the whole budget isn't kept.
+    def put(self, key, buffer):
+        with self.lock:
+            if len(buffer) <= self.budget:
+                previous = self.blocks.pop(key, None)
+                if previous is not None:
+                    self.size -= len(previous)
+                self.blocks[key] = buffer
+                self.size += len(buffer)
+                self.evict()
+            return memoryview(buffer).toreadonly()
+
+    # Discard the least recently used blocks until within budget (lock must be held)
+    def evict(self):
+        while self.size > self.budget and len(self.blocks) > 0:
+            (key, buffer) = self.blocks.popitem(last=False)
+            self.size -= len(buffer)
+
+    def __repr__(self):
+        return "BlockCache(%i blocks, %i of %i bytes, %i hits, %i misses)" % (len(self.blocks), self.size, self.budget, self.hits, self.misses)
+
+# The cache shared by every BPhysReader in this process
+block_cache = BlockCache()
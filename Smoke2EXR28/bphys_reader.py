@@ -0,0 +1,373 @@
+# Author: Rich Sedman
+# Description: Memory-mapped reader for Blender point cache (.bphys) files
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - memory-map the cache file so that uncompressed blocks are returned as views of
+#                   the file (no copy) and only compressed blocks are decompressed into new buffers
+# 0.02 18/10/2026 : Add build_index to scan the block layout in one pass (without decompressing anything) so that
+#                   individual fields can be decompressed only when they're actually requested (read_field_block)
+# 0.03 18/10/2026 : Keep decompressed blocks in the process-wide LRU block cache (block_cache.py)
+# 0.04 18/10/2026 : Add read_field_blocks - decompress several blocks of the frame at once in a pool of processes
+# 0.05 18/10/2026 : Work out the layout of a fully uncompressed cache from the header (uncompressed_index) and read
+#                   its fields with a single np.fromfile (read_uncompressed_fields)
+# 0.06 18/10/2026 : The obstacles block is one byte per voxel (Blender writes it as unsigned char) - add field_size
+# 0.07 18/10/2026 : The optional blocks depend on fluid_fields (not active_fields) and the hires flame/fuel/react are
+#                   only there with fire - as ptcache_smoke_write. Without fire the blocks after hires_density are tcu/v/w
+# 0.08 18/10/2026 : Remove read_block/read_field - fields are read through the index (read_field_block)
+# 0.09 18/10/2026 : Raise OSError for a block that can't be decompressed (rather than returning zeros to be cached)
+# 0.10 18/10/2026 : read_uncompressed_fields converts the BYTE_FIELDS to float32 rather than viewing them as floats
+##################################################################################################################
+
+# See smoke2exr.py for the layout of the smoke point cache. Note that this has no dependency on bpy.
+
+import lzma
+import mmap
+import os
+import struct
+import numpy as np
+
+from . import lzo_codec
+from . import lzma_codec
+from .block_cache import block_cache
+
+# Location of a block within the file - 'offset' is the start of the (possibly compressed) data
+class BPhysBlock():
+
+    def __init__(self, name, offset, compressed, compsize, size):
+        self.name = name
+        self.offset = offset
+        self.compressed = compressed    # 0=none, 1=light (LZO), 2=heavy (LZMA)
+        self.compsize = compsize        # Size of the data in the file
+        self.size = size                # Size of the data once uncompressed
+
+    def __repr__(self):
+        return "BPhysBlock(%s, offset=%i, compressed=%i, compsize=%i, size=%i)" % (self.name, self.offset, self.compressed, self.compsize, self.size)
+
+class BPhysReader():
+
+    SM_ACTIVE_HEAT      = 1
+    SM_ACTIVE_FIRE      = 2
+    SM_ACTIVE_COLORS    = 4
+    SM_ACTIVE_COLOR_SET = 8
+
+    FLAVOR_SMOKE = 3
+
+    EXTRA_FIELDS = "extra_fields"
+    EXTRA_FIELDS_FORMAT = "fffffffffffiiifffffffffffffffffffiiiiiiiiifff"
+
+    # Sequence of blocks in a smoke cache as (name, fluid_fields flag that must be set (0=always present), hires). As
+    # ptcache_smoke_write in pointcache.c, the optional blocks depend on fluid_fields (the first of the header's fields)
+    SMOKE_LAYOUT = [
+        ('shadow', 0, False),
+        ('density', 0, False),
+        ('heat', SM_ACTIVE_HEAT, False),
+        ('heatold', SM_ACTIVE_HEAT, False),
+        ('flame', SM_ACTIVE_FIRE, False),
+        ('fuel', SM_ACTIVE_FIRE, False),
+        ('react', SM_ACTIVE_FIRE, False),
+        ('rgb_r', SM_ACTIVE_COLORS, False),
+        ('rgb_g', SM_ACTIVE_COLORS, False),
+        ('rgb_b', SM_ACTIVE_COLORS, False),
+        ('vx', 0, False),
+        ('vy', 0, False),
+        ('vz', 0, False),
+        ('obstacles', 0, False),
+        (EXTRA_FIELDS, 0, False),
+        ('hires_density', 0, True),
+        ('hires_flame', SM_ACTIVE_FIRE, True),
+        ('hires_fuel', SM_ACTIVE_FIRE, True),
+        ('hires_react', SM_ACTIVE_FIRE, True),
+        ('hires_rgb_r', SM_ACTIVE_COLORS, True),
+        ('hires_rgb_g', SM_ACTIVE_COLORS, True),
+        ('hires_rgb_b', SM_ACTIVE_COLORS, True),
+        ('tcu', 0, False),
+        ('tcv', 0, False),
+        ('tcw', 0, False),
+        ]
+
+    # Fields stored as one byte per voxel rather than a float
+    BYTE_FIELDS = {'obstacles'}
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.f = open(fname, "rb")
+        try:
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            self.f.close()
+            raise
+        self.view = memoryview(self.mm)
+        self.mtime = os.fstat(self.f.fileno()).st_mtime_ns
+        self.pos = 0
+        self.index = None
+        self.uncompressed = False
+        self.extra_fields = None
+
+        self.read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.mm is None:
+            return
+        self.view.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # Blocks returned by read_field_block are still in use - the map will be released once they're discarded
+            pass
+        self.f.close()
+        self.mm = None
+
+    # Read the BPHYSICS header (and the smoke header if it's a smoke cache)
+    def read_header(self):
+        magic = self.read(8)
+        if magic != b'BPHYSICS':
+            raise Exception("not a blender physics cache")
+
+        (self.flavor, self.count, self.something) = self.read_struct("iii")
+
+        self.smokeversion = None
+        if self.flavor == BPhysReader.FLAVOR_SMOKE:
+            self.smokeversion = bytes(self.read(4))
+            (self.fluid_fields, self.active_fields, self.res_x, self.res_y, self.res_z, self.dx) = self.read_struct("iiiiif")
+        self.data_start = self.pos
+
+    # Return a view of the next 'size' bytes of the file
+    def read(self, size):
+        data = self.view[self.pos:self.pos+size]
+        self.pos += len(data)
+        return data
+
+    def read_struct(self, fmt):
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))
+
+    # Step over the next block without decompressing it, returning its location (or None at the end of the file or for
+    # an unknown block type)
+    def skip_block(self, name, size):
+        compressed = bytes(self.read(1))
+
+        if compressed == b'':
+            print("Reached End Of Stream")
+            return None
+
+        if compressed > b'\x02':
+            print("Unknown block type")
+            return None
+
+        if compressed == b'\x01' or compressed == b'\x02':
+            compsize = self.read_struct("I")[0]
+            block = BPhysBlock(name, self.pos, compressed[0], compsize, size)
+            self.pos += compsize
+            if compressed == b'\x02' and compsize > 0:
+                # Step over the LZMA props
+                propsize = self.read_struct("I")[0]
+                self.pos += propsize
+            return block
+
+        else:
+            block = BPhysBlock(name, self.pos, 0, size, size)
+            self.pos += size
+            return block
+
+    # Key of the block in the block cache
+    def block_key(self, block):
+        return (os.path.abspath(self.fname), self.mtime, block.offset)
+
+    # Return the content of a block. Uncompressed blocks are returned as a memoryview of the mapped file, compressed
+    # blocks are decompressed (or taken from the block cache if decompressed before) and returned as a read-only
+    # memoryview of the cached buffer.
+    def decode_block(self, block):
+        if block.compressed == 0:
+            return self.view[block.offset:block.offset+block.size]
+
+        key = self.block_key(block)
+        cached = block_cache.get(key)
+        if cached is not None:
+            print("Using cached block at offset %i (%i bytes)" % (block.offset, len(cached)))
+            return cached
+
+        return block_cache.put(key, decompress_block(self.view, block, self.fname))
+
+    # Scan the blocks of a smoke cache in a single pass, recording where each field is (but not decompressing any of
+    # them). Fields not present in the file aren't included in the index. 'hiresMultiplier' is the smoke 'amplify'+1
+    # - it's not stored in the file but is needed to step over uncompressed hires blocks.
+    def build_index(self, hiresMultiplier=1):
+        self.index = {}
+        self.uncompressed = False
+        if self.flavor != BPhysReader.FLAVOR_SMOKE:
+            return self.index
+
+        index = self.uncompressed_index(hiresMultiplier)
+        if index is not None:
+            self.index = index
+            self.uncompressed = True
+            return self.index
+
+        self.pos = self.data_start
+        for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT:
+            if flag != 0 and (self.fluid_fields & flag) == 0:
+                continue
+
+            if name == BPhysReader.EXTRA_FIELDS:
+                if self.pos + struct.calcsize(BPhysReader.EXTRA_FIELDS_FORMAT) > len(self.view):
+                    break
+                self.extra_fields = self.read_struct(BPhysReader.EXTRA_FIELDS_FORMAT)
+                continue
+
+            block = self.skip_block(name, self.field_size(name, hires, hiresMultiplier))
+            if block is None:
+                break
+            self.index[name] = block
+
+        return self.index
+
+    # Size (in bytes) of the named field once uncompressed (see SMOKE_LAYOUT)
+    def field_size(self, name, hires=False, hiresMultiplier=1):
+        size = self.res_x * self.res_y * self.res_z
+        if hires:
+            size *= hiresMultiplier*hiresMultiplier*hiresMultiplier
+        return size if name in BPhysReader.BYTE_FIELDS else size * 4
+
+    # Index of the blocks if the whole cache is uncompressed (compression 'none'). Each block is then just the compression
+    # flag followed by the data, so where each field starts only depends on the resolution and fluid_fields - the
+    # only thing read from the file is the flag of each block to check it's 0. Returns None if any block is compressed
+    # (or the file isn't the size expected) - build_index then has to step over the blocks one at a time.
+    def uncompressed_index(self, hiresMultiplier=1):
+        extraSize = struct.calcsize(BPhysReader.EXTRA_FIELDS_FORMAT)
+
+        index = {}
+        extraFields = None
+        pos = self.data_start
+        for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT:
+            if flag != 0 and (self.fluid_fields & flag) == 0:
+                continue
+
+            if name == BPhysReader.EXTRA_FIELDS:
+                if pos + extraSize > len(self.view):
+                    break
+                extraFields = struct.unpack_from(BPhysReader.EXTRA_FIELDS_FORMAT, self.view, pos)
+                pos += extraSize
+                continue
+
+            if pos == len(self.view):
+                # End of the file - no more blocks (eg, no hires)
+                break
+            if self.view[pos] != 0:
+                return None
+            blockSize = self.field_size(name, hires, hiresMultiplier)
+            index[name] = BPhysBlock(name, pos+1, 0, blockSize, blockSize)
+            pos += 1 + blockSize
+
+        if pos != len(self.view):
+            return None
+
+        self.extra_fields = extraFields
+        return index
+
+    # Read the named fields of a fully uncompressed cache (see uncompressed_index) in one sequential read of the part of
+    # the file that covers them all. Returns { name: float32 array (or None if not in the file) } in the order of
+    # 'names'. The arrays are views of the buffer read (not of the mapped file) - note that they may not be 4-byte
+    # aligned since each block starts after its 1 byte flag. The BYTE_FIELDS (one byte per voxel) are converted to new
+    # float32 arrays rather than viewed.
+    def read_uncompressed_fields(self, names):
+        blocks = [self.index[name] for name in names if name in self.index]
+        if len(blocks) == 0:
+            return {name: None for name in names}
+
+        start = min(block.offset for block in blocks)
+        end = max(block.offset + block.size for block in blocks)
+        data = np.fromfile(self.fname, dtype=np.uint8, count=end-start, offset=start)
+        if len(data) != end-start:
+            raise OSError("%s is truncated" % self.fname)
+
+        fields = {}
+        for name in names:
+            block = self.index.get(name)
+            if block is None:
+                fields[name] = None
+            elif name in BPhysReader.BYTE_FIELDS:
+                fields[name] = data[block.offset-start:block.offset-start+block.size].astype(np.float32)
+            else:
+                fields[name] = data[block.offset-start:block.offset-start+block.size].view(np.float32)
+        return fields
+
+    # Return the (decompressed) content of the named field (see SMOKE_LAYOUT), or None if it's not in the file.
+    # Only the requested block is decompressed.
+    def read_field_block(self, name):
+        if self.index is None:
+            self.build_index()
+        block = self.index.get(name)
+        if block is None:
+            return None
+        return self.decode_block(block)
+
+    # Return the content of each of the named fields as { name: block (or None if not in the file) } in the order of
+    # 'names' (see read_field_block). The blocks are independent once the index has been built, so if 'executor' (a
+    # process pool) is given the compressed blocks that aren't in the block cache are all decompressed at once there -
+    # each worker maps the file itself and only the decompressed block comes back.
+    def read_field_blocks(self, names, executor=None):
+        if self.index is None:
+            self.build_index()
+
+        blocks = {}
+        pending = {}
+        for name in names:
+            if name in blocks or name in pending:
+                continue
+            block = self.index.get(name)
+            if executor is not None and block is not None and block.compressed != 0 and block.compsize > 0:
+                cached = block_cache.get(self.block_key(block))
+                if cached is None:
+                    pending[name] = executor.submit(decompress_file_block, self.fname, block)
+                    continue
+                blocks[name] = cached
+            else:
+                blocks[name] = self.read_field_block(name)
+
+        # Only wait for the workers once every block has been handed out
+        for (name, future) in pending.items():
+            blocks[name] = block_cache.put(self.block_key(self.index[name]), future.result())
+
+        return {name: blocks[name] for name in names}
+
+# Decompress a compressed block from the view of the file into a new bytearray. Raises OSError (naming the file and the
+# field) if the block can't be decompressed or doesn't decompress to the expected size - so a bad block is never cached.
+def decompress_block(view, block, fname=''):
+    destbuffer = bytearray(block.size)
+    if block.compsize == 0:
+        # Blender writes an empty block (and no LZMA props) if there's nothing to compress
+        return destbuffer
+
+    buffer = view[block.offset:block.offset+block.compsize]
+    try:
+        if block.compressed == 1:
+            (error, result_index) = lzo_codec.decompress(buffer, destbuffer)
+            if error < 0:
+                raise OSError("%s : unable to decompress field '%s' (LZO error %i)" % (fname, block.name, error))
+        else:
+            propsOffset = block.offset+block.compsize
+            propsize = struct.unpack("I", view[propsOffset:propsOffset+4])[0]
+            props = view[propsOffset+4:propsOffset+4+propsize]
+            try:
+                result_index = lzma_codec.decompress(buffer, block.compsize, props, destbuffer)
+            except lzma.LZMAError as e:
+                raise OSError("%s : unable to decompress field '%s' (%s)" % (fname, block.name, str(e)))
+            finally:
+                props.release()
+    finally:
+        buffer.release()
+    print("Uncompressed from "+str(block.compsize)+" to a buffer of "+str(block.size)+" result_index = "+str(result_index))
+
+    if result_index != block.size:
+        raise OSError("%s : field '%s' decompressed to %i bytes (expected %i)" % (fname, block.name, result_index, block.size))
+    return destbuffer
+
+# Decompress one block (a BPhysBlock from the index) of the file - run in a worker process by read_field_blocks
+def decompress_file_block(fname, block):
+    with BPhysReader(fname) as reader:
+        return decompress_block(reader.view, block, fname)
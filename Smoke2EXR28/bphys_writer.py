@@ -0,0 +1,91 @@
+# Author: Rich Sedman
+# Description: Write Blender point cache (.bphys) files for a smoke domain - the same layout BPhysReader reads
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+# 0.02 18/10/2026 : Which fields are written depends on fluid_fields (the hires fire fields only with SM_ACTIVE_FIRE)
+##################################################################################################################
+
+# See smoke2exr.py for the layout of the smoke point cache. The header is written as BPhysReader reads it and then each
+# field in BPhysReader.SMOKE_LAYOUT order (with the extra fields after 'obstacles'). Blocks are written as Blender does
+# (ptcache_file_compressed_write in pointcache.c) :
+#
+#   none    0 (byte), data
+#   light   1 (byte), compressed size (uint), LZO1X stream - or as 'none' if compressing doesn't make it smaller
+#
+# 'heavy' (LZMA) isn't written since Blender's LZMA stream has no header and no end marker, which Python's lzma module
+# can't produce. Note that this has no dependency on bpy.
+
+import os
+import struct
+
+from .bphys_reader import BPhysReader
+from . import lzo_codec
+
+# Block compressions that can be written (identifier -> compression flag)
+COMPRESSIONS = { 'NONE': 0, 'LIGHT': 1 }
+
+# The header of a smoke cache file - as BPhysReader's attributes of the same names. 'resolution' is (res_x, res_y,
+# res_z) and 'extraFields' the values of BPhysReader.EXTRA_FIELDS_FORMAT (or None if the file doesn't have them).
+class SmokeCacheHeader():
+
+    def __init__(self, resolution, dx, fluid_fields, active_fields, extraFields=None, count=0, something=2, smokeversion=b'1.04'):
+        self.resolution = tuple(int(size) for size in resolution)
+        self.dx = dx
+        self.fluid_fields = fluid_fields
+        self.active_fields = active_fields
+        self.extraFields = extraFields
+        self.count = count
+        self.something = something
+        self.smokeversion = smokeversion
+
+    # Header of an open (indexed) cache file
+    @classmethod
+    def from_reader(cls, reader):
+        return cls((reader.res_x, reader.res_y, reader.res_z), reader.dx, reader.fluid_fields, reader.active_fields,
+            reader.extra_fields, reader.count, reader.something, reader.smokeversion)
+
+    def __repr__(self):
+        return "SmokeCacheHeader(%s, dx=%f, fields %i/%i)" % ("x".join(str(size) for size in self.resolution), self.dx, self.fluid_fields, self.active_fields)
+
+# A block (compression flag, compressed size if compressed, data) for the data (bytes-like)
+def encode_block(data, compression='LIGHT'):
+    data = memoryview(data).cast('B')
+    if COMPRESSIONS[compression] == 1 and len(data) > 0:
+        compressed = lzo_codec.compress(data)
+        if len(compressed) < len(data):
+            return b'\x01' + struct.pack("I", len(compressed)) + compressed
+    return b'\x00' + bytes(data)
+
+# Write a smoke cache file. 'fields' is { field name (see BPhysReader.SMOKE_LAYOUT): data (bytes-like, eg, a float32
+# array or uint8 for 'obstacles') }. Fields are written in the layout order - the fields needed for the header's
+# fluid_fields must all be given, and the hires fields (if any) must all be given or none of them. The file is written
+# to a temporary name and then renamed so a reader never sees a partly written frame.
+def write_smoke_cache(fname, header, fields, compression='LIGHT'):
+    (resX, resY, resZ) = header.resolution
+
+    tmpname = fname + ".tmp"
+    with open(tmpname, "wb") as f:
+        f.write(b'BPHYSICS')
+        f.write(struct.pack("iii", BPhysReader.FLAVOR_SMOKE, header.count, header.something))
+        f.write(header.smokeversion)
+        f.write(struct.pack("iiiiif", header.fluid_fields, header.active_fields, resX, resY, resZ, header.dx))
+
+        for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT:
+            if flag != 0 and (header.fluid_fields & flag) == 0:
+                continue
+
+            if name == BPhysReader.EXTRA_FIELDS:
+                if header.extraFields is None:
+                    break
+                f.write(struct.pack(BPhysReader.EXTRA_FIELDS_FORMAT, *header.extraFields))
+                continue
+
+            if name not in fields:
+                if hires:
+                    # No hires (noise) fields - the file just ends
+                    break
+                raise ValueError("Field '%s' is needed for the cache (fluid_fields %i)" % (name, header.fluid_fields))
+            f.write(encode_block(fields[name], compression))
+
+    os.replace(tmpname, fname)
@@ -0,0 +1,90 @@
+# Author: Rich Sedman
+# Description: Find the occupied part of a volume and crop the exported images to it
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+# 0.02 18/10/2026 : Crop a buffer shared by several channels only once, so the channels still share it
+##################################################################################################################
+
+# Bounds are ((x0, y0, z0), (x1, y1, z1)) with x1/y1/z1 exclusive, in lowres voxels so that the same region can be
+# applied to the lowres and hires images (the hires bounds are the lowres bounds multiplied by the hires multiplier).
+# The region is found over all the exported fields (any voxel with a value above the threshold) and over all the frames
+# being converted, so every image of the sequence covers the same region and shaders only need the one offset/size -
+# which is added to the image name (see crop_name). Note that this has no dependency on bpy.
+
+import numpy as np
+
+from .atlas import as_float_array
+
+DEFAULT_THRESHOLD = 0.001
+
+# Bounds of the voxels where any of the buffers exceeds the threshold (in the volume's own voxels), or None if empty
+def occupied_bounds(dimensions, buffers, threshold=DEFAULT_THRESHOLD):
+    (sizeX, sizeY, sizeZ) = (int(dimensions[0]), int(dimensions[1]), int(dimensions[2]))
+
+    occupied = None
+    for buffer in buffers:
+        if buffer is None:
+            continue
+        volume = as_float_array(buffer)[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+        if occupied is None:
+            occupied = np.abs(volume) > threshold
+        else:
+            occupied |= np.abs(volume) > threshold
+    if occupied is None:
+        return None
+
+    zs = np.flatnonzero(occupied.any(axis=(1, 2)))
+    if len(zs) == 0:
+        return None
+    ys = np.flatnonzero(occupied.any(axis=(0, 2)))
+    xs = np.flatnonzero(occupied.any(axis=(0, 1)))
+    return ((int(xs[0]), int(ys[0]), int(zs[0])), (int(xs[-1])+1, int(ys[-1])+1, int(zs[-1])+1))
+
+# Smallest bounds containing both (either can be None)
+def union_bounds(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (tuple(min(p, q) for (p, q) in zip(a[0], b[0])), tuple(max(p, q) for (p, q) in zip(a[1], b[1])))
+
+# Bounds in lowres voxels of bounds found in an image 'factor' times the lowres resolution (rounded outwards)
+def to_lowres_bounds(bounds, factor):
+    if bounds is None or factor == 1:
+        return bounds
+    return (tuple(p // factor for p in bounds[0]), tuple(-(-p // factor) for p in bounds[1]))
+
+# Bounds over all the images of a frame (list of (name, dimensions, buffers)) in lowres voxels
+def frame_bounds(images, lowresDimensions, threshold=DEFAULT_THRESHOLD):
+    bounds = None
+    for (name, dimensions, buffers) in images:
+        factor = int(dimensions[0]) // int(lowresDimensions[0])
+        bounds = union_bounds(bounds, to_lowres_bounds(occupied_bounds(dimensions, buffers, threshold), factor))
+    return bounds
+
+# Name suffix recording the region - offset and size in the image's own voxels
+def crop_name(bounds):
+    ((x0, y0, z0), (x1, y1, z1)) = bounds
+    return "crop-%i-%i-%i-%ix%ix%i" % (x0, y0, z0, x1-x0, y1-y0, z1-z0)
+
+# Crop one image (name, dimensions, buffers) to the (lowres) bounds. Returns the new (name, dimensions, buffers).
+def crop_image(name, dimensions, buffers, bounds, lowresDimensions):
+    (sizeX, sizeY, sizeZ) = (int(dimensions[0]), int(dimensions[1]), int(dimensions[2]))
+    factor = sizeX // int(lowresDimensions[0])
+    ((x0, y0, z0), (x1, y1, z1)) = [tuple(min(p*factor, size) for (p, size) in zip(corner, (sizeX, sizeY, sizeZ))) for corner in bounds]
+
+    # A buffer used for several channels (eg, density as R, G and B) is only cropped once, so the channels still share
+    # the one buffer
+    cropped = []
+    done = {}
+    for buffer in buffers:
+        if buffer is None:
+            cropped.append(None)
+            continue
+        if id(buffer) not in done:
+            volume = as_float_array(buffer)[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+            done[id(buffer)] = np.ascontiguousarray(volume[z0:z1, y0:y1, x0:x1]).reshape(-1)
+        cropped.append(done[id(buffer)])
+
+    return (name+"_"+crop_name(((x0, y0, z0), (x1, y1, z1))), (x1-x0, y1-y0, z1-z0), tuple(cropped))
@@ -0,0 +1,63 @@
+# Author: Rich Sedman
+# Description: LZMA decompression for Blender point cache ('heavy' compression) blocks
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - decompress an LZMA block from a view of the cache file into a preallocated buffer
+# 0.02 18/10/2026 : Remove read_block - blocks are located by BPhysReader.build_index and decompressed with decompress
+# 0.03 18/10/2026 : decompress only takes the compressed data as a buffer - file objects were only used by read_block
+##################################################################################################################
+
+# Blender writes a 'heavy' block (see ptcache_file_compressed_write in pointcache.c) as :
+# 1         byte (compressed - 2)
+# 4         uint (size of compressed data)
+# (size)    bytes (raw LZMA stream from LzmaCompress - no header and no end marker)
+# 4         uint (size of props - always 5)
+# (5)       bytes (LZMA props - lc/lp/pb byte followed by 4-byte dictionary size)
+#
+# Python's lzma module can't take the props separately, so we build the 13-byte '.lzma' (LZMA_Alone) header from the
+# props and the known uncompressed size and feed that in ahead of the compressed data.
+
+import lzma
+import struct
+
+LZMA_PROPS_SIZE = 5
+
+#Amount of compressed data to feed to the decompressor at a time
+CHUNK_SIZE = 1024*1024
+
+# Decompress an LZMA stream (with Blender's separate props) into the (preallocated) buffer dst. 'data' is the compressed
+# stream (bytes/memoryview - eg, a view of the mapped cache file), fed to the decompressor in CHUNK_SIZE pieces. Returns
+# the number of bytes written to dst.
+def decompress(data, compsize, props, dst):
+
+    if len(props) != LZMA_PROPS_SIZE:
+        raise lzma.LZMAError("Unexpected LZMA props size (%i)" % len(props))
+
+    decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+    decompressor.decompress(bytes(props) + struct.pack("<Q", len(dst)))
+
+    view = memoryview(dst)
+    pos = 0
+    remaining = compsize
+    offset = 0
+    while remaining > 0 and pos < len(dst) and not decompressor.eof:
+        chunk = data[offset:offset+min(CHUNK_SIZE, remaining)]
+        if len(chunk) == 0:
+            break
+        offset += len(chunk)
+        remaining -= len(chunk)
+
+        out = decompressor.decompress(chunk, max_length=len(dst)-pos)
+        view[pos:pos+len(out)] = out
+        pos += len(out)
+
+        # Drain any output held back by max_length before feeding more input
+        while not decompressor.needs_input and not decompressor.eof and pos < len(dst):
+            out = decompressor.decompress(b'', max_length=len(dst)-pos)
+            if len(out) == 0:
+                break
+            view[pos:pos+len(out)] = out
+            pos += len(out)
+
+    view.release()
+    return pos
@@ -0,0 +1,510 @@
+# Author: Rich Sedman
+# Description: LZO1X decompression for Blender point cache ('light' compression) blocks
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Moved Lzo_Codec out of smoke2exr.py (no bpy dependency) and added a slice-based decoder that
+#                   copies literal runs and back-reference matches in bulk rather than one byte at a time. Uses the
+#                   native 'lzo' module (python-lzo) when it's installed. Includes an equivalence corpus to check
+#                   the fast decoder against Lzo_Codec - run this file directly to check it.
+# 0.02 18/10/2026 : Add compress (for writing 'light' blocks) - native 'lzo' module or compress_runs
+# 0.03 18/10/2026 : The equivalence corpus is now run by pytest (tests/test_lzo_codec.py) rather than from this file
+##################################################################################################################
+
+import numpy as np
+
+try:
+    import lzo as _native_lzo
+except ImportError:
+    _native_lzo = None
+
+#Set to False to always use the pure-Python decoder, even if the 'lzo' module is available
+use_native = True
+
+################# Copied in from addons_contrib/io_scene_fpx/lzo_spec.py ############################
+# From https://blender.stackexchange.com/a/61276/29586
+
+#### !!!! Copied from lzo_spec.py within the Blender directory structure !!!
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+###############################################################################
+#234567890123456789012345678901234567890123456789012345678901234567890123456789
+#--------1---------2---------3---------4---------5---------6---------7---------
+
+
+# ##### BEGIN COPYRIGHT BLOCK #####
+#
+# initial script copyright (c)2013 Alexander Nussbaumer
+#
+# ##### END COPYRIGHT BLOCK #####
+
+## this is a basic, partial and stripped implementation to read
+## [LZO:1X]: Lempel-Ziv-Oberhumer lossless data compression algorithm
+## http://www.oberhumer.com/opensource/lzo/
+## this python implementation based on the java implementation from:
+## http://www.oberhumer.com/opensource/lzo/download/LZO-v1/java-lzo-1.00.tar.gz
+
+
+class Lzo_Codec:
+
+    LZO_E_OK                  =  0
+    LZO_E_ERROR               = -1
+    LZO_E_INPUT_OVERRUN       = -4
+    LZO_E_OUTPUT_OVERRUN      = -5
+    LZO_E_LOOKBEHIND_OVERRUN  = -6
+    LZO_E_INPUT_NOT_CONSUMED  = -8
+
+    @staticmethod
+    def Lzo1x_Decompress(src, src_offset, src_length, dst, dst_offset):
+        """
+        src = bytes
+        dst = bytearray
+
+        returns: error, result_index
+        """
+        src_index = src_offset
+        dst_index = dst_offset
+        value = 0
+        pos = 0
+        error = Lzo_Codec.LZO_E_OK
+        result_index = dst_index
+
+        value = src[src_index]
+        src_index += 1
+        if value > 17:
+            value -= 17
+            while True: ## do while value > 0
+                dst[dst_index] = src[src_index]
+                dst_index += 1
+                src_index += 1
+                value -= 1
+                if value <= 0:
+                    break ## do while value > 0
+            value = src[src_index]
+            src_index += 1
+            if value < 16:
+                error = Lzo_Codec.LZO_E_ERROR
+                return error, result_index
+
+        ## loop:
+        loop = False
+        src_index -= 1 ## 1 for (;;value = src[src_index++])
+        while not loop: ## 1 for (;;value = src[src_index++])
+            value = src[src_index] ## 1 for (;;value = src[src_index++])
+            src_index += 1 ## 1 for (;;value = src[src_index++])
+            if value < 16:
+                if value == 0:
+                    while src[src_index] == 0:
+                        value += 255
+                        src_index += 1
+                    value += 15 + src[src_index]
+                    src_index += 1
+                value += 3
+                while True: ## do while value > 0
+                    dst[dst_index] = src[src_index]
+                    dst_index += 1
+                    src_index += 1
+                    value -= 1
+                    if value <= 0:
+                        break ## do while value > 0
+                value = src[src_index]
+                src_index += 1
+                if value < 16:
+                    pos = dst_index - 0x801 - (value >> 2) - (src[src_index] << 2)
+                    src_index += 1
+                    if pos < dst_offset:
+                        error = Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN
+                        loop = True
+                        break ## loop
+                    value = 3
+                    while True: ## do while value > 0
+                        dst[dst_index] = dst[pos]
+                        dst_index += 1
+                        pos += 1
+                        value -= 1
+                        if value <= 0:
+                            break ## do while value > 0
+                    value = src[src_index-2] & 3
+                    if value == 0:
+                        continue ## 1 for (;;value = src[src_index++])
+                    while True: ## do while value > 0
+                        dst[dst_index] = src[src_index]
+                        dst_index += 1
+                        src_index += 1
+                        value -= 1
+                        if value <= 0:
+                            break ## do while value > 0
+                    value = src[src_index]
+                    src_index += 1
+
+            src_index -= 1 ## 2 for (;;value = src[src_index++])
+            while not loop: ## 2 for (;;value = src[src_index++])
+                value = src[src_index] ## 2 for (;;value = src[src_index++])
+                src_index += 1 ## 2 for (;;value = src[src_index++])
+                if value >= 64:
+                    pos = dst_index - 1 - ((value >> 2) & 7) - (src[src_index] << 3)
+                    src_index += 1
+                    value = (value >> 5) - 1
+                elif value >= 32:
+                    value &= 31
+                    if value == 0:
+                        while src[src_index] == 0:
+                            value += 255
+                            src_index += 1
+                        value += 31 + src[src_index]
+                        src_index += 1
+                    pos = dst_index - 1 - (src[src_index] >> 2)
+                    src_index += 1
+                    pos -= (src[src_index] << 6)
+                    src_index += 1
+                elif value >= 16:
+                    pos = dst_index - ((value & 8) << 11)
+                    value &= 7
+                    if value == 0:
+                        while src[src_index] == 0:
+                            value += 255
+                            src_index += 1
+                        value += 7 + src[src_index]
+                        src_index += 1
+                    pos -= (src[src_index] >> 2)
+                    src_index += 1
+                    pos -= (src[src_index] << 6)
+                    src_index += 1
+                    if pos == dst_index:
+                        loop = True
+                        break ## loop
+                    pos -= 0x4000
+                else:
+                    pos = dst_index - 1 - (value >> 2) - (src[src_index] << 2)
+                    src_index += 1
+                    value = 0
+                if pos < dst_offset:
+                    error = Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN
+                    loop = True
+                    break ## loop
+                value += 2
+                while True: ## do while value > 0
+                    dst[dst_index] = dst[pos]
+                    dst_index += 1
+                    pos += 1
+                    value -= 1
+                    if value <= 0:
+                        break ## do while value > 0
+                value = src[src_index - 2] & 3
+                if value == 0:
+                    break
+                while True: ## do while value > 0
+                    dst[dst_index] = src[src_index]
+                    dst_index += 1
+                    src_index += 1
+                    value -= 1
+                    if value <= 0:
+                        break ## do while value > 0
+
+        src_index -= src_offset
+        dst_index -= dst_offset
+        result_index = dst_index
+        if error < Lzo_Codec.LZO_E_OK:
+            return error, result_index
+        if src_index < src_length:
+            error = Lzo_Codec.LZO_E_INPUT_NOT_CONSUMED
+            return error, result_index
+        if src_index > src_length:
+            error = Lzo_Codec.LZO_E_INPUT_OVERRUN
+            return error, result_index
+        if value != 1:
+            error = Lzo_Codec.LZO_E_ERROR
+            return error, result_index
+        return error, result_index
+
+###############################################################################
+
+
+# Slice-based LZO1X decoder. Follows the same state machine as lzo1x_decompress_safe (lzo1x_d.ch) but literal runs
+# are copied as a single slice and matches are copied as a slice (or, where the match overlaps the bytes it is
+# producing, as a repeat of the 'period' between source and destination). Same arguments and return values as
+# Lzo_Codec.Lzo1x_Decompress so it can be used as a drop-in replacement.
+def lzo1x_decompress(src, src_offset, src_length, dst, dst_offset):
+
+    ip = src_offset
+    ip_end = src_offset + src_length
+    op = dst_offset
+    op_end = len(dst)
+
+    def result(error):
+        if error == Lzo_Codec.LZO_E_OK:
+            if ip < ip_end:
+                error = Lzo_Codec.LZO_E_INPUT_NOT_CONSUMED
+            elif ip > ip_end:
+                error = Lzo_Codec.LZO_E_INPUT_OVERRUN
+        return error, op - dst_offset
+
+    try:
+        t = src[ip]
+        state = 0       #Number of literals carried in the low 2 bits of the last match (or 4 after a literal run)
+        if t > 17:
+            ip += 1
+            t -= 17
+            if ip + t > ip_end:
+                return result(Lzo_Codec.LZO_E_INPUT_OVERRUN)
+            if op + t > op_end:
+                return result(Lzo_Codec.LZO_E_OUTPUT_OVERRUN)
+            dst[op:op+t] = src[ip:ip+t]
+            op += t
+            ip += t
+            state = 4 if t >= 4 else t
+
+        while True:
+            t = src[ip]
+            ip += 1
+
+            if t < 16:
+                if state == 0:
+                    # Literal run
+                    if t == 0:
+                        while src[ip] == 0:
+                            t += 255
+                            ip += 1
+                        t += 15 + src[ip]
+                        ip += 1
+                    t += 3
+                    if ip + t > ip_end:
+                        return result(Lzo_Codec.LZO_E_INPUT_OVERRUN)
+                    if op + t > op_end:
+                        return result(Lzo_Codec.LZO_E_OUTPUT_OVERRUN)
+                    dst[op:op+t] = src[ip:ip+t]
+                    op += t
+                    ip += t
+                    state = 4
+                    continue
+
+                if state == 4:
+                    # 3 byte match, immediately after a literal run
+                    pos = op - 0x801 - (t >> 2) - (src[ip] << 2)
+                    t = 3
+                else:
+                    # 2 byte match, after a short literal run
+                    pos = op - 1 - (t >> 2) - (src[ip] << 2)
+                    t = 2
+                ip += 1
+
+            elif t >= 64:
+                pos = op - 1 - ((t >> 2) & 7) - (src[ip] << 3)
+                ip += 1
+                t = (t >> 5) + 1
+
+            elif t >= 32:
+                t &= 31
+                if t == 0:
+                    while src[ip] == 0:
+                        t += 255
+                        ip += 1
+                    t += 31 + src[ip]
+                    ip += 1
+                pos = op - 1 - (src[ip] >> 2) - (src[ip+1] << 6)
+                ip += 2
+                t += 2
+
+            else:
+                pos = op - ((t & 8) << 11)
+                t &= 7
+                if t == 0:
+                    while src[ip] == 0:
+                        t += 255
+                        ip += 1
+                    t += 7 + src[ip]
+                    ip += 1
+                pos -= (src[ip] >> 2) + (src[ip+1] << 6)
+                ip += 2
+                if pos == op:
+                    # End of stream marker
+                    (error, result_index) = result(Lzo_Codec.LZO_E_OK)
+                    if error == Lzo_Codec.LZO_E_OK and t != 1:
+                        error = Lzo_Codec.LZO_E_ERROR
+                    return error, result_index
+                pos -= 0x4000
+                t += 2
+
+            if pos < dst_offset:
+                return result(Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN)
+            if op + t > op_end:
+                return result(Lzo_Codec.LZO_E_OUTPUT_OVERRUN)
+
+            # Copy the match. If it overlaps the bytes being written then it's a repeat of the last (op-pos) bytes.
+            dist = op - pos
+            if dist >= t:
+                dst[op:op+t] = dst[pos:pos+t]
+            else:
+                period = dst[pos:op]
+                dst[op:op+t] = (period * (t // dist + 1))[:t]
+            op += t
+
+            # Trailing literals (0..3) are held in the low 2 bits of the 2nd last byte of the match instruction
+            state = src[ip-2] & 3
+            if state:
+                if ip + state > ip_end:
+                    return result(Lzo_Codec.LZO_E_INPUT_OVERRUN)
+                if op + state > op_end:
+                    return result(Lzo_Codec.LZO_E_OUTPUT_OVERRUN)
+                dst[op:op+state] = src[ip:ip+state]
+                op += state
+                ip += state
+
+    except IndexError:
+        return result(Lzo_Codec.LZO_E_INPUT_OVERRUN)
+
+
+def native_available():
+    return _native_lzo is not None
+
+
+# Decompress an LZO1X block from src into the (preallocated) bytearray dst. Uses the native 'lzo' module when it's
+# available, otherwise the slice-based pure-Python decoder. Returns (error, result_index) as Lzo_Codec does.
+def decompress(src, dst):
+    if use_native and _native_lzo is not None:
+        try:
+            out = _native_lzo.decompress(bytes(src), False, len(dst))
+        except _native_lzo.error:
+            return Lzo_Codec.LZO_E_ERROR, 0
+        dst[0:len(out)] = out
+        return Lzo_Codec.LZO_E_OK, len(out)
+
+    return lzo1x_decompress(src, 0, len(src), dst, 0)
+
+
+# Compress data (bytes-like) as an LZO1X stream for a 'light' block. Uses the native 'lzo' module when it's available,
+# otherwise compress_runs.
+def compress(data):
+    if use_native and _native_lzo is not None:
+        return _native_lzo.compress(bytes(data), 1, False)
+    return compress_runs(data)
+
+# Shortest run of repeated 4-byte values that's stored as a match (shorter runs stay in the literals)
+MIN_RUN_WORDS = 3
+
+# Simple LZO1X compression that only looks for runs of a repeated 4-byte value (a float - eg, the empty space around the
+# smoke) and stores everything else as literals. Each run is its first value as a literal followed by a match 4 bytes
+# back for the rest. The runs are found with NumPy and the stream is built by lzo_assemble.
+def compress_runs(data):
+    data = bytes(data)
+    words = np.frombuffer(data, dtype=np.uint32, count=len(data) // 4)
+
+    change = np.flatnonzero(words[1:] != words[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(words)]))
+    runs = (ends - starts) >= MIN_RUN_WORDS
+
+    tokens = []
+    literalStart = 0
+    for (start, end) in zip(starts[runs].tolist(), ends[runs].tolist()):
+        tokens.append(data[literalStart:(start+1)*4])
+        tokens.append((4, (end-start-1)*4))
+        literalStart = end*4
+    if literalStart < len(data):
+        tokens.append(data[literalStart:])
+
+    return lzo_assemble(tokens)[0]
+
+
+########################################### Stream assembly ######################################################
+# A token list of literal runs (bytes) and matches ((distance, length)) is assembled into an LZO1X stream using every
+# instruction form (short/long literal runs, M1, M2, M3, M4 and extended lengths). Used by compress_runs and for the
+# equivalence corpus in tests/test_lzo_codec.py.
+
+# Append 'value' using the LZO 'zero byte run' length extension
+def _lzo_put_length(out, value):
+    while value > 255:
+        out.append(0)
+        value -= 255
+    out.append(value)
+
+def lzo_assemble(tokens):
+
+    out = bytearray()
+    lastLiterals = 0        #Length of the literal run just written (0 if last token was a match)
+    initialRun = False      #Last literal run was the special 'first byte > 17' form (can't be followed by M1)
+    stateIndex = None       #Index of the byte whose low 2 bits hold the trailing literal count of the last match
+    opLen = 0
+
+    for token in tokens:
+        if isinstance(token, (bytes, bytearray)):
+            t = len(token)
+            initialRun = False
+            if len(out) == 0:
+                if t <= 238:
+                    out.append(17 + t)
+                    initialRun = True
+                else:
+                    out.append(0)
+                    _lzo_put_length(out, t - 18)
+            elif t <= 3:
+                out[stateIndex] |= t
+            elif t <= 18:
+                out.append(t - 3)
+            else:
+                out.append(0)
+                _lzo_put_length(out, t - 18)
+            out += token
+            lastLiterals = t
+            opLen += t
+            continue
+
+        (dist, length) = token
+        if length == 2 and 1 <= lastLiterals <= 3 and dist <= 0x400 and not initialRun:
+            stateIndex = len(out)
+            out.append(((dist - 1) & 3) << 2)
+            out.append((dist - 1) >> 2)
+        elif length == 3 and lastLiterals >= 4 and 0x801 <= dist <= 0xC00 and not initialRun:
+            stateIndex = len(out)
+            out.append(((dist - 0x801) & 3) << 2)
+            out.append((dist - 0x801) >> 2)
+        elif 3 <= length <= 8 and dist <= 0x800:
+            stateIndex = len(out)
+            out.append(((length - 1) << 5) | (((dist - 1) & 7) << 2))
+            out.append((dist - 1) >> 3)
+        elif length >= 3 and dist <= 0x4000:
+            if length - 2 <= 31:
+                out.append(32 | (length - 2))
+            else:
+                out.append(32)
+                _lzo_put_length(out, length - 2 - 31)
+            stateIndex = len(out)
+            out.append(((dist - 1) << 2) & 0xff)
+            out.append((dist - 1) >> 6)
+        elif length >= 3 and dist <= 0xBFFF:
+            d = dist - 0x4000
+            if length - 2 <= 7:
+                out.append(16 | ((d & 0x4000) >> 11) | (length - 2))
+            else:
+                out.append(16 | ((d & 0x4000) >> 11))
+                _lzo_put_length(out, length - 2 - 7)
+            stateIndex = len(out)
+            out.append(((d & 0x3fff) << 2) & 0xff)
+            out.append((d & 0x3fff) >> 6)
+        else:
+            raise ValueError("Can't encode match (%i, %i) here" % (dist, length))
+        if dist > opLen:
+            raise ValueError("Match distance %i is beyond start of output" % dist)
+        lastLiterals = 0
+        opLen += length
+
+    # End of stream marker
+    out += b'\x11\x00\x00'
+    return bytes(out), opLen
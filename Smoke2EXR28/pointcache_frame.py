@@ -0,0 +1,209 @@
+# Author: Rich Sedman
+# Description: Work out which images to create from a smoke point cache frame and read the fields they need
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - split out of convert_pointcache_volume_to_exr so that reading/decompressing a
+#                   frame can be done in a worker process (no dependency on bpy)
+# 0.02 18/10/2026 : Decompressed blocks now come from the block cache - only copy blocks that are views of the file
+# 0.03 18/10/2026 : Optionally pack several fields into the channels of a single image ('channelMap')
+# 0.04 18/10/2026 : Add pointcache_frame_bounds (region occupied by the exported fields - for cropping)
+# 0.05 18/10/2026 : Time the reading and decompression (profiling.py)
+# 0.06 18/10/2026 : Optionally decompress the blocks of the frame in a pool of processes ('executor')
+# 0.07 18/10/2026 : Read all the fields of an uncompressed cache in one go (BPhysReader.read_uncompressed_fields)
+# 0.08 18/10/2026 : Fields of one byte per voxel (BPhysReader.BYTE_FIELDS) are converted to float32
+# 0.09 18/10/2026 : pointcache_frame_bounds reads the frame through a single BPhysReader (read_frame_images)
+##################################################################################################################
+
+import numpy as np
+
+from .bphys_reader import BPhysReader
+from .crop import frame_bounds
+from .profiling import span
+
+# Images that can be exported from the point cache (identifier, name, description) - used for the 'exportFields' option
+EXPORT_FIELDS = [
+    ('SMOKE', 'Smoke', 'Density (or RGB color if using multiple colors)'),
+    ('HIRES_SMOKE', 'Hires Smoke', 'High resolution density (or RGB color)'),
+    ('VELOCITY', 'Velocity', 'Velocity X, Y, Z'),
+    ('FLAME', 'Flame', 'Flame, Heat, Fuel'),
+    ('HIRES_FLAME', 'Hires Flame', 'High resolution Flame, React, Fuel'),
+    ]
+EXPORT_FIELDS_ALL = {field[0] for field in EXPORT_FIELDS}
+
+# Fields that can be packed into the channels of a single image (identifier, name, description) - the identifier is the
+# field name in BPhysReader.SMOKE_LAYOUT. 'NONE' leaves the channel empty (0.0, or 1.0 for alpha).
+PACK_FIELDS = [
+    ('NONE', 'None', 'Channel not used'),
+    ('density', 'Density', 'Smoke density'),
+    ('heat', 'Heat', 'Temperature'),
+    ('flame', 'Flame', 'Flame'),
+    ('fuel', 'Fuel', 'Fuel'),
+    ('react', 'React', 'Reaction'),
+    ('rgb_r', 'Color R', 'Smoke color (red)'),
+    ('rgb_g', 'Color G', 'Smoke color (green)'),
+    ('rgb_b', 'Color B', 'Smoke color (blue)'),
+    ('vx', 'Velocity X', 'Velocity (X)'),
+    ('vy', 'Velocity Y', 'Velocity (Y)'),
+    ('vz', 'Velocity Z', 'Velocity (Z)'),
+    ('shadow', 'Shadow', 'Shadow'),
+    ('hires_density', 'Hires Density', 'High resolution density'),
+    ('hires_flame', 'Hires Flame', 'High resolution flame'),
+    ('hires_fuel', 'Hires Fuel', 'High resolution fuel'),
+    ('hires_react', 'Hires React', 'High resolution reaction'),
+    ]
+DEFAULT_CHANNEL_MAP = ('density', 'flame', 'heat', None)
+
+# Name of the packed image - includes the field in each channel (R, G, B, A) so the layout is known from the filename
+def packed_image_name(channelMap):
+    return "pack-" + "-".join("none" if fieldName is None else fieldName for fieldName in channelMap)
+
+# Identifier (in PACK_FIELDS) for the field name (or None)
+def channel_id(fieldName):
+    return 'NONE' if fieldName is None else fieldName
+
+# Channel map as (R, G, B, A) field names (None for unused) from the 'NONE'/field identifiers of PACK_FIELDS
+def channel_map_from_ids(channelIds):
+    return tuple(None if channelId == 'NONE' else channelId for channelId in channelIds)
+
+# Return the images to build from the (open) cache as a list of (name, dimensions, (R, G, B, A field names)). A field
+# name of None means that channel isn't used. Builds the block index but doesn't decompress anything. If channelMap
+# (R, G, B, A field names) is given then a single image with those fields packed into its channels is returned instead.
+def plan_pointcache_images(reader, hiresMultiplier=1, exportFields=None, channelMap=None):
+
+    if reader.flavor != BPhysReader.FLAVOR_SMOKE:
+        print("Only type '3' is currently processed - found "+str(reader.flavor))
+        return []
+
+    #TODO : ....'amplify' setting determines how many divisions the hires volume has. 1 -> 2x2x2, 2 -> 3x3x3, etc. - so multiply by amplify+1 in each dimension. Need to change the 'size' and also the 'dimension' by this factor.
+    hiresmult = hiresMultiplier       # 'amplify'+1
+
+    (res_x, res_y, res_z) = (reader.res_x, reader.res_y, reader.res_z)
+
+    # Find where each field is in the file (one pass, nothing decompressed). Each field is then only read and
+    # decompressed if it's needed for one of the requested exports.
+    index = reader.build_index(hiresmult)
+    print("Block index = "+str(list(index.values())))
+    print("Extra Fields = "+str(reader.extra_fields))
+
+    if channelMap is not None:
+        return plan_packed_image(index, (res_x, res_y, res_z), hiresmult, channelMap)
+
+    if exportFields is None:
+        exportFields = EXPORT_FIELDS_ALL
+
+    #TODO: Get HIRES working correctly
+    #print("WARNING: HIRES not working for flame, fuel, react")
+    #hires_rgb_b = None
+    #hires_flame = None
+
+    images = []
+
+    if 'SMOKE' in exportFields:
+        if 'rgb_b' in index:
+            images.append(("smoke", (res_x, res_y, res_z), ('rgb_r', 'rgb_g', 'rgb_b', None)))
+        else:
+            images.append(("smoke", (res_x, res_y, res_z), ('density', 'density', 'density', None)))
+
+    if 'HIRES_SMOKE' in exportFields:
+        if 'hires_rgb_b' in index:
+            images.append(("hires_smoke", (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), ('hires_rgb_r', 'hires_rgb_g', 'hires_rgb_b', None)))          #TODO: This also seems to be 'wrong' if multi-colored!!!!
+        elif 'hires_density' in index:
+            images.append(("hires_smoke", (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), ('hires_density', 'hires_density', 'hires_density', None)))
+
+    if 'VELOCITY' in exportFields:
+        images.append(("velocity", (res_x, res_y, res_z), ('vx', 'vy', 'vz', None)))
+
+    if 'FLAME' in exportFields:
+        if 'flame' in index:
+            images.append(("flame_heat_fuel", (res_x, res_y, res_z), ('flame', 'heat', 'fuel', None)))
+
+    if 'HIRES_FLAME' in exportFields:
+        if 'hires_flame' in index:
+            #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
+            images.append(("hires_flame_react_fuel", (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), ('hires_flame', 'hires_react', 'hires_fuel', None)))
+
+    return images
+
+# The single image for the channel map (see plan_pointcache_images). Fields not in the cache are left empty. The fields
+# must be all lowres or all hires since they share the image.
+def plan_packed_image(index, dimensions, hiresmult, channelMap):
+    hiresFields = {name for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT if hires}
+
+    fieldNames = []
+    for fieldName in channelMap:
+        if fieldName is not None and fieldName not in index:
+            print("Field '%s' not in cache - channel left empty" % fieldName)
+            fieldName = None
+        fieldNames.append(fieldName)
+
+    resolutions = {fieldName in hiresFields for fieldName in fieldNames if fieldName is not None}
+    if len(resolutions) > 1:
+        print("Can't pack lowres and hires fields into the same image : "+str(channelMap))
+        return []
+    if True in resolutions:
+        dimensions = (dimensions[0]*hiresmult, dimensions[1]*hiresmult, dimensions[2]*hiresmult)
+
+    return [(packed_image_name(fieldNames), dimensions, tuple(fieldNames))]
+
+# Read (and decompress) the fields of one frame needed for the requested exports. Returns a list of
+# (name, dimensions, (R, G, B, A buffers)) where each buffer is a float32 numpy array (or None). The arrays don't
+# reference the file so the result can be returned from a worker process. If 'executor' (a process pool) is given then
+# the compressed blocks are all decompressed at once there (see BPhysReader.read_field_blocks) - so must be None when
+# this is itself run in a worker process.
+def load_pointcache_frame(fname, hiresMultiplier=1, exportFields=None, channelMap=None, executor=None):
+
+    with span('read', file=fname):
+        reader = BPhysReader(fname)
+    try:
+        return read_frame_images(reader, hiresMultiplier, exportFields, channelMap, executor)
+    finally:
+        reader.close()
+
+# As load_pointcache_frame but for an open cache file (BPhysReader)
+def read_frame_images(reader, hiresMultiplier=1, exportFields=None, channelMap=None, executor=None):
+    fname = reader.fname
+    images = plan_pointcache_images(reader, hiresMultiplier, exportFields, channelMap)
+
+    blocks = {}
+    fieldNames = [fieldName for (name, dimensions, imageFields) in images for fieldName in imageFields if fieldName is not None]
+    if reader.uncompressed:
+        # Nothing to decompress - read every field in one go rather than copying each out of the mapped file
+        with span('read', file=fname, fields=len(set(fieldNames))):
+            blocks = reader.read_uncompressed_fields(fieldNames)
+    elif executor is not None:
+        with span('decompress', file=fname, fields=len(set(fieldNames))):
+            blocks = reader.read_field_blocks(fieldNames, executor)
+
+    # Each field is only read once even if it's used for several channels (eg, density for R, G and B)
+    fields = {}
+    result = []
+    for (name, dimensions, fieldNames) in images:
+        buffers = []
+        for fieldName in fieldNames:
+            if fieldName is not None and fieldName not in fields:
+                with span('decompress', field=fieldName):
+                    block = blocks[fieldName] if fieldName in blocks else reader.read_field_block(fieldName)
+                    if block is None or isinstance(block, np.ndarray):
+                        fields[fieldName] = block
+                    elif fieldName in BPhysReader.BYTE_FIELDS:
+                        fields[fieldName] = np.frombuffer(block, dtype=np.uint8).astype(np.float32)
+                    elif block.obj is reader.mm:
+                        # Uncompressed - copy it out of the mapped file
+                        fields[fieldName] = np.frombuffer(block, dtype=np.float32).copy()
+                    else:
+                        fields[fieldName] = np.frombuffer(block, dtype=np.float32)
+            buffers.append(None if fieldName is None else fields[fieldName])
+        result.append((name, dimensions, tuple(buffers)))
+    return result
+
+# Region of the frame where any of the exported fields exceeds the threshold (see crop.py). Returns (bounds, lowres
+# dimensions) where the bounds are in lowres voxels (or None if nothing exceeds the threshold).
+def pointcache_frame_bounds(fname, hiresMultiplier=1, exportFields=None, channelMap=None, threshold=0.0, executor=None):
+    with span('read', file=fname):
+        reader = BPhysReader(fname)
+    try:
+        lowresDimensions = (reader.res_x, reader.res_y, reader.res_z)
+        images = read_frame_images(reader, hiresMultiplier, exportFields, channelMap, executor)
+    finally:
+        reader.close()
+    return (frame_bounds(images, lowresDimensions, threshold), lowresDimensions)
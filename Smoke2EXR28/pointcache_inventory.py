@@ -0,0 +1,147 @@
+# Author: Rich Sedman
+# Description: Scan a point cache directory and report the frames it holds without decompressing anything
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version - header-only scan of each .bphys file (resolution, active fields, compression
+#                   and size of each block), cached in a JSON sidecar file keyed by each file's mtime and size
+##################################################################################################################
+
+# Point cache files are named <cache name>_<frame (6 digits)>_<index (2 digits)>.bphys. Only the fixed header and the
+# block prefixes (compression flag and compressed size) are read - see BPhysReader.build_index. Note that this has no
+# dependency on bpy.
+
+import json
+import os
+import re
+
+from .bphys_reader import BPhysReader
+
+SIDECAR_NAME = "smoke2exr_inventory.json"
+SIDECAR_VERSION = 1
+
+CACHEFILE_PATTERN = re.compile(r'^(.*)_(\d{6})_(\d{2})\.bphys$')
+
+COMPRESSION_NAMES = { 0: 'none', 1: 'light', 2: 'heavy' }
+
+# Read the header and block layout of a single cache file
+def scan_pointcache_file(fname, hiresMultiplier=1):
+    reader = BPhysReader(fname)
+    try:
+        info = {
+            'flavor': reader.flavor,
+            'fileSize': len(reader.view),
+            }
+        if reader.flavor == BPhysReader.FLAVOR_SMOKE:
+            index = reader.build_index(hiresMultiplier)
+            info['version'] = reader.smokeversion.decode('ascii', 'replace')
+            info['fluid_fields'] = reader.fluid_fields
+            info['active_fields'] = reader.active_fields
+            info['resolution'] = [reader.res_x, reader.res_y, reader.res_z]
+            info['dx'] = reader.dx
+            info['blocks'] = [{
+                'name': block.name,
+                'offset': block.offset,
+                'compression': COMPRESSION_NAMES[block.compressed],
+                'compsize': block.compsize,
+                'size': block.size,
+                } for block in index.values()]
+            info['compressedSize'] = sum(block.compsize for block in index.values())
+            info['uncompressedSize'] = sum(block.size for block in index.values())
+    finally:
+        reader.close()
+    return info
+
+def read_sidecar(cachedir):
+    try:
+        with open(os.path.join(cachedir, SIDECAR_NAME), "r") as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if sidecar.get('version') != SIDECAR_VERSION:
+        return {}
+    return sidecar.get('files', {})
+
+def write_sidecar(cachedir, files):
+    fname = os.path.join(cachedir, SIDECAR_NAME)
+    tmpname = fname + ".tmp"
+    try:
+        with open(tmpname, "w") as f:
+            json.dump({'version': SIDECAR_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+        os.replace(tmpname, fname)
+    except OSError as e:
+        # Not fatal (eg, read-only cache directory) - just means the next scan has to read the files again
+        print("Unable to write inventory sidecar %s : %s" % (fname, str(e)))
+
+# Scan the cache directory and return a list of the cache files found (sorted by cache name, frame) with the details of
+# each. If cacheName is given then only files for that cache are included. The details of each file are kept in a
+# sidecar file in the cache directory and only files that have changed (mtime or size) since the last scan are read.
+def scan_pointcache(cachedir, cacheName=None, hiresMultiplier=1, useSidecar=True):
+
+    previous = read_sidecar(cachedir) if useSidecar else {}
+    files = {}
+    changed = False
+
+    if cacheName is not None:
+        # Keep the entries for any other caches in the same directory
+        for (filename, entry) in previous.items():
+            match = CACHEFILE_PATTERN.match(filename)
+            if match is not None and match.group(1) != cacheName:
+                files[filename] = entry
+
+    for filename in sorted(os.listdir(cachedir)):
+        match = CACHEFILE_PATTERN.match(filename)
+        if match is None:
+            continue
+        if cacheName is not None and match.group(1) != cacheName:
+            continue
+
+        try:
+            stat = os.stat(os.path.join(cachedir, filename))
+        except OSError:
+            continue
+
+        entry = previous.get(filename)
+        if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size or entry['hiresMultiplier'] != hiresMultiplier:
+            try:
+                info = scan_pointcache_file(os.path.join(cachedir, filename), hiresMultiplier)
+            except Exception as e:
+                print("Unable to scan %s : %s" % (filename, str(e)))
+                continue
+            entry = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'hiresMultiplier': hiresMultiplier,
+                'info': info,
+                }
+            changed = True
+        files[filename] = entry
+
+    # Also re-write the sidecar if any files have been removed
+    if useSidecar and (changed or set(files) != set(previous)):
+        write_sidecar(cachedir, files)
+
+    inventory = []
+    for filename in files:
+        match = CACHEFILE_PATTERN.match(filename)
+        if cacheName is not None and match.group(1) != cacheName:
+            continue
+        record = dict(files[filename]['info'])
+        record['filename'] = filename
+        record['cacheName'] = match.group(1)
+        record['frame'] = int(match.group(2))
+        record['index'] = int(match.group(3))
+        inventory.append(record)
+
+    inventory.sort(key=lambda record: (record['cacheName'], record['frame'], record['index']))
+    return inventory
+
+# One line per frame (for printing)
+def format_inventory(inventory):
+    lines = []
+    for record in inventory:
+        if 'blocks' in record:
+            compression = ",".join(sorted({block['compression'] for block in record['blocks']}))
+            lines.append("%s frame %i : res %s, active_fields %i, compression %s, %i bytes (%i uncompressed)" % (record['cacheName'], record['frame'], "x".join(str(r) for r in record['resolution']), record['active_fields'], compression, record['fileSize'], record['uncompressedSize']))
+        else:
+            lines.append("%s frame %i : flavor %i (not smoke), %i bytes" % (record['cacheName'], record['frame'], record['flavor'], record['fileSize']))
+    return lines
@@ -0,0 +1,97 @@
+# Author: Rich Sedman
+# Description: Save the atlas at the selected precision - float32 or half EXR, or normalised 16/8 bit PNG
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+# 0.02 18/10/2026 : encode_atlas - the image file content as bytes (to pack into the blend file without saving it)
+# 0.03 18/10/2026 : Store a constant alpha channel as opaque (maxValue) rather than 0
+##################################################################################################################
+
+# For the normalised precisions each channel is scaled from its range (min to max over the volume) to 0..65535 or
+# 0..255. The original value is then :
+#
+#   value = offset + scale * stored / (2^bits - 1)      (= offset + scale * pixel value as read by Blender, 0..1)
+#
+# where offset and scale for each channel are written as the 'offsetR', 'scaleR', 'offsetG', ... metadata (PNG tEXt).
+# Note that this has no dependency on bpy.
+
+import numpy as np
+
+from .atlas import as_float_array
+from . import exr_writer
+from .png_writer import encode_png
+
+# Output precisions (identifier, name, description)
+PRECISIONS = [
+    ('FLOAT', 'Float', '32-bit float EXR'),
+    ('HALF', 'Half', '16-bit float EXR'),
+    ('UINT16', '16-bit Normalised', '16-bit PNG with each channel scaled to its range (scale/offset saved with the image)'),
+    ('UINT8', '8-bit Normalised', '8-bit PNG with each channel scaled to its range (scale/offset saved with the image)'),
+    ]
+
+QUANTIZED_BITS = { 'UINT16': 16, 'UINT8': 8 }
+
+CHANNELS = "RGBA"
+
+def image_extension(precision):
+    return '.png' if precision in QUANTIZED_BITS else '.exr'
+
+# Range (min, max) of each of the R, G, B, A buffers - an unused channel has the value the atlas gives it (0.0, or 1.0
+# for alpha)
+def channel_ranges(buffers):
+    ranges = []
+    for (channel, buffer) in enumerate(buffers):
+        values = None if buffer is None else as_float_array(buffer)
+        if values is None or len(values) == 0:
+            value = 1.0 if channel == 3 else 0.0
+            ranges.append((value, value))
+        else:
+            ranges.append((float(values.min()), float(values.max())))
+    return ranges
+
+# Metadata needed to reconstruct the values from a normalised image
+def range_metadata(ranges):
+    metadata = {}
+    for (channel, (low, high)) in zip(CHANNELS, ranges):
+        metadata['offset'+channel] = low
+        metadata['scale'+channel] = high - low
+    return metadata
+
+# Scale each channel of the (height, width, 4) float pixels from its range to 0..2^bits-1
+def quantize(pixels, ranges, bits):
+    maxValue = (1 << bits) - 1
+    offset = np.array([low for (low, high) in ranges], dtype=np.float32)
+    scale = np.array([high - low for (low, high) in ranges], dtype=np.float32)
+    factor = np.divide(np.float32(maxValue), scale, out=np.zeros_like(scale), where=scale > 0)
+
+    result = pixels - offset
+    result *= factor
+    result += 0.5
+    np.clip(result, 0, maxValue, out=result)
+
+    # A constant channel (scale 0) is stored as 0 - except alpha, which is stored as opaque so that an image with no
+    # alpha buffer isn't fully transparent when loaded (the value is offset + 0 * stored either way)
+    if scale[3] <= 0:
+        result[..., 3] = maxValue
+    return result.astype(np.uint16 if bits == 16 else np.uint8)
+
+# Encode the atlas (bottom line first, as image.pixels) as the image file for the precision (see image_extension).
+# 'ranges' is needed for the normalised precisions (see channel_ranges). Returns (file content, metadata).
+def encode_atlas(pixels, precision='FLOAT', ranges=None):
+    # Image files are top line first
+    pixels = pixels[::-1]
+
+    if precision in QUANTIZED_BITS:
+        metadata = range_metadata(ranges)
+        text = {name: repr(value) for (name, value) in metadata.items()}
+        return (encode_png(quantize(pixels, ranges, QUANTIZED_BITS[precision]), text), metadata)
+
+    pixelType = exr_writer.HALF if precision == 'HALF' else exr_writer.FLOAT
+    return (exr_writer.encode_exr(pixels, CHANNELS, pixelType), {})
+
+# Save the atlas to 'basename' plus the extension for the precision (see encode_atlas). Returns (file size, metadata).
+def save_atlas(basename, pixels, precision='FLOAT', ranges=None):
+    (data, metadata) = encode_atlas(pixels, precision, ranges)
+    with open(basename+image_extension(precision), "wb") as f:
+        f.write(data)
+    return (len(data), metadata)
@@ -0,0 +1,193 @@
+# Author: Rich Sedman
+# Description: Rewrite a smoke point cache at 1/2 or 1/4 resolution - a light preview cache without re-simulating
+# Date: October 2026
+################################################### History ######################################################
+# 0.01 18/10/2026 : Initial version
+##################################################################################################################
+
+# Each frame is read with BPhysReader, every field is reduced by 'factor' in x, y and z and the frame is written with
+# the same layout (bphys_writer.py) and file name to the output directory :
+#
+#   python -m Smoke2EXR28.preview_cache <cache directory> <output directory> [--factor 2|4] [--compression LIGHT|NONE]
+#       [--filter BOX|MAX] [--cache-name smoke] [--hires-multiplier 2] [--workers 8]
+#
+# Each voxel of the new grid is the average ('BOX') or maximum ('MAX' - thin wisps don't fade away) of the
+# factor x factor x factor block of voxels it covers, as for the LOD levels (see lod.py). Sizes that don't divide by
+# the factor are rounded up by repeating the last layer - the hires grids are padded the same way (in lowres voxels) so
+# they're still exactly 'amplify'+1 times the new lowres grid. Velocity and texture coordinates are always averaged
+# and obstacles (one byte per voxel) always use the maximum. Velocities are in domain units so aren't scaled.
+#
+# The header is kept consistent with the new grid - res_x/y/z, the voxel count and dx (and in the extra fields dx,
+# shift, base_res, res_min, res_max). Note that Blender only loads a cache of a different resolution for an adaptive
+# domain - otherwise set the domain's resolution divisions to match the preview before pointing it at the new cache.
+# There's no dependency on bpy.
+
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from .bphys_reader import BPhysReader
+from .bphys_writer import COMPRESSIONS, SmokeCacheHeader, write_smoke_cache
+from .block_cache import block_cache
+from .lod import LOD_FILTERS
+from .pointcache_inventory import scan_pointcache
+
+FACTORS = (2, 4)
+
+# Fields that are always averaged / always use the maximum, whatever the filter
+BOX_FIELDS = {'vx', 'vy', 'vz', 'tcu', 'tcv', 'tcw'}
+MAX_FIELDS = BPhysReader.BYTE_FIELDS
+
+# Positions in BPhysReader.EXTRA_FIELDS_FORMAT (dt, dx, p0[3], p1[3], dp0[3], shift[3], obj_shift_f[3], obmat[16],
+# base_res[3], res_min[3], res_max[3], active_color[3])
+EXTRA_DX = 1
+EXTRA_SHIFT = 11
+EXTRA_BASE_RES = 33
+EXTRA_RES_MIN = 36
+EXTRA_RES_MAX = 39
+
+# Reduce a volume (values with x varying fastest, 'dimensions' voxels) by 'factor' to 'newDimensions' - the volume is
+# first padded (repeating the last layer) to newDimensions*factor. Returns a flat array of the same dtype.
+def downsample_volume(values, dimensions, newDimensions, factor, filter='BOX'):
+    (sizeX, sizeY, sizeZ) = dimensions
+    (newX, newY, newZ) = newDimensions
+    volume = values[:sizeX*sizeY*sizeZ].reshape(sizeZ, sizeY, sizeX)
+    volume = np.pad(volume, ((0, newZ*factor - sizeZ), (0, newY*factor - sizeY), (0, newX*factor - sizeX)), mode='edge')
+
+    blocks = volume.reshape(newZ, factor, newY, factor, newX, factor)
+    if filter == 'MAX':
+        result = blocks.max(axis=(1, 3, 5))
+    else:
+        result = blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+    return np.ascontiguousarray(result, dtype=values.dtype).reshape(-1)
+
+# Header for the reduced cache. Voxel counts/positions in the extra fields are divided by the factor (the active region
+# res_min..res_max then matches the new resolution) and dx is scaled to the new cell size.
+def downsample_header(header, newResolution, factor):
+    scale = float(max(header.resolution)) / max(newResolution)
+
+    extraFields = header.extraFields
+    if extraFields is not None:
+        extraFields = list(extraFields)
+        extraFields[EXTRA_DX] *= scale
+        for axis in range(0, 3):
+            extraFields[EXTRA_SHIFT+axis] //= factor
+            extraFields[EXTRA_BASE_RES+axis] = -(-extraFields[EXTRA_BASE_RES+axis] // factor)
+            extraFields[EXTRA_RES_MIN+axis] //= factor
+            extraFields[EXTRA_RES_MAX+axis] = extraFields[EXTRA_RES_MIN+axis] + newResolution[axis]
+        extraFields = tuple(extraFields)
+
+    # The count is the number of (lowres) voxels for a smoke cache
+    count = header.count
+    if count == header.resolution[0]*header.resolution[1]*header.resolution[2]:
+        count = newResolution[0]*newResolution[1]*newResolution[2]
+
+    return SmokeCacheHeader(newResolution, header.dx * scale, header.fluid_fields, header.active_fields, extraFields,
+        count, header.something, header.smokeversion)
+
+# Rewrite one cache file at 1/factor resolution. 'hiresMultiplier' is the domain's noise 'amplify'+1. Returns the
+# new header, or None if the file isn't a smoke cache.
+def downsample_cachefile(fname, outname, factor=2, hiresMultiplier=1, compression='LIGHT', filter='BOX'):
+    if factor not in FACTORS:
+        raise ValueError("Factor must be one of %s" % str(FACTORS))
+
+    hiresFields = {name for (name, flag, hires) in BPhysReader.SMOKE_LAYOUT if hires}
+
+    with BPhysReader(fname) as reader:
+        if reader.flavor != BPhysReader.FLAVOR_SMOKE:
+            print("%s : only type '3' (smoke) can be downsampled - found %i" % (fname, reader.flavor))
+            return None
+
+        index = reader.build_index(hiresMultiplier)
+        header = SmokeCacheHeader.from_reader(reader)
+        resolution = header.resolution
+        newResolution = tuple(-(-size // factor) for size in resolution)
+
+        fields = {}
+        for (name, block) in index.items():
+            multiplier = hiresMultiplier if name in hiresFields else 1
+            dimensions = tuple(size*multiplier for size in resolution)
+            newDimensions = tuple(size*multiplier for size in newResolution)
+            dtype = np.uint8 if name in BPhysReader.BYTE_FIELDS else np.float32
+
+            data = reader.decode_block(block)
+            values = np.frombuffer(data, dtype=dtype)
+            if len(values) < dimensions[0]*dimensions[1]*dimensions[2]:
+                raise ValueError("%s : field '%s' has %i values (expected %s)" % (fname, name, len(values), "x".join(str(size) for size in dimensions)))
+
+            fieldFilter = 'MAX' if name in MAX_FIELDS else 'BOX' if name in BOX_FIELDS else filter
+            fields[name] = downsample_volume(values, dimensions, newDimensions, factor, fieldFilter)
+            (values, data) = (None, None)
+
+    newHeader = downsample_header(header, newResolution, factor)
+    write_smoke_cache(outname, newHeader, fields, compression)
+    return newHeader
+
+# Worker process set up - each frame is only read once so nothing is kept in the block cache
+def init_worker():
+    block_cache.set_budget(0)
+
+# Rewrite every file of the cache (or just those of 'cacheName') into 'outdir' with the same names. Frames are done
+# in a pool of 'workers' processes (0 = one per CPU, 1 = here). Returns the number of files that couldn't be written.
+def downsample_pointcache(cachedir, outdir, factor=2, cacheName=None, hiresMultiplier=1, compression='LIGHT', filter='BOX', workers=0):
+    if factor not in FACTORS:
+        raise ValueError("Factor must be one of %s" % str(FACTORS))
+    if os.path.abspath(cachedir) == os.path.abspath(outdir):
+        raise ValueError("The preview cache must be written to a different directory")
+
+    inventory = scan_pointcache(cachedir, cacheName, hiresMultiplier)
+    os.makedirs(outdir, exist_ok=True)
+    jobs = [(os.path.join(cachedir, record['filename']), os.path.join(outdir, record['filename'])) for record in inventory]
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    failed = 0
+    if workers <= 1 or len(jobs) <= 1:
+        init_worker()
+        for (fname, outname) in jobs:
+            try:
+                if downsample_cachefile(fname, outname, factor, hiresMultiplier, compression, filter) is not None:
+                    print("Written %s" % outname)
+            except (OSError, ValueError) as e:
+                print("Unable to downsample %s : %s" % (fname, str(e)))
+                failed += 1
+        return failed
+
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as executor:
+        futures = [(fname, outname, executor.submit(downsample_cachefile, fname, outname, factor, hiresMultiplier, compression, filter)) for (fname, outname) in jobs]
+        for (fname, outname, future) in futures:
+            try:
+                if future.result() is not None:
+                    print("Written %s" % outname)
+            except (OSError, ValueError) as e:
+                print("Unable to downsample %s : %s" % (fname, str(e)))
+                failed += 1
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m Smoke2EXR28.preview_cache", description="Rewrite a smoke point cache at a reduced resolution for previews")
+    parser.add_argument("cachedir", help="Point cache directory (eg, blendcache_<blend file name>)")
+    parser.add_argument("outdir", help="Directory for the preview cache (files keep the same names)")
+    parser.add_argument("--factor", type=int, choices=FACTORS, default=2, help="Reduce the resolution by this factor")
+    parser.add_argument("--compression", choices=sorted(COMPRESSIONS), default='LIGHT', help="Block compression of the preview cache")
+    parser.add_argument("--filter", choices=[lodFilter[0] for lodFilter in LOD_FILTERS], default='BOX', help="How each block of voxels is reduced")
+    parser.add_argument("--cache-name", help="Only rewrite this cache (the files are <name>_<frame>_<index>.bphys)")
+    parser.add_argument("--hires-multiplier", type=int, default=1, help="Domain's noise 'amplify' + 1 (for the hires fields)")
+    parser.add_argument("--workers", type=int, default=0, help="Number of worker processes (0 = one per CPU, 1 = no worker processes)")
+    args = parser.parse_args(argv)
+
+    try:
+        failed = downsample_pointcache(args.cachedir, args.outdir, args.factor, args.cache_name, args.hires_multiplier, args.compression, args.filter, args.workers)
+    except (OSError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,23 @@
 # RAS 26/08/2019 : Improve efficiency of 'pack', add better diagnostics as to progress, implement 'multiRow' mode
 #                  - all changes developed as part of the MRI Raw to EXR script.
 # RAS 28/08/2019 : Implement hires capture
+# RAS 18/10/2026 : Use slice-based (or native) LZO decompression from lzo_codec.py
+#                  Support 'heavy' (LZMA) compressed blocks
+#                  Read the cache using the memory-mapped BPhysReader (bphys_reader.py)
+#                  Index the blocks and only decompress the fields needed for the selected exports ('exportFields')
+#                  Build the image pixels with NumPy (atlas.py) rather than per-voxel loops
+#                  Convert a range of frames, reading the cache files in a pool of worker processes
+#                  Only convert the frames actually in the cache (header-only scan - pointcache_inventory.py)
+#                  Write the EXR directly from the pixel array (exr_writer.py) - optionally as half float
+#                  Keep decompressed blocks between runs (block_cache.py)
+#                  Optionally pack several fields into the channels of one image ('packChannels')
+#                  Selectable output precision - float, half or normalised 16/8 bit (precision.py), replaces 'halfFloat'
+#                  Optionally crop the images to the region occupied over the frame range (crop.py)
+#                  Optionally write the volumes as sparse bricks instead of image atlases (sparse_bricks.py)
+#                  Optionally also export reduced resolution LOD levels of each volume (lod.py)
+#                  Pack the encoded image straight into the blend file rather than saving and loading a file
+#                  Optionally time each stage of the export and write a JSON report (profiling.py)
+#                  Optionally decompress the blocks of a single frame in a pool of processes ('blockWorkers')
 
 #TODO: multiple frames to one exr. Also, image compression... - actually, now 'multirow', can't do multiple frames... perhaps that could be a sub-mode for single-row mode only.
 
@@ -55,11 +72,11 @@
 # Optional turbulance - hi-res [...size based on number of 'divisions'+1 cubed - so 1 division is 2x2x2 times bigger, 2 divisions is 3x3x3 times bigger, etc.]
 #   Optional:
 #       block - density (hi-res)
-#   Optional :
-#       block - flame (hi-res) [TODO: seems to only be populated with 'small' array - need to analyse content - not 'flame']
-#       block - fuel (hi-res)  [TODO: seems to only be populated with 'small' array - need to analyse content - not 'fuel']
-#       block - react (hi-res) [TODO: seems to only be populated with 'small' array - need to analyse content - not 'react']
-#   Optional :
+#   Optional (only if fluid_fields includes SM_ACTIVE_FIRE - without fire the next blocks are tcu/tcv/tcw) :
+#       block - flame (hi-res)
+#       block - fuel (hi-res)
+#       block - react (hi-res)
+#   Optional (only if fluid_fields includes SM_ACTIVE_COLORS) :
 #       block - red (hi-res)
 #       block - green (hi-res)
 #       block - blue (hi-res)
@@ -96,238 +113,38 @@ import os
 import sys
 import struct
 import math
+import collections
+import concurrent.futures
+import multiprocessing
+import time
 
 #imp.load_source("lzo_spec", os.path.join(sys.path[0],"io_scene_fpx"))
 
-################# Copied in from addons_contrib/io_scene_fpx/lzo_spec.py ############################
-# From https://blender.stackexchange.com/a/61276/29586
-
-import struct
-
-#### !!!! Copied from lzo_spec.py within the Blender directory structure !!!
-# ##### BEGIN GPL LICENSE BLOCK #####
-#
-#  This program is free software you can redistribute it and/or
-#  modify it under the terms of the GNU General Public License
-#  as published by the Free Software Foundation either version 2
-#  of the License, or (at your option) any later version.
-#
-#  This program is distributed in the hope that it will be useful,
-#  but WITHOUT ANY WARRANTY without even the implied warranty of
-#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
-#  GNU General Public License for more details.
-#
-#  You should have received a copy of the GNU General Public License
-#  along with this program if not, write to the Free Software Foundation,
-#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
-#
-# ##### END GPL LICENSE BLOCK #####
-
-# <pep8 compliant>
-
-###############################################################################
-#234567890123456789012345678901234567890123456789012345678901234567890123456789
-#--------1---------2---------3---------4---------5---------6---------7---------
-
-
-# ##### BEGIN COPYRIGHT BLOCK #####
-#
-# initial script copyright (c)2013 Alexander Nussbaumer
-#
-# ##### END COPYRIGHT BLOCK #####
-
-## this is a basic, partial and stripped implementation to read
-## [LZO:1X]: Lempel-Ziv-Oberhumer lossless data compression algorithm
-## http://www.oberhumer.com/opensource/lzo/
-## this python implementation based on the java implementation from:
-## http://www.oberhumer.com/opensource/lzo/download/LZO-v1/java-lzo-1.00.tar.gz
-
-
-class Lzo_Codec:
-
-    LZO_E_OK                  =  0
-    LZO_E_ERROR               = -1
-    LZO_E_INPUT_OVERRUN       = -4
-    LZO_E_LOOKBEHIND_OVERRUN  = -6
-    LZO_E_INPUT_NOT_CONSUMED  = -8
-
-    @staticmethod
-    def Lzo1x_Decompress(src, src_offset, src_length, dst, dst_offset):
-        """
-        src = bytes
-        dst = bytearray
-
-        returns: error, result_index
-        """
-        src_index = src_offset
-        dst_index = dst_offset
-        value = 0
-        pos = 0
-        error = Lzo_Codec.LZO_E_OK
-        result_index = dst_index
-
-        value = src[src_index]
-        src_index += 1
-        if value > 17:
-            value -= 17
-            while True: ## do while value > 0
-                dst[dst_index] = src[src_index]
-                value -= 1
-                if value <= 0:
-                    break ## do while value > 0
-            dst_index += 1
-            src_index += 1
-            value = src[src_index]
-            src_index += 1
-            if value < 16:
-                error = Lzo_Codec.LZO_E_ERROR
-                return error, result_index
-
-        ## loop:
-        loop = False
-        src_index -= 1 ## 1 for (;;value = src[src_index++])
-        while not loop: ## 1 for (;;value = src[src_index++])
-            value = src[src_index] ## 1 for (;;value = src[src_index++])
-            src_index += 1 ## 1 for (;;value = src[src_index++])
-            if value < 16:
-                if value == 0:
-                    while src[src_index] == 0:
-                        value += 255
-                        src_index += 1
-                    value += 15 + src[src_index]
-                    src_index += 1
-                value += 3
-                while True: ## do while value > 0
-                    dst[dst_index] = src[src_index]
-                    dst_index += 1
-                    src_index += 1
-                    value -= 1
-                    if value <= 0:
-                        break ## do while value > 0
-                value = src[src_index]
-                src_index += 1
-                if value < 16:
-                    pos = dst_index - 0x801 - (value >> 2) - (src[src_index] << 2)
-                    src_index += 1
-                    if pos < dst_offset:
-                        error = Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN
-                        loop = True
-                        break ## loop
-                    value = 3
-                    while True: ## do while value > 0
-                        dst[dst_index] = dst[pos]
-                        dst_index += 1
-                        pos += 1
-                        value -= 1
-                        if value <= 0:
-                            break ## do while value > 0
-                    value = src[src_index-2] & 3
-                    if value == 0:
-                        continue ## 1 for (;;value = src[src_index++])
-                    while True: ## do while value > 0
-                        dst[dst_index] = src[src_index]
-                        dst_index += 1
-                        src_index += 1
-                        value -= 1
-                        if value <= 0:
-                            break ## do while value > 0
-                    value = src[src_index]
-                    src_index += 1
-
-            src_index -= 1 ## 2 for (;;value = src[src_index++])
-            while not loop: ## 2 for (;;value = src[src_index++])
-                value = src[src_index] ## 2 for (;;value = src[src_index++])
-                src_index += 1 ## 2 for (;;value = src[src_index++])
-                if value >= 64:
-                    pos = dst_index - 1 - ((value >> 2) & 7) - (src[src_index] << 3)
-                    src_index += 1
-                    value = (value >> 5) - 1
-                elif value >= 32:
-                    value &= 31
-                    if value == 0:
-                        while src[src_index] == 0:
-                            value += 255
-                            src_index += 1
-                        value += 31 + src[src_index]
-                        src_index += 1
-                    pos = dst_index - 1 - (src[src_index] >> 2)
-                    src_index += 1
-                    pos -= (src[src_index] << 6)
-                    src_index += 1
-                elif value >= 16:
-                    pos = dst_index - ((value & 8) << 11)
-                    value &= 7
-                    if value == 0:
-                        while src[src_index] == 0:
-                            value += 255
-                            src_index += 1
-                        value += 7 + src[src_index]
-                        src_index += 1
-                    pos -= (src[src_index] >> 2)
-                    src_index += 1
-                    pos -= (src[src_index] << 6)
-                    src_index += 1
-                    if pos == dst_index:
-                        loop = True
-                        break ## loop
-                    pos -= 0x4000
-                else:
-                    pos = dst_index - 1 - (value >> 2) - (src[src_index] << 2)
-                    src_index += 1
-                    value = 0
-                if pos < dst_offset:
-                    error = Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN
-                    loop = True
-                    break ## loop
-                value += 2
-                while True: ## do while value > 0
-                    dst[dst_index] = dst[pos]
-                    dst_index += 1
-                    pos += 1
-                    value -= 1
-                    if value <= 0:
-                        break ## do while value > 0
-                value = src[src_index - 2] & 3
-                if value == 0:
-                    break
-                while True: ## do while value > 0
-                    dst[dst_index] = src[src_index]
-                    dst_index += 1
-                    src_index += 1
-                    value -= 1
-                    if value <= 0:
-                        break ## do while value > 0
-
-        src_index -= src_offset
-        dst_index -= dst_offset
-        result_index = dst_index
-        if error < Lzo_Codec.LZO_E_OK:
-            return error, result_index
-        if src_index < src_length:
-            error = Lzo_Codec.LZO_E_INPUT_NOT_CONSUMED
-            return error, result_index
-        if src_index > src_length:
-            error = Lzo_Codec.LZO_E_INPUT_OVERRUN
-            return error, result_index
-        if value != 1:
-            error = Lzo_Codec.LZO_E_ERROR
-            return error, result_index
-        return error, result_index
-
-###############################################################################
+from .bphys_reader import BPhysReader
+from .atlas import atlas_name, build_atlas
+from .pointcache_frame import EXPORT_FIELDS, EXPORT_FIELDS_ALL, plan_pointcache_images, load_pointcache_frame
+from .pointcache_frame import pointcache_frame_bounds
+from .pointcache_frame import PACK_FIELDS, DEFAULT_CHANNEL_MAP, channel_id, channel_map_from_ids
+from .precision import PRECISIONS, QUANTIZED_BITS, image_extension, channel_ranges, encode_atlas
+from .crop import DEFAULT_THRESHOLD, union_bounds, crop_image
+from .sparse_bricks import write_bricks
+from .lod import LOD_FILTERS, MAX_LOD_LEVELS, lod_images
+from .block_cache import block_cache, DEFAULT_BUDGET
+from .pointcache_inventory import scan_pointcache, format_inventory
+from .profiling import span, start_profile, finish_profile
 
 ######## My code start #########
 
-def convert_pointcache_volume_to_exr(fname, oPattern, oframeno, multiRow=False, hiresMultiplier=1):
+# 'blockWorkers' is the number of worker processes used to decompress the blocks of the frame (0 = one per CPU,
+# 1 = decompress each block here as it's needed).
+def convert_pointcache_volume_to_exr(fname, oPattern, oframeno, multiRow=False, hiresMultiplier=1, exportFields=None, precision='FLOAT', channelMap=None, outputFormat='ATLAS', lodLevels=0, lodFilter='BOX',
+        blockWorkers=1):
     
-    f = open(fname, "rb")
-
-    magic = f.read(8)
-    if magic != b'BPHYSICS':
-        raise Exception("not a blender physics cache")
+    # Memory-map the file - uncompressed blocks are then just views of the file rather than copies
+    with span('read', file=fname):
+        f = BPhysReader(fname)
 
-    flavor = f.read(12)
-    (flavor,count,something) = struct.unpack("iii", flavor)
+    (flavor,count,something) = (f.flavor, f.count, f.something)
 
     print( "%d\t%d\t%d"%(flavor,count,something))
 
@@ -337,245 +154,214 @@ def convert_pointcache_volume_to_exr(fname, oPattern, oframeno, multiRow=False,
     else:
         print("Flavor = %i" % flavor)
 
-        smokeversion = f.read(4)
+        smokeversion = f.smokeversion
         print("Smoke version = "+str(smokeversion))
         
-        fields = f.read(24)
-        (fluid_fields,active_fields, res_x, res_y, res_z, dx) = struct.unpack("iiiiif", fields)
+        (fluid_fields,active_fields, res_x, res_y, res_z, dx) = (f.fluid_fields, f.active_fields, f.res_x, f.res_y, f.res_z, f.dx)
         print("Got fields %i\t%i\t%i\t%i\t%i\t%f" % (fluid_fields,active_fields, res_x, res_y, res_z, dx))
 
-        SM_ACTIVE_HEAT		= 1
-        SM_ACTIVE_FIRE		= 2
-        SM_ACTIVE_COLORS	= 4
-        SM_ACTIVE_COLOR_SET	= 8
+        # Work out which images to build (see pointcache_frame.py) and then read/decompress just the fields for each
+        # image as it's built
+        images = plan_pointcache_images(f, hiresMultiplier, exportFields, channelMap)
+
+        # ...or decompress all the blocks needed at once, spread over a pool of processes (they're independent once
+        # the index is built) - the results come back in field order
+        blocks = {}
+        executor = process_pool(blockWorkers)
+        if executor is not None:
+            try:
+                fieldNames = [fieldName for (name, dimensions, imageFields) in images for fieldName in imageFields if fieldName is not None]
+                with span('decompress', frame=oframeno, fields=len(set(fieldNames))):
+                    blocks = f.read_field_blocks(fieldNames, executor)
+            finally:
+                executor.shutdown()
+
+        for (name, dimensions, fieldNames) in images:
+            # Each field is only read once even if it's used for several channels (eg, density for R, G and B) so the
+            # channels share the one buffer (and BRICKS/SEQUENCE output store it once)
+            fields = {}
+            with span('decompress', image=name):
+                for fieldName in fieldNames:
+                    if fieldName is not None and fieldName not in fields:
+                        fields[fieldName] = blocks[fieldName] if fieldName in blocks else f.read_field_block(fieldName)
+                buffers = [None if fieldName is None else fields[fieldName] for fieldName in fieldNames]
+            with span('lod', image=name):
+                lods = lod_images(name, dimensions, buffers, lodLevels, lodFilter)
+            for (name, dimensions, buffers) in [(name, dimensions, buffers)] + lods:
+                build_exr_from_buffers(gen_filename(name,oPattern, oframeno), dimensions, buffers[0], buffers[1], buffers[2], buffers[3], multiRow=multiRow, precision=precision, outputFormat=outputFormat)
+
+        blocks = None
 
-        #TODO : ....'amplify' setting determines how many divisions the hires volume has. 1 -> 2x2x2, 2 -> 3x3x3, etc. - so multiply by amplify+1 in each dimension. Need to change the 'size' and also the 'dimension' by this factor.
-        hiresmult = hiresMultiplier       # 'amplify'+1
-
-        size = res_x * res_y * res_z * 4
-        hiressize = size * hiresmult*hiresmult*hiresmult
-
-        shadow = read_block(f, size)
-        density = read_block(f, size)    
-
-        heat = None
-        heatold = None
-        if (active_fields & SM_ACTIVE_HEAT) > 0:
-            heat = read_block(f, size)
-            heatold = read_block(f, size)
-            
-        flame = None
-        fuel = None
-        react = None
-        if (active_fields & SM_ACTIVE_FIRE) > 0:
-            flame = read_block(f, size)
-            fuel = read_block(f, size)
-            react = read_block(f, size)
-
-        rgb_r = None
-        rgb_g = None
-        rgb_b = None
-        if (active_fields & SM_ACTIVE_COLORS) > 0:
-            rgb_r = read_block(f, size)
-            rgb_g = read_block(f, size)
-            rgb_b = read_block(f, size)
-            
-        vx = read_block(f, size)
-        vy = read_block(f, size)
-        vz = read_block(f, size)
-
-        obstacles = read_block(f, size)
-
-        extrafields = f.read(45*4)
-        rec = struct.unpack("fffffffffffiiifffffffffffffffffffiiiiiiiiifff",extrafields)
-        print("Extra Fields = "+str(rec))
-        
-        hires_density = read_block(f, hiressize)
-        hires_flame = read_block(f, hiressize)      #TODO: Need to figure out why these aren't coming back as 'hires' data blocks - I think it's getting confused with other blocks... if enable multi-color (more than one colored emitter) then these seem to be the hires colors!! Otherwise it's "something else" but in *lowres*
-        hires_fuel = read_block(f, hiressize)
-        hires_react = read_block(f, hiressize)
-
-        hires_rgb_r = None
-        hires_rgb_g = None
-        hires_rgb_b = None
-        if (active_fields & SM_ACTIVE_COLORS) > 0:
-            hires_rgb_r = read_block(f, hiressize)
-            hires_rgb_g = read_block(f, hiressize)
-            hires_rgb_b = read_block(f, hiressize)
-
-        tcu = read_block(f, size)
-        tcv = read_block(f, size)
-        tcw = read_block(f, size)
-
-        #TODO: Get HIRES working correctly
-        #print("WARNING: HIRES not working for flame, fuel, react")
-        #hires_rgb_b = None
-        #hires_flame = None
-
-        if rgb_b != None:
-            build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), rgb_r, rgb_g, rgb_b, None, multiRow=multiRow)
-        else:
-            build_exr_from_buffers(gen_filename("smoke",oPattern, oframeno), (res_x, res_y, res_z), density, density, density, None, multiRow=multiRow)
-
-        if hires_rgb_b != None:
-            build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_rgb_r, hires_rgb_g, hires_rgb_b, None, multiRow=multiRow)          #TODO: This also seems to be 'wrong' if multi-colored!!!!
-        else:
-            if hires_density != None:
-                build_exr_from_buffers(gen_filename("hires_smoke",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_density, hires_density, hires_density, None, multiRow=multiRow)
-
-        build_exr_from_buffers(gen_filename("velocity",oPattern, oframeno), (res_x, res_y, res_z), vx, vy, vz, None, multiRow=multiRow)
-
-        if flame != None:
-            build_exr_from_buffers(gen_filename("flame_heat_fuel",oPattern, oframeno), (res_x, res_y, res_z), flame, heat, fuel, None, multiRow=multiRow)
-                
-        if hires_flame != None:
-            #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)
-            #build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x, res_y, res_z), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
-            build_exr_from_buffers(gen_filename("hires_flame_react_fuel",oPattern, oframeno), (res_x*hiresmult, res_y*hiresmult, res_z*hiresmult), hires_flame, hires_react, hires_fuel, None, multiRow=multiRow)     #TODO: Determine why these buffers aren't hires and what they are... something to do with hires turbulence?!!!
+    f.close()
 
+# Pool of 'workers' worker processes (0 = one per CPU) for reading the cache, or None if workers is 1
+def process_pool(workers):
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return None
+
+    # Worker processes need a Python interpreter rather than the Blender executable (2.91 and earlier)
+    context = multiprocessing.get_context('spawn')
+    if getattr(bpy.app, 'binary_path_python', None):
+        context.set_executable(bpy.app.binary_path_python)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+# Call function(fname, *args) for each of the cache files, yielding (frameno, result) in frame order. If 'executor' is a
+# process pool then the calls are made there with up to workers*2 frames in progress (so that results don't pile up
+# waiting for the slower image creation here), otherwise they're made here. Frames that can't be read are skipped.
+def map_cachefiles(executor, workers, function, cachefiles, *args):
+
+    if executor is None:
+        for (frameno, fname) in cachefiles:
+            print("Frame %i : %s" % (frameno, fname))
+            try:
+                result = function(fname, *args)
+            except OSError as e:
+                print("Skipping frame %i : %s" % (frameno, str(e)))
+                continue
+            yield (frameno, result)
+        return
+
+    pending = collections.deque()
+    frames = iter(cachefiles)
+    while True:
+        while len(pending) < workers*2:
+            nextFrame = next(frames, None)
+            if nextFrame is None:
+                break
+            (frameno, fname) = nextFrame
+            pending.append((frameno, fname, executor.submit(function, fname, *args)))
+
+        if len(pending) == 0:
+            break
+
+        (frameno, fname, future) = pending.popleft()
+        print("Frame %i : %s" % (frameno, fname))
+        try:
+            # Time waiting for the worker (the reading and decompression there isn't profiled)
+            with span('wait', frame=frameno):
+                result = future.result()
+        except OSError as e:
+            print("Skipping frame %i : %s" % (frameno, str(e)))
+            continue
+        yield (frameno, result)
+
+# Convert a range of frames. Reading and decompressing the point cache files (pure Python - no bpy) is done in a pool
+# of worker processes while the images are created and saved here on the main thread as each frame becomes available.
+# 'cachefiles' is a list of (frameno, cache filename). 'workers' is the number of worker processes (0 = one per CPU,
+# 1 = don't use worker processes). If 'cropThreshold' is given then the images are cropped to the region where any of
+# the exported fields exceeds it in any of the frames (see crop.py) - this needs an extra pass over the frames first.
+# 'lodLevels' reduced resolution versions of each image are also created (see lod.py). If the frames are read here
+# (workers = 1) then the blocks of each frame can be decompressed in a pool of 'blockWorkers' processes instead.
+def convert_pointcache_range_to_exr(cachefiles, oPattern, multiRow=False, hiresMultiplier=1, exportFields=None, workers=0, precision='FLOAT', channelMap=None, outputFormat='ATLAS', cropThreshold=None,
+        lodLevels=0, lodFilter='BOX', blockWorkers=1):
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    def build_frame(frameno, images):
+        with span('lod', frame=frameno):
+            images = images + [lod for image in images for lod in lod_images(*image, lodLevels, lodFilter)]
+        for (name, dimensions, buffers) in images:
+            build_exr_from_buffers(gen_filename(name,oPattern, frameno), dimensions, buffers[0], buffers[1], buffers[2], buffers[3], multiRow=multiRow, precision=precision, outputFormat=outputFormat)
+
+    executor = process_pool(workers)
+
+    # Frames can't be handed to the block pool from a worker process, so it's only used when reading frames here
+    blockExecutor = process_pool(blockWorkers) if executor is None else None
 
-    f.close()
+    try:
+        bounds = None
+        if cropThreshold is not None:
+            # Region occupied over the whole range. Note that this assumes the domain resolution doesn't change.
+            for (frameno, (frameBounds, lowresDimensions)) in map_cachefiles(executor, workers, pointcache_frame_bounds, cachefiles, hiresMultiplier, exportFields, channelMap, cropThreshold, blockExecutor):
+                bounds = union_bounds(bounds, frameBounds)
+            if bounds is None:
+                print("Nothing above the crop threshold - images not cropped")
+            else:
+                print("Cropping to %s of %s" % (str(bounds), str(lowresDimensions)))
+
+        for (frameno, images) in map_cachefiles(executor, workers, load_pointcache_frame, cachefiles, hiresMultiplier, exportFields, channelMap, blockExecutor):
+            if bounds is not None:
+                with span('crop', frame=frameno):
+                    images = [crop_image(name, dimensions, buffers, bounds, lowresDimensions) for (name, dimensions, buffers) in images]
+            build_frame(frameno, images)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if blockExecutor is not None:
+            blockExecutor.shutdown()
 
 # Generate filename by combining name, pattern, frameno
 def gen_filename(name, pattern, frameno):
     return pattern % (name, frameno)
 
-#read data from the file and uncompress as necessary. Return block as a bytearray
-def read_block(f, size):
-            compressed = f.read(1)
-            #print("compressed = "+str(compressed))
-            
-            if compressed == b'':
-                print("Reached End Of Stream")
-                return None
-
-            if compressed == b'\x02':
-                print("'Heavy' compression not supported")
-                return None
-            
-            if compressed > b'\x02':
-                print("Unknown block type")
-                return None
-        
-            if compressed == b'\x01':
-                compsize_bytes = f.read(4)
-                compsize = struct.unpack("i",compsize_bytes)[0]
-                buffer = f.read(compsize)
-                destbuffer = bytearray(size)
-                (error, result_index) = Lzo_Codec.Lzo1x_Decompress(buffer, 0, compsize, destbuffer, 0)
-                print("Uncompressed from "+str(compsize)+" to a buffer of "+str(size)+" result_index = "+str(result_index))
-                return destbuffer
-            
-            else:
-                buffer = f.read(size)
-                return buffer
-                
+# Create an image from the content of an image file ('data') and pack it into the blend file - nothing is written to
+# disk. The image is created 1x1 (so no pixel buffer is allocated for it) and takes its size from the packed file when
+# its source is set to 'FILE'. 'filepath' is the name the image would be unpacked to.
+def pack_image_data(name, filepath, data):
+    image = bpy.data.images.new(name, 1, 1, alpha=True)
+    image.pack(data=data, data_len=len(data))
+    image.filepath_raw = filepath
+    image.source = 'FILE'
+    image.name = name
+    return image
 
-def build_exr_from_buffers(filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False):
+def build_exr_from_buffers(filename, dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=False, precision='FLOAT', outputFormat='ATLAS'):
 
-    if multiRow:
-        numColumns = math.ceil(math.sqrt(dimensions[2]))
-        numRows = math.ceil(dimensions[2] / numColumns)
-    else:
-        numColumns = dimensions[2]
-        numRows = 1
+    if outputFormat == 'BRICKS':
+        # No image - just write the brick file
+        print("Writing bricks %s, Dimensions = (%i,%i,%i)" % (filename, dimensions[0], dimensions[1], dimensions[2]))
+        with span('bricks', image=filename):
+            write_bricks(bpy.path.abspath('//')+filename+'.npz', dimensions, (bufferR, bufferG, bufferB, bufferA))
+        return
 
-    filename = str(dimensions[2])+"_"+str(numColumns)+"x"+str(numRows)+"_"+filename
+    filename = atlas_name(filename, dimensions, multiRow)
 
     print("Building image %s" % filename)
 
-    # Size the image to allow space for Z images of size X by Y
-    width = (dimensions[0]+1)*numColumns
-    if numRows >1:
-        height = (dimensions[1]+1)*numRows
-    else:
-        height = dimensions[1]
-
-    # Create the image
-    image = bpy.data.images.new(filename, width=width, height=height,float_buffer=True)
-
-    # Create an empty array of pixel data (each will hold R, G, B, A values as floats)
-    print("Clearing image...")
-    pixels = [None] * width * height
-    for x in range(0,width):
-        for y in range(0,height):
-            pixels[y*width+x] = [0.0,0.0,0.0,0.0]
-            
     print("File '"+filename+"', Dimensions = ("+str(dimensions[0])+","+str(dimensions[1])+","+str(dimensions[2])+")")
-    
-    for z in range(0,dimensions[2]):
-        print("Processing layer "+str(z))
-        
-        #Calculate the location of this 'tile'
-        tileNoX = z % numColumns
-        tileNoY = int((z - tileNoX) / numColumns)
-        tileOffset = tileNoX*(dimensions[0]+1)+tileNoY*width*(dimensions[1]+1)
 
-        for x in range(0,dimensions[0]):
-        
-            for y in range(0,dimensions[1]):
-            
-                p = x+y*dimensions[0]+z*dimensions[0]*dimensions[1]
-
-                # If R, G, or B are 'none' then 0.0 is assumed
-                valR = 0
-                valG = 0
-                valB = 0
-                if bufferR != None:
-                    valR = struct.unpack('f',bufferR[p*4:p*4+4])[0]
-                    
-                if bufferG != None:
-                    valG = struct.unpack('f',bufferG[p*4:p*4+4])[0]
-
-                if bufferB != None:
-                    valB = struct.unpack('f',bufferB[p*4:p*4+4])[0]
-
-                # bufferA can be None to indicate not used (in which case 1.0 is assumed)
-                if bufferA != None:
-                    valA = struct.unpack('f',bufferA[p*4:p*4+4])[0]
-                else:
-                    valA = 1.0
-                
-               # pixels[(y*width)+x+z*(dimensions[0]+1)] = [valR,valG,valB,valA]
-                pixels[tileOffset + x + y*width] = [valR,valG,valB,valA]
-
-    # 'flatten' the array - so [R1,G1,B1,A1], [R2,G2,B2,A2], [R3,G3,B3,A3],.... becomes R1,B1,G1,A1,R2,G2,B2,A2,R3,G3,B3,A3,....    
-    # Store the pixels in the image
-    print("Image build complete, storing pixels...")
-    image.pixels = [chan for px in pixels for chan in px]
-    print("Updating image...")
-    image.update()
-
-    print("Saving image...")
-    # Save image to temporary file and pack it (from answer by @sambler)
-    scn = bpy.data.scenes.new('img_settings')
-    scn.render.image_settings.file_format = 'OPEN_EXR'
-    scn.render.image_settings.exr_codec = 'ZIP'
-    scn.render.image_settings.color_mode = 'RGBA'
-    scn.render.image_settings.color_depth = '32'
-    img_path = bpy.path.abspath('//')
-    img_file = image.name+'.exr'
-    image.save_render(img_path+img_file, scene=scn)
-    try:
-        # Remove the scene (pre-2.78)
-        bpy.data.scenes.remove(scn)
-    except:
-        # Remove the scene, (Blender 2.78+)
-        bpy.data.scenes.remove(scn, do_unlink=True)
-        
-    #Pack the images (needs to be saved and re-opened)
-    if bpy.app.version_string.startswith('2.79'):
-        bpy.data.images.remove(image)
-        bpy.ops.image.open(filepath=img_path+img_file)
-        image = bpy.data.images[img_file]
-        
-    image.pack()
-    if bpy.app.version_string.startswith('2.79'):
-        os.remove(img_path+img_file)
-    
-    image.use_fake_user = True
+    with span('tile', image=filename):
+        # Range of each channel (for the normalised precisions)
+        ranges = None
+        if precision in QUANTIZED_BITS:
+            ranges = channel_ranges((bufferR, bufferG, bufferB, bufferA))
+            print("Channel ranges = "+str(ranges))
+
+        # Build the whole image (R, G, B, A float per pixel) as a numpy array - see atlas.py
+        pixels = build_atlas(dimensions, bufferR, bufferG, bufferB, bufferA, multiRow=multiRow)
+
+    # Encode the image file in memory (see precision.py) and pack that straight into the blend file - the project
+    # directory isn't touched
+    print("Image build complete, packing image...")
+    img_file = filename+image_extension(precision)
+    with span('encode', image=filename):
+        (data, metadata) = encode_atlas(pixels, precision, ranges)
+    print("Encoded %s (%i bytes)" % (img_file, len(data)))
+
+    with span('pack', image=filename, size=len(data)):
+        image = pack_image_data(filename, '//'+img_file, data)
+        if precision in QUANTIZED_BITS:
+            # Values are data (not color) and the scale/offset to reconstruct them are kept with the image
+            image.colorspace_settings.name = 'Non-Color'
+            # Each channel is packed data - never premultiply RGB by alpha
+            image.alpha_mode = 'CHANNEL_PACKED'
+            for (key, value) in metadata.items():
+                image[key] = value
+
+        image.use_fake_user = True
     print("Complete.")
 
+# Output formats (identifier, name, description)
+OUTPUT_FORMATS = [
+    ('ATLAS', 'Image Atlas', 'Image with a tile for each Z layer'),
+    ('BRICKS', 'Sparse Bricks', 'NumPy .npz with only the occupied 8x8x8 bricks of the volume (see sparse_bricks.py)'),
+    ]
+
+BLOCK_CACHE_DEFAULT_MB = DEFAULT_BUDGET // (1024*1024)
+
 class Smoke2EXR_Operator(bpy.types.Operator):
     """Convert a smoke domain into an EXR image file"""
     
@@ -588,6 +374,27 @@ class Smoke2EXR_Operator(bpy.types.Operator):
     frameNo: bpy.props.IntProperty(description='Enter the frame to convert', name='Frame')
     smokeCacheName: bpy.props.StringProperty(description="The selection object's smoke cache name", name="Cache Name")
     multiRow: bpy.props.BoolProperty(description='Create multi-row image instead of a single row of tiles', name="Multi-Row")
+    exportFields: bpy.props.EnumProperty(items=EXPORT_FIELDS, options={'ENUM_FLAG'}, default=EXPORT_FIELDS_ALL, description='Images to create from the smoke cache', name="Export")
+    useFrameRange: bpy.props.BoolProperty(description='Convert a range of frames (Start to End) instead of just Frame', name="Frame Range")
+    startFrame: bpy.props.IntProperty(description='First frame to convert', name='Start')
+    endFrame: bpy.props.IntProperty(description='Last frame to convert', name='End')
+    frameStep: bpy.props.IntProperty(description='Convert every nth frame', name='Step', default=1, min=1)
+    workers: bpy.props.IntProperty(description='Number of processes used to read the cache files for a frame range (0 = one per CPU)', name='Workers', default=0, min=0)
+    blockWorkers: bpy.props.IntProperty(description='Number of processes used to decompress the blocks of a single frame at once (0 = one per CPU, 1 = none) - for large (hires) frames', name='Block Workers', default=1, min=0)
+    crop: bpy.props.BoolProperty(description='Crop the images to the region where any exported field exceeds the threshold (over all the frames converted)', name='Crop')
+    cropThreshold: bpy.props.FloatProperty(description='Values above this are treated as occupied when cropping', name='Crop Threshold', default=DEFAULT_THRESHOLD, min=0.0)
+    outputFormat: bpy.props.EnumProperty(items=OUTPUT_FORMATS, default='ATLAS', description='What to write for each volume', name='Output')
+    lodLevels: bpy.props.IntProperty(description='Also export 1/2, 1/4, 1/8 resolution versions (up to 3 levels) of each volume, named <name>_lod1, _lod2, _lod3', name='LOD Levels', default=0, min=0, max=MAX_LOD_LEVELS)
+    lodFilter: bpy.props.EnumProperty(items=LOD_FILTERS, default='BOX', description='How each 2x2x2 block of voxels is reduced for the LOD levels', name='LOD Filter')
+    precision: bpy.props.EnumProperty(items=PRECISIONS, default='FLOAT', description='Precision of the saved images', name='Precision')
+    packChannels: bpy.props.BoolProperty(description='Create one image with a field in each channel (see R, G, B, A) instead of the separate exports', name='Pack Channels')
+    channelR: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[0]), description='Field packed into the red channel', name='R')
+    channelG: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[1]), description='Field packed into the green channel', name='G')
+    channelB: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[2]), description='Field packed into the blue channel', name='B')
+    channelA: bpy.props.EnumProperty(items=PACK_FIELDS, default=channel_id(DEFAULT_CHANNEL_MAP[3]), description='Field packed into the alpha channel', name='A')
+    profile: bpy.props.BoolProperty(description='Write a JSON report of the time taken by each stage of the export (next to the blend file)', name='Profile')
+    profileMemory: bpy.props.BoolProperty(description='Profile - also record the peak memory of each stage with tracemalloc (slows the export down)', name='Profile Memory')
+    blockCacheSize: bpy.props.IntProperty(description='Memory (MB) used to keep decompressed cache blocks between runs (0 = none). Only blocks read in Blender itself are kept - a single frame, or a frame range with Workers set to 1. Worker processes have their own cache, which goes when the run finishes', name='Block Cache (MB)', default=BLOCK_CACHE_DEFAULT_MB, min=0)
     
 
     def __init__(self):
@@ -605,6 +412,8 @@ class Smoke2EXR_Operator(bpy.types.Operator):
         wm = context.window_manager
         
         self.frameNo = context.scene.frame_current
+        self.startFrame = context.scene.frame_start
+        self.endFrame = context.scene.frame_end
         
         #viewWidth = bpy.context.area.width * 0.8
         #
@@ -646,11 +455,54 @@ class Smoke2EXR_Operator(bpy.types.Operator):
             return {"CANCELLED"}
             #TODO: Pickup the "random" generated name if we don't find an explicit name
             
-        cachefile = bpy.path.abspath("//blendcache_%s/%s_%06i_00.bphys" % (bpy.path.basename(bpy.context.blend_data.filepath[:-6]),smokeCacheName,self.frameNo))
+        cachedir = bpy.path.abspath("//blendcache_%s" % bpy.path.basename(bpy.context.blend_data.filepath[:-6]))
+        def cachefile_for(frameNo):
+            return os.path.join(cachedir, "%s_%06i_00.bphys" % (smokeCacheName,frameNo))
         
         hiresMultiplier = self.domainSettings.amplify + 1
+        cropThreshold = self.cropThreshold if self.crop else None
         
-        convert_pointcache_volume_to_exr(cachefile, "%s_%06i", self.frameNo, self.multiRow, hiresMultiplier=hiresMultiplier)
+        # One image with the chosen field in each channel instead of the separate exports
+        channelMap = None
+        if self.packChannels:
+            channelMap = channel_map_from_ids((self.channelR, self.channelG, self.channelB, self.channelA))
+        
+        # Re-running on the same frame(s) can then use the blocks decompressed last time
+        block_cache.set_budget(self.blockCacheSize*1024*1024)
+        
+        if self.profile:
+            start_profile("Smoke2EXR %s %s" % (smokeCacheName, ("frames %i-%i" % (self.startFrame, self.endFrame)) if self.useFrameRange else ("frame %i" % self.frameNo)), self.profileMemory)
+        try:
+            return self.convert(cachedir, cachefile_for, smokeCacheName, hiresMultiplier, cropThreshold, channelMap)
+        finally:
+            if self.profile:
+                finish_profile(bpy.path.abspath('//')+"smoke2exr_profile_%s.json" % time.strftime("%Y%m%d_%H%M%S"))
+
+    # The conversion itself - separate from execute so that all of it is in the profile
+    def convert(self, cachedir, cachefile_for, smokeCacheName, hiresMultiplier, cropThreshold, channelMap):
+        if self.useFrameRange:
+            # Find which frames have been baked (only reads the headers - and uses the sidecar from the last scan)
+            try:
+                inventory = scan_pointcache(cachedir, smokeCacheName, hiresMultiplier)
+            except OSError as e:
+                self.report({'ERROR'}, "Unable to read cache directory : "+str(e))
+                return {"CANCELLED"}
+            for line in format_inventory(inventory):
+                print(line)
+            frames = {record['frame'] for record in inventory if record['index'] == 0}
+            cachefiles = [(frameNo, cachefile_for(frameNo)) for frameNo in range(self.startFrame, self.endFrame+1, self.frameStep) if frameNo in frames]
+            if len(cachefiles) == 0:
+                self.report({'WARNING'}, "No cached frames found between %i and %i" % (self.startFrame, self.endFrame))
+                return {"CANCELLED"}
+            convert_pointcache_range_to_exr(cachefiles, "%s_%06i", self.multiRow, hiresMultiplier=hiresMultiplier, exportFields=set(self.exportFields), workers=self.workers, precision=self.precision, channelMap=channelMap, outputFormat=self.outputFormat, cropThreshold=cropThreshold, lodLevels=self.lodLevels, lodFilter=self.lodFilter, blockWorkers=self.blockWorkers)
+        elif self.crop:
+            # Cropping needs all the fields of the frame (to find the region) before any image is built
+            cachefiles = [(self.frameNo, cachefile_for(self.frameNo))]
+            convert_pointcache_range_to_exr(cachefiles, "%s_%06i", self.multiRow, hiresMultiplier=hiresMultiplier, exportFields=set(self.exportFields), workers=1, precision=self.precision, channelMap=channelMap, outputFormat=self.outputFormat, cropThreshold=cropThreshold, lodLevels=self.lodLevels, lodFilter=self.lodFilter, blockWorkers=self.blockWorkers)
+        else:
+            cachefile = cachefile_for(self.frameNo)
+            convert_pointcache_volume_to_exr(cachefile, "%s_%06i", self.frameNo, self.multiRow, hiresMultiplier=hiresMultiplier, exportFields=set(self.exportFields), precision=self.precision, channelMap=channelMap, outputFormat=self.outputFormat, lodLevels=self.lodLevels, lodFilter=self.lodFilter, blockWorkers=self.blockWorkers)
+        print(str(block_cache))
         return {'FINISHED'}
     
 
@@ -0,0 +1,7 @@
+# The add-ons are imported as packages from the root of the repository (eg, Smoke2EXR28.lzo_codec) - the modules
+# tested have no dependency on bpy.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,109 @@
+# Equivalence corpus for Smoke2EXR28/lzo_codec.py. Each corpus entry is a list of literal runs (bytes) and matches
+# ((distance, length)) which is assembled into an LZO1X stream (lzo_assemble) using every instruction form and then
+# decoded by both the baseline Lzo_Codec.Lzo1x_Decompress and the slice-based lzo1x_decompress (and the native 'lzo'
+# module if it's installed). The outputs must be byte-for-byte identical.
+
+import random
+
+import pytest
+
+from Smoke2EXR28 import lzo_codec
+from Smoke2EXR28.lzo_codec import Lzo_Codec, compress_runs, lzo1x_decompress, lzo_assemble
+
+# Generate a random (but valid) token list
+def _random_tokens(rnd, count):
+    tokens = []
+    opLen = 0
+    lastLiterals = 0
+    for i in range(0, count):
+        if opLen == 0 or (lastLiterals == 0 and rnd.random() < 0.5):
+            n = rnd.choice((4, 5, 17, 18, 19, 40, 239, 273, 274, 600))
+            tokens.append(bytes(rnd.getrandbits(8) for _ in range(0, n)))
+            lastLiterals = n
+            opLen += n
+            continue
+        dist = rnd.randint(1, min(opLen, 0xBFFF))
+        if 1 <= lastLiterals <= 3 and dist <= 0x400 and rnd.random() < 0.5:
+            length = 2
+        else:
+            length = rnd.choice((3, 4, 8, 9, 33, 34, 300, 1000))
+        tokens.append((dist, length))
+        opLen += length
+        lastLiterals = 0
+        if rnd.random() < 0.4:
+            n = rnd.randint(1, 3)
+            tokens.append(bytes(rnd.getrandbits(8) for _ in range(0, n)))
+            lastLiterals = n
+            opLen += n
+    return tokens
+
+def lzo_corpus():
+    rnd = random.Random(1234)
+    floats = bytes(rnd.getrandbits(8) for _ in range(0, 64))
+    corpus = [
+        [b'a'],
+        [b'abc'],
+        [b'abcd', (1, 3)],
+        [b'x' * 238],
+        [b'x' * 239],
+        [b'0123456789', (10, 40), (2, 2000)],                       # Overlapping M3 with extended length
+        [b'abcd', (4, 4), b'ab', (2, 2), b'c', (3, 3)],             # M1 (2 byte) after a short literal run
+        [b'\x00' * 4, (4, 3000), bytes(range(0, 200)), (0x900, 3)], # M1 (3 byte) after a long literal run
+        [b'abcdefgh', (8, 8), (1, 5), b'z', (16, 7)],               # M2
+        [floats, (64, 64 * 300), (0x4000, 33), (0x4001, 9)],        # M3 at max distance and M4 at min distance
+        [floats * 800, (0xBFFF, 1024), (20000, 3), b'q' * 18],      # M4 with extended length and trailing literals
+        [b'\x00' * 4, (4, 0x20000)],                                # Long run of zeros (typical smoke data)
+    ]
+    for i in range(0, 40):
+        corpus.append(_random_tokens(rnd, 30))
+    return corpus
+
+# Data for the compress_runs round trip - runs at the start, middle and end, a short tail and no runs at all
+def compress_corpus():
+    rnd = random.Random(4321)
+    noise = bytes(rnd.getrandbits(8) for _ in range(0, 4000))
+    return [
+        b'\x00' * 4000 + noise + b'\x00' * 4002,
+        noise[:400] + b'\x01\x02\x03\x04' * 50 + noise[:13],
+        noise,
+        b'ab',
+    ]
+
+@pytest.mark.parametrize("tokens", lzo_corpus())
+def test_decoder_matches_baseline(tokens):
+    (stream, size) = lzo_assemble(tokens)
+    expected = bytearray(size)
+    expectedResult = Lzo_Codec.Lzo1x_Decompress(stream, 0, len(stream), expected, 0)
+    actual = bytearray(size)
+    actualResult = lzo1x_decompress(stream, 0, len(stream), actual, 0)
+
+    assert expectedResult == actualResult
+    assert expectedResult[0] == Lzo_Codec.LZO_E_OK
+    assert expected == actual
+
+@pytest.mark.skipif(not lzo_codec.native_available(), reason="native 'lzo' module not installed")
+@pytest.mark.parametrize("tokens", lzo_corpus())
+def test_native_matches_baseline(tokens):
+    (stream, size) = lzo_assemble(tokens)
+    expected = bytearray(size)
+    Lzo_Codec.Lzo1x_Decompress(stream, 0, len(stream), expected, 0)
+
+    assert lzo_codec._native_lzo.decompress(stream, False, size) == bytes(expected)
+
+@pytest.mark.parametrize("data", compress_corpus())
+def test_compress_runs_round_trip(data):
+    stream = compress_runs(data)
+    actual = bytearray(len(data))
+    actualResult = lzo1x_decompress(stream, 0, len(stream), actual, 0)
+
+    assert actualResult[0] == Lzo_Codec.LZO_E_OK
+    assert actual == data
+
+@pytest.mark.parametrize("data", compress_corpus())
+def test_compress_round_trip(data):
+    stream = lzo_codec.compress(data)
+    actual = bytearray(len(data))
+    (error, size) = lzo_codec.decompress(stream, actual)
+
+    assert error == Lzo_Codec.LZO_E_OK
+    assert bytes(actual[:size]) == data
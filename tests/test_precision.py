@@ -0,0 +1,36 @@
+# Normalised (8/16 bit) output of Smoke2EXR28/precision.py - each channel scaled to its range and back.
+
+import numpy as np
+import pytest
+
+from Smoke2EXR28.precision import channel_ranges, quantize
+
+@pytest.mark.parametrize("bits", (8, 16))
+def test_quantize_round_trip(bits):
+    density = np.linspace(0.25, 3.0, 20, dtype=np.float32)
+    alpha = np.linspace(0.0, 1.0, 20, dtype=np.float32)
+    ranges = channel_ranges((density, density, density, alpha))
+    pixels = np.stack([density, density, density, alpha], axis=1).reshape(4, 5, 4)
+
+    stored = quantize(pixels, ranges, bits)
+    maxValue = (1 << bits) - 1
+    for (channel, (low, high)) in enumerate(ranges):
+        values = low + (high - low) * stored[..., channel].astype(np.float32) / maxValue
+        assert np.allclose(values, pixels[..., channel], atol=(high - low) / maxValue)
+
+@pytest.mark.parametrize("bits", (8, 16))
+def test_quantize_constant_alpha_is_opaque(bits):
+    density = np.linspace(0.0, 1.0, 20, dtype=np.float32)
+    ranges = channel_ranges((density, density, density, None))
+    pixels = np.stack([density, density, density, np.ones(20, dtype=np.float32)], axis=1).reshape(4, 5, 4)
+
+    stored = quantize(pixels, ranges, bits)
+    assert (stored[..., 3] == (1 << bits) - 1).all()
+
+def test_quantize_constant_color_is_zero():
+    zeros = np.zeros(20, dtype=np.float32)
+    ranges = channel_ranges((zeros, None, None, zeros))
+    pixels = np.zeros((4, 5, 4), dtype=np.float32)
+
+    stored = quantize(pixels, ranges, 8)
+    assert (stored[..., 0:3] == 0).all()